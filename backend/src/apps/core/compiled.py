@@ -0,0 +1,276 @@
+"""编译序列化器（热点列表接口的快速路径）
+
+DRF 的 ``Serializer.to_representation`` 对每一行、每个字段都要走一遍通用流程：
+``get_attribute`` 按 source 逐级取值、处理 SkipField / PKOnlyObject、再分派到字段的 ``to_representation``。
+整页20条、每条带嵌套作者时，这部分开销在 CPU 中占大头。
+
+这里为每个序列化器类只分析一次字段，生成一个专用的取值函数（直线代码，没有逐字段的通用分派）：
+
+- 普通属性直接 ``obj.attr``（字典行为 ``row['attr']``），整数、字符串、布尔、选项字段内联转换；
+- 日期时间字段使用预先确定格式的转换函数；
+- 嵌套序列化器、嵌套列表递归编译；
+- 方法字段直接调用绑定方法；
+- 其余字段（关联主键、文件等）以及取值出错时回退到 DRF 原有逻辑，输出与 DRF 逐字节一致。
+
+通过 ``FAST_SERIALIZERS['ENABLED']`` 开启，序列化器把 ``list_serializer_class`` 设为
+``CompiledListSerializer`` 即可使用。``.values()`` 的结果行也可以直接渲染，
+跨关联的 ``author__username`` 等键先用 ``nest_values`` 整理成嵌套字典。
+"""
+import datetime
+import keyword
+from inspect import getattr_static
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import models
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+from rest_framework.settings import api_settings
+
+from .loaders import BatchedListSerializer
+
+_SKIP = object()
+_LOOKUP_ERRORS = (AttributeError, KeyError, ObjectDoesNotExist)
+
+# 按字段类的 to_representation 选择内联转换（子类覆盖了该方法时不会命中）
+_INLINE = {
+    serializers.IntegerField.to_representation: 'int(v)',
+    serializers.CharField.to_representation: 'str(v)',
+    serializers.ReadOnlyField.to_representation: 'v',
+    serializers.BooleanField.to_representation: 'v if v is True or v is False else h{i}(v)',
+    serializers.ChoiceField.to_representation: "v if v == '' else h{i}(str(v), v)",
+}
+
+_plans = {}
+
+
+def fast_serializers_enabled():
+    return settings.FAST_SERIALIZERS['ENABLED']
+
+
+class _Plan:
+    """一个序列化器类的编译结果：字段清单和生成的取值函数"""
+
+    def __init__(self, serializer):
+        model = getattr(getattr(type(serializer), 'Meta', None), 'model', None)
+        self.name = type(serializer).__name__
+        self.fields = []
+        lines = {'attr': [], 'item': []}
+
+        for i, field in enumerate(serializer._readable_fields):
+            self.fields.append(field.field_name)
+            for mode, body in lines.items():
+                body.extend(self.statements(i, field, mode, model))
+
+        self.builders = {mode: self.build(body) for mode, body in lines.items()}
+
+    @staticmethod
+    def kind(field):
+        if isinstance(field, serializers.SerializerMethodField):
+            return 'method'
+        if type(field).get_attribute is not serializers.Field.get_attribute:
+            return 'generic'
+        if len(field.source_attrs) != 1:
+            return 'generic'
+        return 'direct'
+
+    def statements(self, i, field, mode, model):
+        name = repr(field.field_name)
+        kind = self.kind(field)
+        if kind == 'method':
+            return [f'ret[{name}] = h{i}(obj)']
+
+        attr = field.source_attrs[0] if kind == 'direct' else None
+        if mode == 'attr' and attr is not None and not self.plain_attribute(model, attr):
+            attr = None
+        if attr is None:
+            return [
+                f'v = g{i}(obj)',
+                'if v is not SKIP:',
+                f'    ret[{name}] = v',
+            ]
+
+        access = f'obj.{attr}' if mode == 'attr' else f'obj[{attr!r}]'
+        convert = _INLINE.get(type(field).to_representation, 'h{i}(v)').format(i=i)
+        return [
+            'try:',
+            f'    v = {access}',
+            'except LOOKUP_ERRORS:',
+            f'    v = g{i}(obj)',
+            '    if v is not SKIP:',
+            f'        ret[{name}] = v',
+            'else:',
+            f'    ret[{name}] = None if v is None else {convert}',
+        ]
+
+    @staticmethod
+    def plain_attribute(model, attr):
+        """模型实例上可以直接读取的属性（字段、属性、关联），方法等可调用对象交给DRF处理"""
+        if model is None or not attr.isidentifier() or keyword.iskeyword(attr):
+            return False
+        static = getattr_static(model, attr, None)
+        if static is None or callable(static):
+            return False
+        return not isinstance(static, (staticmethod, classmethod))
+
+    def build(self, body):
+        count = len(self.fields)
+        source = '\n'.join([
+            'def build(h, g):',
+            *[f'    h{i} = h[{i}]; g{i} = g[{i}]' for i in range(count)],
+            '    def render(obj):',
+            '        ret = {}',
+            *[f'        {line}' for line in body],
+            '        return ret',
+            '    return render',
+        ])
+        namespace = {'SKIP': _SKIP, 'LOOKUP_ERRORS': _LOOKUP_ERRORS}
+        exec(compile(source, f'<compiled {self.name}>', 'exec'), namespace)
+        return namespace['build']
+
+    def bind(self, serializer):
+        """为具体的序列化器实例（上下文、嵌套字段）生成渲染函数"""
+        fields = list(serializer._readable_fields)
+        if [field.field_name for field in fields] != self.fields:
+            return None
+
+        helpers = [_helper(field) for field in fields]
+        generics = [_generic(field) for field in fields]
+        render_attr = self.builders['attr'](helpers, generics)
+        render_item = self.builders['item'](helpers, generics)
+
+        def render(obj):
+            if isinstance(obj, dict):
+                return render_item(obj)
+            return render_attr(obj)
+        return render
+
+
+def _helper(field):
+    """字段值的转换函数（取到的值不为None时调用）"""
+    if isinstance(field, serializers.SerializerMethodField):
+        return getattr(field.parent, field.method_name)
+    if isinstance(field, serializers.ChoiceField):
+        return field.choice_strings_to_values.get
+    if (isinstance(field, serializers.ListSerializer)
+            and type(field).to_representation is serializers.ListSerializer.to_representation):
+        child = get_renderer(field.child)
+        if child is not None:
+            def render_list(value):
+                items = value.all() if isinstance(value, models.Manager) else value
+                return [child(item) for item in items]
+            return render_list
+    if isinstance(field, serializers.Serializer):
+        return get_renderer(field) or field.to_representation
+    if type(field).to_representation is serializers.DateTimeField.to_representation:
+        return _datetime_converter(field)
+    return field.to_representation
+
+
+def _generic(field):
+    """与 ``Serializer.to_representation`` 中单个字段的处理完全一致的回退路径"""
+    def render(instance):
+        try:
+            attribute = field.get_attribute(instance)
+        except SkipField:
+            return _SKIP
+        check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+        if check_for_none is None:
+            return None
+        return field.to_representation(attribute)
+    return render
+
+
+def _datetime_converter(field):
+    """ISO 8601 输出、使用当前时区的 DateTimeField"""
+    fallback = field.to_representation
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if (output_format is None or output_format.lower() != ISO_8601
+            or hasattr(field, 'timezone') or not settings.USE_TZ):
+        return fallback
+
+    get_current_timezone = timezone.get_current_timezone
+
+    def convert(value):
+        if type(value) is not datetime.datetime or value.utcoffset() is None:
+            return fallback(value)
+        try:
+            value = value.astimezone(get_current_timezone()).isoformat()
+        except OverflowError:
+            return fallback(value)
+        if value.endswith('+00:00'):
+            return value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def get_renderer(serializer):
+    """序列化器实例的编译渲染函数；无法编译（例如覆盖了 to_representation）时返回None
+
+    绑定后的函数缓存在请求上：同一请求内上下文相同的序列化器（例如每条评论的回复列表）
+    不再重复构建字段。
+    """
+    cls = type(serializer)
+    if cls.to_representation is not serializers.Serializer.to_representation:
+        return None
+
+    context = serializer.context
+    request = context.get('request')
+    bound = getattr(request, '_compiled_renderers', None) if request is not None else None
+    if bound is not None and cls in bound and bound[cls][0] is context:
+        return bound[cls][1]
+
+    if cls not in _plans:
+        _plans[cls] = _Plan(serializer)
+    render = _plans[cls].bind(serializer)
+
+    if request is not None:
+        if bound is None:
+            bound = request._compiled_renderers = {}
+        bound[cls] = (context, render)
+    return render
+
+
+def nest_values(rows):
+    """把 ``.values()`` 结果中 ``author__username`` 形式的键整理成嵌套字典
+
+    关联为空（该前缀下的值全部为None）时，嵌套值为None。
+    """
+    nested_rows = []
+    for row in rows:
+        nested = {}
+        for key, value in row.items():
+            target = nested
+            *path, last = key.split('__')
+            for part in path:
+                target = target.setdefault(part, {})
+            target[last] = value
+        nested_rows.append(_collapse_empty(nested))
+    return nested_rows
+
+
+def _collapse_empty(row):
+    for key, value in row.items():
+        if isinstance(value, dict):
+            value = _collapse_empty(value)
+            row[key] = None if all(item is None for item in value.values()) else value
+    return row
+
+
+class CompiledListSerializer(BatchedListSerializer):
+    """列表序列化器：开启快速路径时用编译后的函数渲染每一行"""
+
+    def to_representation(self, data):
+        if not fast_serializers_enabled():
+            return super().to_representation(data)
+
+        render = get_renderer(self.child)
+        if render is None:
+            return super().to_representation(data)
+
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        instances = list(iterable)
+        self.prime(instances)
+        return [render(instance) for instance in instances]
\ No newline at end of file
@@ -0,0 +1,234 @@
+"""写回（write-behind）计数器
+
+热门帖子上的每次浏览、点赞、评论、转发都执行 ``UPDATE ... SET x_count = x_count + 1``，
+所有请求争抢同一行锁。计数器缓冲把增量先累加到共享存储的有序集合中
+（成员为 ``对象ID:字段``，分数为待写入的增量），由定时任务合并后批量写回数据库：
+同一模型的所有字段在每批对象上只执行一条 ``CASE WHEN`` UPDATE。
+读取时返回"数据库值 + 待写入增量"。
+
+共享存储只在进程内共享（``LocalStore``）时，各gunicorn进程缓冲的增量对运行写回任务的
+Celery进程不可见，会被静默丢弃；此时 ``incr`` 直接以一条 ``F()`` UPDATE 写入数据库，
+除非 ``COUNTER_BUFFER['BUFFER_LOCAL_STORE']`` 声明了单进程环境（测试）。
+
+崩溃安全：写回前用 RENAME 把缓冲整体转为批次键，批次ID与UPDATE在同一事务中
+记录到 ``CounterBatch``。进程在任意时刻崩溃，批次键都会留在存储中，
+下次写回时重放；已提交的批次凭唯一的批次ID跳过，增量不会重复生效。
+"""
+import logging
+import time
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .store import get_store
+
+logger = logging.getLogger(__name__)
+
+# 一个批次写回数据库后发送，sender 为模型类，ids 为写入的对象ID列表（用于清理缓存的对象）
+counters_applied = Signal()
+
+
+class CounterBuffer:
+    """一个模型上若干计数字段的写回缓冲"""
+
+    # 批次键存在超过该秒数仍未删除，视为写回进程已崩溃
+    replay_grace = 60
+
+    def __init__(self, model, fields, store=None):
+        self.model = model
+        self.fields = tuple(fields)
+        self._store = store
+        self.key = f'counters:{model._meta.db_table}'
+
+    @property
+    def store(self):
+        return self._store if self._store is not None else get_store()
+
+    @staticmethod
+    def member(obj_id, field):
+        return f'{obj_id}:{field}'
+
+    @property
+    def buffered(self):
+        """共享存储能跨进程共享时才缓冲增量"""
+        return getattr(self.store, 'shared', True) or settings.COUNTER_BUFFER['BUFFER_LOCAL_STORE']
+
+    def incr(self, obj_id, field, amount=1):
+        """累加增量，返回该对象该字段当前待写入的增量（不缓冲时直接写入数据库，返回0）"""
+        if not self.buffered:
+            self.apply({obj_id: {field: amount}})
+            counters_applied.send(sender=self.model, ids=[obj_id])
+            return 0
+        return int(self.store.zincrby(self.key, amount, self.member(obj_id, field)))
+
+    def pending(self, obj_id, field):
+        return int(self.store.zscore(self.key, self.member(obj_id, field)) or 0)
+
+    def pending_many(self, obj_ids, fields=None):
+        """返回 {(对象ID, 字段): 增量}，只包含非零增量"""
+        keys = [(obj_id, field) for obj_id in obj_ids for field in fields or self.fields]
+        if not keys:
+            return {}
+        scores = self.store.zmscore(self.key, [self.member(*key) for key in keys])
+        return {key: int(score) for key, score in zip(keys, scores) if score}
+
+    def batch_keys(self):
+        return sorted(self.store.scan_iter(match=f'{self.key}:batch:*'))
+
+    def unapplied_many(self, obj_ids, fields=None, attempts=5):
+        """返回尚未写入数据库的全部增量 {(对象ID, 字段): 增量}
+
+        除当前缓冲外，还包括已被 flush 取走但尚未提交的批次和等待重放的崩溃批次；
+        已提交（有 ``CounterBatch`` 记录）但批次键尚未删除的批次已经体现在数据库中，不计入。
+        批次键取走后不再修改，读取缓冲前后的批次键一致即说明期间没有新的批次被取走。
+        """
+        from .models import CounterBatch
+
+        keys = [(obj_id, field) for obj_id in obj_ids for field in fields or self.fields]
+        if not keys:
+            return {}
+        members = [self.member(*key) for key in keys]
+        for _ in range(attempts):
+            batch_keys = self.batch_keys()
+            live = self.store.zmscore(self.key, members)
+            if self.batch_keys() == batch_keys:
+                break
+        else:
+            raise RuntimeError(f'计数器 {self.key} 的批次持续变化，无法读取一致的待写入增量')
+
+        applied = set(
+            CounterBatch.objects.filter(batch_id__in=batch_keys).values_list('batch_id', flat=True)
+        )
+        totals = [score or 0 for score in live]
+        for batch_key in batch_keys:
+            if batch_key in applied:
+                continue
+            for i, score in enumerate(self.store.zmscore(batch_key, members)):
+                if score:
+                    totals[i] += score
+        return {key: int(total) for key, total in zip(keys, totals) if total}
+
+    def overlay(self, instances, fields=None):
+        """把待写入增量叠加到一批模型实例的计数字段上（一次查询）"""
+        instances = [obj for obj in instances if obj is not None]
+        pending = self.pending_many({obj.pk for obj in instances}, fields)
+        if pending:
+            for obj in instances:
+                for field in fields or self.fields:
+                    delta = pending.get((obj.pk, field))
+                    if delta:
+                        setattr(obj, field, max(getattr(obj, field) + delta, 0))
+        return instances
+
+    # 写回
+
+    def claim(self):
+        """把当前缓冲整体转为批次键，之后的新增量写入新的缓冲；没有增量时返回None"""
+        batch_key = f'{self.key}:batch:{int(time.time())}:{uuid.uuid4().hex}'
+        if not self.store.exists(self.key):
+            return None
+        try:
+            self.store.rename(self.key, batch_key)
+        except Exception:
+            # 源键已被其他进程取走
+            return None
+        return batch_key
+
+    def read_batch(self, batch_key):
+        """返回 {对象ID: {字段: 增量}}"""
+        deltas = defaultdict(dict)
+        for member, delta in self.store.zrange(batch_key, 0, -1, withscores=True):
+            obj_id, field = member.split(':', 1)
+            if int(delta) and field in self.fields:
+                deltas[int(obj_id)][field] = int(delta)
+        return deltas
+
+    def apply(self, deltas, batch_size=500):
+        """每批对象执行一条 UPDATE，每个字段一个 CASE WHEN 表达式"""
+        obj_ids = list(deltas)
+        for start in range(0, len(obj_ids), batch_size):
+            chunk = obj_ids[start:start + batch_size]
+            updates = {}
+            for field in self.fields:
+                whens = [
+                    When(pk=obj_id, then=Value(deltas[obj_id][field]))
+                    for obj_id in chunk if field in deltas[obj_id]
+                ]
+                if whens:
+                    # 计数字段非负：取消点赞先于点赞写回时不能减成负数
+                    updates[field] = Greatest(
+                        F(field) + Case(*whens, default=Value(0), output_field=IntegerField()),
+                        Value(0)
+                    )
+            self.model.objects.filter(pk__in=chunk).update(**updates)
+
+    def apply_batch(self, batch_key, batch_size=500):
+        """写回一个批次并删除批次键，返回写入的对象数
+
+        批次记录与UPDATE在同一事务中提交；批次已提交过（重放或并发写回）时只删除批次键。
+        """
+        from .models import CounterBatch
+
+        deltas = self.read_batch(batch_key)
+        if deltas:
+            try:
+                with transaction.atomic():
+                    CounterBatch.objects.create(
+                        batch_id=batch_key, counter=self.key, size=len(deltas)
+                    )
+                    self.apply(deltas, batch_size)
+            except IntegrityError:
+                if not CounterBatch.objects.filter(batch_id=batch_key).exists():
+                    raise
+                logger.info(f'计数器批次 {batch_key} 已写回，跳过')
+                deltas = {}
+            else:
+                counters_applied.send(sender=self.model, ids=list(deltas))
+        self.store.delete(batch_key)
+        return len(deltas)
+
+    def replay(self, grace=None):
+        """重放崩溃遗留的批次，返回写入的对象数"""
+        grace = self.replay_grace if grace is None else grace
+        now = time.time()
+        applied = 0
+        for batch_key in self.batch_keys():
+            try:
+                claimed_at = int(batch_key.rsplit(':', 2)[-2])
+            except ValueError:
+                continue
+            if now - claimed_at >= grace:
+                logger.warning(f'重放计数器批次 {batch_key}')
+                applied += self.apply_batch(batch_key)
+        return applied
+
+    def flush(self, batch_size=500):
+        """先重放遗留批次，再把当前缓冲批量写回数据库，返回写入的对象数
+
+        写回失败时批次键保留在存储中，由之后的 flush 重放。
+        """
+        applied = self.replay()
+        batch_key = self.claim()
+        if batch_key is not None:
+            applied += self.apply_batch(batch_key, batch_size)
+        return applied
+
+
+def prune_counter_batches(days=1):
+    """清理过期的批次记录
+
+    批次键最迟在下一次 flush 时被重放或删除，批次记录只需覆盖这段时间。
+    """
+    from .models import CounterBatch
+
+    deleted, _ = CounterBatch.objects.filter(
+        created_at__lt=timezone.now() - timedelta(days=days)
+    ).delete()
+    return deleted
\ No newline at end of file
@@ -0,0 +1,84 @@
+"""带版本号的HTTP响应缓存
+
+客户端频繁轮询帖子详情、时间线、用户资料等接口，大多数时候内容并没有变化。
+``cache_response`` 装饰视图的处理方法：
+
+1. 由视图给出响应依赖的实体（不查询数据库），一次 MGET 取出它们的版本号；
+2. 用接口、完整路径、协商的媒体类型、版本号（以及按查看者区分时的用户ID）计算强 ETag；
+3. 请求的 ``If-None-Match`` 命中时直接返回 304；
+4. 否则按 ETag 读取缓存的序列化结果，未命中时才执行原处理方法并缓存结果。
+
+版本号只覆盖信号能感知的变化（帖子、评论、点赞、关注、用户资料等），
+ETag 中还包含按 ``max_age`` 划分的时间段，其余变化（例如作者改名后的帖子详情）最迟在一个时间段后生效。
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .versions import get_version_store
+
+
+def cache_response(dependencies, per_viewer=True, max_age=None, cache_body=True, on_not_modified=None):
+    """缓存视图处理方法的响应
+
+    ``dependencies(view, request, **kwargs)`` 返回 ``[(实体类型, ID)]``，返回None时不缓存。
+    ``per_viewer`` 表示响应包含因人而异的字段（is_liked 等），按查看者分别缓存，
+    并依赖查看者自身的版本号（点赞、关注时递增）。
+    ``cache_body=False`` 时只做 ETag/304，响应体每次重新生成（例如包含实时浏览数的帖子详情）；
+    ``on_not_modified(view, request, **kwargs)`` 在返回304时调用。
+    """
+    def decorator(handler):
+        @wraps(handler)
+        def wrapped(view, request, *args, **kwargs):
+            entities = dependencies(view, request, **kwargs)
+            if entities is None:
+                return handler(view, request, *args, **kwargs)
+
+            viewer_id = request.user.id if request.user.is_authenticated else 0
+            if per_viewer:
+                entities = [*entities, ('viewer', viewer_id)]
+            versions = get_version_store().get_many(entities)
+
+            timeout = max_age or settings.RESPONSE_CACHE['MAX_AGE']
+            parts = [
+                type(view).__name__,
+                request.get_full_path(),
+                request.accepted_media_type,
+                int(time.time() // timeout),
+                viewer_id if per_viewer else '',
+                *(f'{kind}:{obj_id}:{version}' for (kind, obj_id), version in zip(entities, versions)),
+            ]
+            digest = hashlib.sha1('|'.join(map(str, parts)).encode()).hexdigest()
+            etag = f'"{digest}"'
+            headers = {
+                'ETag': etag,
+                'Cache-Control': 'private, no-cache' if per_viewer else 'no-cache',
+            }
+
+            if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+            if etag in if_none_match or f'W/{etag}' in if_none_match:
+                if on_not_modified is not None:
+                    on_not_modified(view, request, **kwargs)
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+            key = f'responses:{digest}'
+            if cache_body:
+                data = cache.get(key)
+                if data is not None:
+                    return Response(data, headers=headers)
+
+            response = handler(view, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                if cache_body:
+                    cache.set(key, response.data, timeout)
+                for name, value in headers.items():
+                    response[name] = value
+            return response
+        return wrapped
+    return decorator
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""请求级别的批量加载器
+
+列表序列化时，每一行的 is_liked / is_following / is_read 等"当前用户状态"
+原本各自执行一次 ``.exists()`` 查询。加载器先收集整页对象的ID，
+再对每种关系执行一次 ``IN`` 查询，把每页的查询数从O(n)降到O(1)。
+"""
+from collections import defaultdict
+
+from django.db import models
+from rest_framework import serializers
+
+
+def _liked_posts(user, ids):
+    from apps.posts.models import Like
+    return Like.objects.filter(user=user, post_id__in=ids).values_list('post_id', flat=True)
+
+
+def _liked_comments(user, ids):
+    from apps.posts.models import CommentLike
+    return CommentLike.objects.filter(user=user, comment_id__in=ids).values_list('comment_id', flat=True)
+
+
+def _following(user, ids):
+    from apps.social.graph import get_social_graph
+    return get_social_graph().following_of(user.id, ids)
+
+
+def _read_messages(user, ids):
+    from apps.social.models import MessageRead
+    return MessageRead.objects.filter(user=user, message_id__in=ids).values_list('message_id', flat=True)
+
+
+RESOLVERS = {
+    'liked_posts': _liked_posts,
+    'liked_comments': _liked_comments,
+    'following': _following,
+    'read_messages': _read_messages,
+}
+
+
+class ViewerStateLoader:
+    """当前用户与一批对象之间的关系加载器"""
+
+    def __init__(self, user):
+        self.user = user
+        self._resolved = defaultdict(dict)
+        self._pending = defaultdict(set)
+
+    def queue(self, kind, ids):
+        """登记需要查询的对象ID，首次读取时统一查询"""
+        resolved = self._resolved[kind]
+        self._pending[kind].update(
+            obj_id for obj_id in ids if obj_id is not None and obj_id not in resolved
+        )
+
+    def get(self, kind, obj_id):
+        resolved = self._resolved[kind]
+        if obj_id not in resolved:
+            self._pending[kind].add(obj_id)
+            self._flush(kind)
+        return resolved[obj_id]
+
+    def _flush(self, kind):
+        ids = self._pending.pop(kind, set())
+        if not ids:
+            return
+        found = set(RESOLVERS[kind](self.user, ids))
+        resolved = self._resolved[kind]
+        for obj_id in ids:
+            resolved[obj_id] = obj_id in found
+
+
+def get_viewer_loader(context):
+    """从序列化器上下文中获取（或创建）当前请求的加载器，未登录时返回None"""
+    request = context.get('request')
+    if request is None or not request.user.is_authenticated:
+        return None
+
+    loader = getattr(request, '_viewer_state_loader', None)
+    if loader is None:
+        loader = ViewerStateLoader(request.user)
+        request._viewer_state_loader = loader
+    return loader
+
+
+class BatchedListSerializer(serializers.ListSerializer):
+    """列表序列化器：序列化前调用子序列化器的 prime_instances / prime_viewer_state 预处理整页对象
+
+    子序列化器中定义了 ``prime_field`` 的字段（例如用户卡片）也会先登记整页对象。
+    """
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        instances = list(iterable)
+        self.prime(instances)
+        return super().to_representation(instances)
+
+    def prime(self, instances):
+        if hasattr(self.child, 'prime_instances'):
+            self.child.prime_instances(instances)
+
+        loader = get_viewer_loader(self.context)
+        if loader is not None and hasattr(self.child, 'prime_viewer_state'):
+            self.child.prime_viewer_state(instances, loader)
+
+        for field in self.child.fields.values():
+            if hasattr(field, 'prime_field'):
+                field.prime_field(instances)
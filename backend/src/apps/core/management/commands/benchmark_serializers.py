@@ -0,0 +1,88 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from apps.notifications.models import Notification
+from apps.notifications.serializers import NotificationListSerializer
+from apps.posts.models import Comment, Post
+from apps.posts.serializers import CommentSerializer, PostListSerializer
+from apps.users.serializers import UserListSerializer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = '对比热点列表序列化器在DRF默认模式和编译模式下的耗时，并校验两者输出逐字节一致'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=20,
+            help='每页的行数（默认20）'
+        )
+        
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=200,
+            help='每种模式渲染的次数（默认200）'
+        )
+    
+    def handle(self, *args, **options):
+        rows = options['rows']
+        iterations = options['iterations']
+        
+        # 以一个真实用户的身份渲染，包含 is_liked / is_following 等查看者状态；
+        # 每次渲染使用新的请求，与线上每个请求渲染一页的情况一致
+        viewer = User.objects.filter(is_active=True).first()
+        
+        def make_context():
+            request = Request(APIRequestFactory().get('/'))
+            if viewer is not None:
+                request.user = viewer
+            return {'request': request}
+        
+        cases = [
+            (PostListSerializer, Post.objects.filter(is_deleted=False).select_related(
+                'author'
+            ).prefetch_related('post_images')),
+            (CommentSerializer, Comment.objects.filter(
+                is_deleted=False, parent__isnull=True
+            ).select_related('author')),
+            (UserListSerializer, User.objects.filter(is_active=True)),
+            (NotificationListSerializer, Notification.objects.select_related('sender')),
+        ]
+        
+        for serializer_class, queryset in cases:
+            name = serializer_class.__name__
+            if not queryset[:rows].exists():
+                self.stdout.write(self.style.WARNING(f'{name}: 没有数据，跳过'))
+                continue
+            
+            outputs = []
+            timings = []
+            for enabled in (False, True):
+                with override_settings(FAST_SERIALIZERS={'ENABLED': enabled}):
+                    # 每种模式从新取出的实例渲染一次用于比对，计数叠加等预处理不会互相影响
+                    instances = list(queryset[:rows])
+                    data = serializer_class(instances, many=True, context=make_context()).data
+                    outputs.append(JSONRenderer().render(data))
+                    
+                    start = time.perf_counter()
+                    for _ in range(iterations):
+                        serializer_class(instances, many=True, context=make_context()).data
+                    timings.append((time.perf_counter() - start) / iterations * 1000)
+            
+            drf, compiled = timings
+            identical = outputs[0] == outputs[1]
+            line = (
+                f'{name}: {len(instances)}行  DRF {drf:.3f}ms/页  编译 {compiled:.3f}ms/页  '
+                f'加速 {drf / compiled:.1f}x  输出{"一致" if identical else "不一致"}'
+            )
+            self.stdout.write(self.style.SUCCESS(line) if identical else self.style.ERROR(line))
\ No newline at end of file
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.reconcile import RECONCILERS, reconcile_all
+
+
+class Command(BaseCommand):
+    help = '按明细表重新统计反范式计数，修正漂移并输出报告'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'models',
+            nargs='*',
+            help=f'要对账的模型（默认全部：{", ".join(RECONCILERS)}）'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='每个分块的主键区间长度（默认见 COUNTER_RECONCILE）'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='并行的进程数（默认见 COUNTER_RECONCILE，1为不使用进程池）'
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='从上次中断的位置继续，跳过已完成的分块'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只统计漂移，不修改数据'
+        )
+    
+    def handle(self, *args, **options):
+        unknown = set(options['models']) - set(RECONCILERS)
+        if unknown:
+            raise CommandError(f'不支持的模型：{", ".join(sorted(unknown))}')
+        
+        self.stdout.write('开始对账计数...')
+        report = reconcile_all(
+            options['models'],
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            resume=options['resume'],
+            dry_run=options['dry_run']
+        )
+        
+        for label, fields in report.items():
+            for field, drift in fields.items():
+                line = f'{label}.{field}: {drift["rows"]} 行有差异，累计差值 {drift["total"]}，最大差值 {drift["max"]}'
+                if drift['samples']:
+                    samples = '、'.join(f'{obj_id}({delta:+d})' for obj_id, delta in drift['samples'])
+                    line += f'，示例 {samples}'
+                self.stdout.write(line)
+        
+        verb = '统计' if options['dry_run'] else '修正'
+        total = sum(drift['rows'] for fields in report.values() for drift in fields.values())
+        self.stdout.write(self.style.SUCCESS(f'对账完成：共{verb} {total} 处漂移'))
\ No newline at end of file
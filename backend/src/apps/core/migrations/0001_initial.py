@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CounterBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch_id', models.CharField(max_length=191, unique=True, verbose_name='批次ID')),
+                ('counter', models.CharField(max_length=100, verbose_name='计数器')),
+                ('size', models.PositiveIntegerField(default=0, verbose_name='对象数')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+            ],
+            options={
+                'verbose_name': '计数器批次',
+                'verbose_name_plural': '计数器批次',
+                'db_table': 'counter_batches',
+                'indexes': [models.Index(fields=['created_at'], name='counter_bat_created_4f6fce_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class CounterBatch(models.Model):
+    """计数器写回批次
+
+    与计数UPDATE在同一事务中写入。批次ID唯一，
+    崩溃后重放同一批次时据此跳过已写回的增量，保证每个增量只生效一次。
+    """
+    
+    batch_id = models.CharField(_('批次ID'), max_length=191, unique=True)
+    counter = models.CharField(_('计数器'), max_length=100)
+    size = models.PositiveIntegerField(_('对象数'), default=0)
+    created_at = models.DateTimeField(_('创建时间'), auto_now_add=True)
+    
+    class Meta:
+        db_table = 'counter_batches'
+        verbose_name = _('计数器批次')
+        verbose_name_plural = _('计数器批次')
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
+    
+    def __str__(self):
+        return self.batch_id
\ No newline at end of file
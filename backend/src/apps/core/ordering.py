@@ -0,0 +1,10 @@
+from django.db.models import Case, IntegerField, Value, When
+
+
+def preserve_order(ids, field='id'):
+    """按给定ID列表顺序排序的表达式（用于外部索引返回的排序结果）"""
+    return Case(
+        *[When(**{field: value}, then=Value(rank)) for rank, value in enumerate(ids)],
+        default=Value(len(ids)),
+        output_field=IntegerField()
+    )
\ No newline at end of file
@@ -0,0 +1,163 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(PageNumberPagination):
+    """页码分页 + 游标（keyset）分页
+
+    默认保持页码分页；请求带 ``cursor`` 参数时（首页传空值 ``?cursor=``）
+    切换到按 ``(created_at, id)`` 倒序的keyset分页：
+    不执行 ``COUNT(*)``，也不使用 ``OFFSET``，任意深度的翻页代价与第一页相同，
+    可以直接利用 ``(author, -created_at)``、``(recipient, -created_at)`` 等已有索引。
+
+    视图定义了 ``filter_page(rows)`` 时（例如从缓存取出完整记录、剔除被屏蔽用户的内容），
+    取出的每批行先经过它处理；游标模式下剔除后不足一页时继续向后补取，最多补取 ``max_refills`` 次。
+    页码分页无法补取（补取的行会在下一页重复出现，``count`` 和页数也包含被剔除的行），
+    因此视图定义了 ``exclude_filtered(queryset)`` 时，页码分页先用它在查询中排除这些行，
+    页码、总数与游标模式下看到的内容一致，响应格式不随本次请求是否剔除行而变化。
+
+    游标只能表示 ``(created_at, id)`` 上的位置：视图按其他顺序排序时（例如搜索按相关度），
+    忽略 ``cursor`` 参数，保持页码分页和视图的排序。
+    """
+
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = '无效的游标'
+    max_refills = 3
+    # 与keyset分页一致的排序字段
+    keyset_fields = ('created_at', 'id', 'pk')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        row_filter = getattr(view, 'filter_page', None)
+        token = request.query_params.get(self.cursor_query_param)
+        if token is None or not self.keyset_ordered(queryset):
+            self.cursor_mode = False
+            exclude_filtered = getattr(view, 'exclude_filtered', None)
+            if exclude_filtered is not None:
+                queryset = exclude_filtered(queryset)
+            page = super().paginate_queryset(queryset, request, view)
+            if page is None or row_filter is None:
+                return page
+            return row_filter(list(page))
+
+        self.cursor_mode = True
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        position, reverse = self.decode_cursor(token)
+
+        queryset = queryset.order_by(*(('created_at', 'id') if reverse else ('-created_at', '-id')))
+        results, has_more = self.fetch(queryset, position, reverse, page_size, row_filter)
+        if reverse:
+            results.reverse()
+
+        # 向后翻页时，当前位置之前一定还有数据；向前翻页时由是否多取到一条决定
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = position is not None if not reverse else has_more
+        self.page_results = results
+        return results
+
+    def keyset_ordered(self, queryset):
+        """查询集是否按时间（或未指定）排序，排序表达式（如相关度）不能用游标表示"""
+        ordering = queryset.query.order_by if queryset.query.order_by else queryset.model._meta.ordering
+        return all(
+            isinstance(field, str) and field.lstrip('-') in self.keyset_fields
+            for field in ordering
+        )
+
+    @staticmethod
+    def after(queryset, position, reverse):
+        """排序方向上位于 ``position`` 之后的行"""
+        if position is None:
+            return queryset
+        created_at, pk = position
+        if reverse:
+            return queryset.filter(
+                Q(created_at__gt=created_at) |
+                Q(created_at=created_at, id__gt=pk)
+            )
+        return queryset.filter(
+            Q(created_at__lt=created_at) |
+            Q(created_at=created_at, id__lt=pk)
+        )
+
+    def fetch(self, queryset, position, reverse, page_size, row_filter=None):
+        """取出一页（多取一条判断是否还有数据），返回 (结果, 是否还有更多)"""
+        results = []
+        for _ in range(self.max_refills + 1):
+            wanted = page_size + 1 - len(results)
+            rows = list(self.after(queryset, position, reverse)[:wanted])
+            results.extend(row_filter(rows) if row_filter is not None else rows)
+            if len(rows) < wanted or len(results) > page_size:
+                return results[:page_size], len(results) > page_size
+            position = (rows[-1].created_at, rows[-1].id)
+        # 补取次数用完，数据库中仍有未检查的行
+        return results[:page_size], True
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if not self.has_next or not self.page_results:
+            return None
+        return self.encode_cursor(self.page_results[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.cursor_mode:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page_results:
+            return None
+        return self.encode_cursor(self.page_results[0], reverse=True)
+
+    def encode_cursor(self, instance, reverse):
+        """游标对客户端不透明：base64编码的 (created_at, id, 方向)"""
+        payload = {'t': instance.created_at.isoformat(), 'i': instance.id}
+        if reverse:
+            payload['r'] = 1
+        token = base64.urlsafe_b64encode(
+            json.dumps(payload, separators=(',', ':')).encode()
+        ).decode().rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, token):
+        """返回 ((created_at, id) 或 None, 是否向前翻页)"""
+        if not token:
+            return None, False
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            created_at = parse_datetime(payload['t'])
+            pk = int(payload['i'])
+            reverse = bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return (created_at, pk), reverse
+
+    def get_html_context(self):
+        if not self.cursor_mode:
+            return super().get_html_context()
+        return {
+            'previous_url': self.get_previous_link(),
+            'next_url': self.get_next_link(),
+        }
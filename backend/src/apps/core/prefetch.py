@@ -0,0 +1,34 @@
+from collections import defaultdict
+
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+
+def prefetch_top_n(instances, queryset, related_field, limit, order_by, to_attr):
+    """为每个父对象取前 limit 个子对象，挂在 to_attr 上
+
+    ``prefetch_related`` 会取出所有子对象；这里用
+    ``ROW_NUMBER() OVER (PARTITION BY <外键> ORDER BY ...)`` 在数据库中截断，
+    整页父对象只需一次查询，结果集大小不超过 父对象数 × limit。
+    返回取到的全部子对象。
+    """
+    parent_ids = {obj.pk for obj in instances if obj is not None}
+    if not parent_ids:
+        return []
+
+    attname = queryset.model._meta.get_field(related_field).attname
+    children = queryset.filter(
+        **{f'{attname}__in': parent_ids}
+    ).annotate(
+        row_number=Window(RowNumber(), partition_by=F(attname), order_by=order_by)
+    ).filter(row_number__lte=limit).order_by(attname, 'row_number')
+
+    groups = defaultdict(list)
+    fetched = []
+    for child in children:
+        groups[getattr(child, attname)].append(child)
+        fetched.append(child)
+    for obj in instances:
+        if obj is not None:
+            setattr(obj, to_attr, groups.get(obj.pk, []))
+    return fetched
\ No newline at end of file
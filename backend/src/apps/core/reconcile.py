@@ -0,0 +1,214 @@
+"""反范式计数的对账（重新计算并修正漂移）
+
+帖子的点赞、评论、转发数，评论的点赞、回复数，话题的帖子数，用户的粉丝、关注、帖子数
+都是增量维护的，级联删除、失败重试、历史数据等都会让它们与明细表不一致。
+对账任务按主键区间分块，从明细表 ``GROUP BY`` 重新统计：
+
+- 期望值 = 明细表计数 - 尚未写入数据库的增量（当前缓冲和已取走未提交的批次，写回后自然补上）；
+- 每个分块在一个事务中 ``SELECT ... FOR UPDATE`` 锁住对象行后读取当前值、明细计数和待写入增量，
+  并发的写回会等待分块提交，不会在两次读取之间写入；
+- 只修改有差异的行，差值以 ``F() + 差值`` 的形式写入，不覆盖对账期间发生的并发更新；
+- 分块可以在进程池中并行执行；完成的分块记录在共享存储中，中断后 ``resume`` 跳过已完成的分块；
+- 返回每个字段的漂移统计。
+"""
+import logging
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, Max, Min
+
+from .counters import CounterBuffer, counters_applied
+from .store import get_store
+
+logger = logging.getLogger(__name__)
+
+# 对账目标：模型 -> {计数字段: (明细模型, 指向该模型的外键, 明细筛选条件)}
+# ``buffered`` 为使用写回缓冲的字段（期望值要扣除缓冲中的增量）
+RECONCILERS = {
+    'posts.Post': {
+        'fields': {
+            'likes_count': ('posts.Like', 'post', {}),
+            'comments_count': ('posts.Comment', 'post', {'is_deleted': False}),
+            'shares_count': ('posts.Post', 'original_post', {'is_deleted': False}),
+        },
+        'buffered': True,
+    },
+    'posts.Comment': {
+        'fields': {
+            'likes_count': ('posts.CommentLike', 'comment', {}),
+            'replies_count': ('posts.Comment', 'parent', {'is_deleted': False}),
+        },
+        'buffered': True,
+    },
+    'posts.Hashtag': {
+        'fields': {
+            'posts_count': ('posts.PostHashtag', 'hashtag', {'post__is_deleted': False}),
+        },
+        'buffered': False,
+    },
+    'users.User': {
+        'fields': {
+            'followers_count': ('social.Follow', 'following', {}),
+            'following_count': ('social.Follow', 'follower', {}),
+            'posts_count': ('posts.Post', 'author', {'is_deleted': False}),
+        },
+        'buffered': True,
+    },
+    'users.UserStats': {
+        'fields': {
+            'likes_received_count': ('posts.Like', 'post__author', {'post__is_deleted': False}),
+            'comments_received_count': (
+                'posts.Comment', 'post__author', {'is_deleted': False, 'post__is_deleted': False}
+            ),
+        },
+        'buffered': True,
+    },
+}
+
+
+class Drift:
+    """一个计数字段的漂移统计"""
+
+    def __init__(self):
+        self.rows = 0
+        self.total = 0
+        self.max = 0
+        self.samples = []
+
+    def add(self, obj_id, delta, sample_size=10):
+        self.rows += 1
+        self.total += abs(delta)
+        self.max = max(self.max, abs(delta))
+        if len(self.samples) < sample_size:
+            self.samples.append((obj_id, delta))
+
+    def merge(self, other):
+        self.rows += other.rows
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.samples = (self.samples + other.samples)[:10]
+
+    def as_dict(self):
+        return {'rows': self.rows, 'total': self.total, 'max': self.max, 'samples': self.samples}
+
+
+def reconcile_chunk(label, start, end, dry_run=False):
+    """对账主键在 ``[start, end)`` 内的对象，返回 ``{字段: Drift}``"""
+    spec = RECONCILERS[label]
+    model = apps.get_model(label)
+    fields = tuple(spec['fields'])
+
+    counter = CounterBuffer(model, fields)
+    drift = defaultdict(Drift)
+    deltas = defaultdict(dict)
+    with transaction.atomic():
+        current = {
+            row[0]: dict(zip(fields, row[1:]))
+            for row in model.objects.select_for_update().filter(
+                pk__gte=start, pk__lt=end
+            ).order_by('pk').values_list('pk', *fields)
+        }
+        if not current:
+            return {}
+
+        actual = {}
+        for field, (source_label, fk, filters) in spec['fields'].items():
+            source = apps.get_model(source_label)
+            actual[field] = dict(
+                source.objects.filter(
+                    **{f'{fk}_id__gte': start, f'{fk}_id__lt': end}, **filters
+                ).order_by().values(f'{fk}_id').annotate(total=Count('pk')).values_list(f'{fk}_id', 'total')
+            )
+
+        # 行锁之后读取：被锁住的批次尚未提交，其增量计入待写入
+        pending = counter.unapplied_many(list(current)) if spec['buffered'] else {}
+
+        for obj_id, values in current.items():
+            for field in fields:
+                expected = max(actual[field].get(obj_id, 0) - pending.get((obj_id, field), 0), 0)
+                delta = expected - values[field]
+                if delta:
+                    drift[field].add(obj_id, delta)
+                    deltas[obj_id][field] = delta
+
+        if deltas and not dry_run:
+            counter.apply(deltas)
+
+    if deltas and not dry_run:
+        counters_applied.send(sender=model, ids=list(deltas))
+    return dict(drift)
+
+
+class Reconciler:
+    """按主键区间分块对账一个模型，支持进程池并行和断点续跑"""
+
+    def __init__(self, label, chunk_size=None, workers=None, store=None):
+        config = settings.COUNTER_RECONCILE
+        self.label = label
+        self.model = apps.get_model(label)
+        self.chunk_size = chunk_size or config['CHUNK_SIZE']
+        self.workers = workers or config['WORKERS']
+        self._store = store
+        self.checkpoint_key = f'reconcile:{self.model._meta.db_table}:done'
+
+    @property
+    def store(self):
+        return self._store if self._store is not None else get_store()
+
+    def chunks(self):
+        bounds = self.model.objects.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            return []
+        return [
+            (start, start + self.chunk_size)
+            for start in range(bounds['low'], bounds['high'] + 1, self.chunk_size)
+        ]
+
+    def run(self, resume=False, dry_run=False):
+        """返回 ``{字段: 漂移统计}``；``resume`` 时跳过上次已完成的分块"""
+        if not resume:
+            self.store.delete(self.checkpoint_key)
+        done = {int(start) for start in self.store.smembers(self.checkpoint_key)}
+        pending = [chunk for chunk in self.chunks() if chunk[0] not in done]
+        logger.info(f'{self.label} 对账：共 {len(pending)} 个分块（跳过 {len(done)} 个已完成）')
+
+        report = defaultdict(Drift)
+        for start, drift in self.execute(pending, dry_run):
+            for field, stats in drift.items():
+                report[field].merge(stats)
+            if not dry_run:
+                self.store.sadd(self.checkpoint_key, start)
+
+        if not dry_run:
+            self.store.delete(self.checkpoint_key)
+        return {field: report[field].as_dict() for field in RECONCILERS[self.label]['fields']}
+
+    def execute(self, chunks, dry_run):
+        """逐块（workers 为1时在当前进程）或在进程池中执行，按完成顺序产出 ``(分块起点, 漂移)``"""
+        if self.workers <= 1 or len(chunks) <= 1:
+            for start, end in chunks:
+                yield start, reconcile_chunk(self.label, start, end, dry_run)
+            return
+
+        # 子进程不能复用父进程的数据库连接
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=connections.close_all) as pool:
+            futures = {
+                pool.submit(reconcile_chunk, self.label, start, end, dry_run): start
+                for start, end in chunks
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+
+def reconcile_all(labels=None, **options):
+    """依次对账所有（或指定的）模型，返回 ``{模型: {字段: 漂移统计}}``"""
+    resume = options.pop('resume', False)
+    dry_run = options.pop('dry_run', False)
+    return {
+        label: Reconciler(label, **options).run(resume=resume, dry_run=dry_run)
+        for label in labels or RECONCILERS
+    }
\ No newline at end of file
@@ -0,0 +1,58 @@
+"""JSON 渲染
+
+``FastJSONRenderer`` 用 orjson 编码（未安装时退回 DRF 自带的 ``JSONRenderer``），输出与 DRF 一致：
+紧凑格式、UTF-8、零时区偏移的时间写成 ``Z``、转义 U+2028/U+2029。
+datetime / date / UUID 由 orjson 原生处理，Decimal、惰性翻译字符串、timedelta 等
+交给 DRF 的 ``JSONEncoder.default``，与原有行为相同。
+
+``iter_json_array`` 把按块产生的数据逐块编码为一个 JSON 数组，供流式响应使用，
+整个列表不需要先拼成一个大字符串。
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+_encoder = JSONEncoder()
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def dumps(data):
+    """把数据编码为 UTF-8 JSON 字节串"""
+    if orjson is None:
+        return JSONRenderer().render(data)
+    ret = orjson.dumps(data, default=_encoder.default, option=_OPTIONS)
+    # 与 DRF 一致：U+2028/U+2029 在 JavaScript 字符串中不合法
+    if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+        ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return ret
+
+
+def iter_json_array(chunks):
+    """把若干个列表逐块编码为一个 JSON 数组"""
+    yield b'['
+    first = True
+    for chunk in chunks:
+        if not chunk:
+            continue
+        encoded = dumps(list(chunk))[1:-1]
+        yield encoded if first else b',' + encoded
+        first = False
+    yield b']'
+
+
+class FastJSONRenderer(JSONRenderer):
+    """基于 orjson 的 JSON 渲染器"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # orjson 不支持任意缩进，请求了缩进（可浏览API等）时使用 DRF 的实现
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
\ No newline at end of file
@@ -0,0 +1,402 @@
+"""共享数据结构存储
+
+时间线、热门榜等子系统需要在多个gunicorn进程之间共享有序集合、集合和哈希表。
+生产环境使用Redis；开发和测试环境使用进程内实现 ``LocalStore``，
+它提供与redis-py兼容的方法子集，调用方无需区分后端。
+"""
+import fnmatch
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+def _member(value):
+    """与Redis保持一致：成员统一存为字符串"""
+    return value if isinstance(value, str) else str(value)
+
+
+class _SortedSet:
+    """按 (score, member) 排序的有序集合"""
+
+    __slots__ = ('scores', 'entries')
+
+    def __init__(self):
+        self.scores = {}
+        self.entries = []
+
+    def add(self, member, score):
+        score = float(score)
+        old = self.scores.get(member)
+        if old is not None:
+            if old == score:
+                return False
+            del self.entries[bisect_left(self.entries, (old, member))]
+        self.scores[member] = score
+        insort(self.entries, (score, member))
+        return old is None
+
+    def remove(self, member):
+        score = self.scores.pop(member, None)
+        if score is None:
+            return False
+        del self.entries[bisect_left(self.entries, (score, member))]
+        return True
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def _slice_bounds(length, start, stop):
+    """把Redis风格的闭区间下标（支持负数）转换为Python切片"""
+    if start < 0:
+        start = max(length + start, 0)
+    if stop < 0:
+        stop = length + stop
+    return start, min(stop, length - 1) + 1
+
+
+class LocalStore:
+    """进程内存储（redis-py接口子集）
+
+    仅在单进程内共享，适用于开发环境和测试。
+    """
+
+    # 数据不能跨进程共享（写回缓冲等依赖跨进程共享的调用方据此降级）
+    shared = False
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.RLock()
+
+    # 内部工具
+
+    def _get(self, key, factory=None):
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        value = self._data.get(key)
+        if value is None and factory is not None:
+            value = self._data[key] = factory()
+        return value
+
+    def _cleanup(self, key):
+        value = self._data.get(key)
+        if value is not None and not len(value):
+            del self._data[key]
+            self._expires.pop(key, None)
+
+    # 通用命令
+
+    def delete(self, *keys):
+        with self._lock:
+            removed = 0
+            for key in keys:
+                if self._get(key) is not None:
+                    removed += 1
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+            return removed
+
+    def exists(self, *keys):
+        with self._lock:
+            return sum(1 for key in keys if self._get(key) is not None)
+
+    def expire(self, key, seconds):
+        with self._lock:
+            if self._get(key) is None:
+                return False
+            self._expires[key] = time.monotonic() + seconds
+            return True
+
+    def rename(self, src, dst):
+        with self._lock:
+            value = self._get(src)
+            if value is None:
+                raise KeyError(src)
+            self._data[dst] = self._data.pop(src)
+            self._expires.pop(dst, None)
+            if src in self._expires:
+                self._expires[dst] = self._expires.pop(src)
+            return True
+
+    def keys(self, pattern='*'):
+        with self._lock:
+            return [
+                key for key in list(self._data)
+                if fnmatch.fnmatchcase(key, pattern) and self._get(key) is not None
+            ]
+
+    def scan_iter(self, match='*', count=None):
+        return iter(self.keys(match))
+
+    def flushdb(self):
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
+
+    # 字符串
+
+    def get(self, name):
+        with self._lock:
+            return self._get(name)
+
+    def set(self, name, value, ex=None):
+        with self._lock:
+            self._data[name] = _member(value)
+            self._expires.pop(name, None)
+            if ex is not None:
+                self._expires[name] = time.monotonic() + ex
+            return True
+
+    def mget(self, keys):
+        with self._lock:
+            return [self._get(key) for key in keys]
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            value = int(self._get(name) or 0) + amount
+            self._data[name] = _member(value)
+            return value
+
+    # 有序集合
+
+    def zadd(self, name, mapping):
+        with self._lock:
+            zset = self._get(name, _SortedSet)
+            return sum(
+                1 for member, score in mapping.items()
+                if zset.add(_member(member), score)
+            )
+
+    def zincrby(self, name, amount, value):
+        with self._lock:
+            zset = self._get(name, _SortedSet)
+            member = _member(value)
+            score = zset.scores.get(member, 0.0) + float(amount)
+            zset.add(member, score)
+            return score
+
+    def zrem(self, name, *values):
+        with self._lock:
+            zset = self._get(name)
+            if zset is None:
+                return 0
+            removed = sum(1 for value in values if zset.remove(_member(value)))
+            self._cleanup(name)
+            return removed
+
+    def zscore(self, name, value):
+        with self._lock:
+            zset = self._get(name)
+            if zset is None:
+                return None
+            return zset.scores.get(_member(value))
+
+    def zmscore(self, key, members):
+        with self._lock:
+            zset = self._get(key)
+            if zset is None:
+                return [None] * len(members)
+            return [zset.scores.get(_member(member)) for member in members]
+
+    def zcard(self, name):
+        with self._lock:
+            zset = self._get(name)
+            return len(zset) if zset is not None else 0
+
+    def zrange(self, name, start, end, desc=False, withscores=False):
+        with self._lock:
+            zset = self._get(name)
+            if zset is None:
+                return []
+            length = len(zset.entries)
+            lo, hi = _slice_bounds(length, start, end)
+            if lo >= hi:
+                selected = []
+            elif desc:
+                selected = zset.entries[length - hi:length - lo][::-1]
+            else:
+                selected = zset.entries[lo:hi]
+            if withscores:
+                return [(member, score) for score, member in selected]
+            return [member for _, member in selected]
+
+    def zrevrange(self, name, start, end, withscores=False):
+        return self.zrange(name, start, end, desc=True, withscores=withscores)
+
+    def zrevrangebyscore(self, name, max, min, start=None, num=None, withscores=False):
+        with self._lock:
+            zset = self._get(name)
+            if zset is None:
+                return []
+            max_score, max_open = _parse_score(max)
+            min_score, min_open = _parse_score(min)
+            selected = []
+            for score, member in reversed(zset.entries):
+                if score > max_score or (max_open and score == max_score):
+                    continue
+                if score < min_score or (min_open and score == min_score):
+                    break
+                selected.append((member, score))
+            if start is not None:
+                selected = selected[start:start + num if num is not None and num >= 0 else None]
+            if withscores:
+                return selected
+            return [member for member, _ in selected]
+
+    def zrangebyscore(self, name, min, max, start=None, num=None, withscores=False):
+        with self._lock:
+            zset = self._get(name)
+            if zset is None:
+                return []
+            lo, hi = _score_bounds(zset.entries, min, max)
+            selected = [(member, score) for score, member in zset.entries[lo:hi]]
+            if start is not None:
+                selected = selected[start:start + num if num is not None and num >= 0 else None]
+            if withscores:
+                return selected
+            return [member for member, _ in selected]
+
+    def zremrangebyscore(self, name, min, max):
+        with self._lock:
+            zset = self._get(name)
+            if zset is None:
+                return 0
+            lo, hi = _score_bounds(zset.entries, min, max)
+            removed = zset.entries[lo:hi]
+            for score, member in removed:
+                del zset.scores[member]
+            del zset.entries[lo:hi]
+            self._cleanup(name)
+            return len(removed)
+
+    def zremrangebyrank(self, name, min, max):
+        with self._lock:
+            zset = self._get(name)
+            if zset is None:
+                return 0
+            lo, hi = _slice_bounds(len(zset), min, max)
+            removed = zset.entries[lo:hi]
+            for score, member in removed:
+                del zset.scores[member]
+            del zset.entries[lo:hi]
+            self._cleanup(name)
+            return len(removed)
+
+    # 集合
+
+    def sadd(self, name, *values):
+        with self._lock:
+            members = self._get(name, set)
+            before = len(members)
+            members.update(_member(value) for value in values)
+            return len(members) - before
+
+    def srem(self, name, *values):
+        with self._lock:
+            members = self._get(name)
+            if members is None:
+                return 0
+            before = len(members)
+            members.difference_update(_member(value) for value in values)
+            removed = before - len(members)
+            self._cleanup(name)
+            return removed
+
+    def smembers(self, name):
+        with self._lock:
+            return set(self._get(name) or ())
+
+    def sismember(self, name, value):
+        with self._lock:
+            return _member(value) in (self._get(name) or ())
+
+    # 管道
+
+    def pipeline(self, transaction=True):
+        return LocalPipeline(self)
+
+
+def _parse_score(value):
+    """解析 '(1.5'、'+inf' 等Redis分数边界"""
+    if isinstance(value, str):
+        exclusive = value.startswith('(')
+        if exclusive:
+            value = value[1:]
+        return float(value), exclusive
+    return float(value), False
+
+
+def _score_bounds(entries, low, high):
+    """有序集合中分数在 [low, high] 内（支持开区间）的下标范围"""
+    min_score, min_open = _parse_score(low)
+    max_score, max_open = _parse_score(high)
+    lo = bisect_left(entries, (min_score,))
+    while min_open and lo < len(entries) and entries[lo][0] == min_score:
+        lo += 1
+    hi = bisect_left(entries, (max_score,))
+    while not max_open and hi < len(entries) and entries[hi][0] == max_score:
+        hi += 1
+    return lo, hi if hi > lo else lo
+
+
+class LocalPipeline:
+    """LocalStore的管道：缓存命令，execute时在同一把锁内依次执行"""
+
+    def __init__(self, store):
+        self._store = store
+        self._commands = []
+
+    def __getattr__(self, name):
+        method = getattr(self._store, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((method, args, kwargs))
+            return self
+
+        return queue
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._commands = []
+
+    def execute(self):
+        commands, self._commands = self._commands, []
+        with self._store._lock:
+            return [method(*args, **kwargs) for method, args, kwargs in commands]
+
+
+def redis_store():
+    """创建Redis存储客户端"""
+    import redis
+
+    return redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """获取进程级共享存储实例（由 SHARED_STORE_BACKEND 配置）"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                factory = import_string(settings.SHARED_STORE_BACKEND)
+                _store = factory()
+    return _store
+
+
+def reset_store():
+    """丢弃当前存储实例（测试用）"""
+    global _store
+    with _store_lock:
+        _store = None
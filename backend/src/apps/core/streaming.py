@@ -0,0 +1,62 @@
+"""列表接口的流式输出
+
+``?stream=1`` 时不分页：按块从数据库取出对象（``iterator(chunk_size)``，支持 prefetch_related），
+每块用列表序列化器批量预处理、序列化后立即编码写出，内存占用与总行数无关，适合导出等大列表。
+一次流式输出最多 MAX_ITEMS 行，代价远高于分页请求，因此只对登录用户开放，并按用户单独限流。
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.throttling import UserRateThrottle
+
+from .renderers import iter_json_array
+
+
+class StreamRateThrottle(UserRateThrottle):
+    """流式输出的限流（按用户，频率由 JSON_STREAMING['THROTTLE_RATE'] 配置）"""
+
+    scope = 'stream'
+
+    def get_rate(self):
+        return settings.JSON_STREAMING['THROTTLE_RATE']
+
+
+class StreamingListMixin:
+    """列表视图的流式模式"""
+
+    stream_param = 'stream'
+    stream_throttle_class = StreamRateThrottle
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get(self.stream_param) not in ('1', 'true'):
+            return super().list(request, *args, **kwargs)
+
+        self.check_stream_allowed(request)
+        queryset = self.filter_queryset(self.get_queryset())
+        return StreamingHttpResponse(
+            iter_json_array(self.stream_chunks(queryset)),
+            content_type='application/json'
+        )
+
+    def check_stream_allowed(self, request):
+        """流式输出需要登录，并受单独的限流约束"""
+        if not request.user.is_authenticated:
+            self.permission_denied(request, message='流式输出需要登录')
+        throttle = self.stream_throttle_class()
+        if not throttle.allow_request(request, self):
+            self.throttled(request, throttle.wait())
+
+    def stream_chunks(self, queryset):
+        config = settings.JSON_STREAMING
+        chunk_size = config['CHUNK_SIZE']
+        rows = queryset[:config['MAX_ITEMS']].iterator(chunk_size=chunk_size)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            yield self.get_serializer(self.prepare_chunk(chunk), many=True).data
+
+    def prepare_chunk(self, chunk):
+        """序列化前处理每块对象（例如从缓存取出完整记录）"""
+        return chunk
\ No newline at end of file
@@ -0,0 +1,22 @@
+from celery import shared_task
+import logging
+
+from .reconcile import reconcile_all
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def reconcile_counters():
+    """定时对账反范式计数（Celery 工作进程不能再创建子进程，在当前进程内逐块执行）"""
+    try:
+        report = reconcile_all(workers=1, resume=True)
+        for label, fields in report.items():
+            for field, drift in fields.items():
+                if drift['rows']:
+                    logger.warning(
+                        f'计数 {label}.{field} 漂移：{drift["rows"]} 行，累计 {drift["total"]}，最大 {drift["max"]}'
+                    )
+        
+    except Exception as e:
+        logger.error(f'计数对账失败: {e}')
\ No newline at end of file
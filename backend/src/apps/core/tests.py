@@ -0,0 +1,161 @@
+import datetime
+import uuid
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework.renderers import JSONRenderer
+
+from .reconcile import Reconciler, reconcile_all
+from .renderers import FastJSONRenderer, iter_json_array
+from .store import LocalStore, get_store, reset_store
+
+
+class LocalStoreTest(SimpleTestCase):
+    """进程内存储测试"""
+    
+    def setUp(self):
+        self.store = LocalStore()
+    
+    def test_sorted_set_order_and_trim(self):
+        """测试有序集合排序和截断"""
+        self.store.zadd('z', {1: 10, 2: 30, 3: 20})
+        self.assertEqual(self.store.zrevrange('z', 0, -1), ['2', '3', '1'])
+        
+        self.store.zremrangebyrank('z', 0, -3)
+        self.assertEqual(self.store.zrevrange('z', 0, -1, withscores=True), [('2', 30.0), ('3', 20.0)])
+    
+    def test_zincrby_and_zmscore(self):
+        """测试分数累加"""
+        self.store.zincrby('z', 2, 'a')
+        self.store.zincrby('z', 3, 'a')
+        self.assertEqual(self.store.zmscore('z', ['a', 'b']), [5.0, None])
+    
+    def test_zrevrangebyscore(self):
+        """测试按分数范围查询"""
+        self.store.zadd('z', {'a': 1, 'b': 2, 'c': 3, 'd': 4})
+        self.assertEqual(self.store.zrevrangebyscore('z', '(4', 2), ['c', 'b'])
+        self.assertEqual(self.store.zrevrangebyscore('z', '+inf', '-inf', start=1, num=2), ['c', 'b'])
+    
+    def test_pipeline(self):
+        """测试管道批量执行"""
+        pipe = self.store.pipeline()
+        pipe.sadd('s', 1, 2)
+        pipe.exists('s', 'missing')
+        self.assertEqual(pipe.execute(), [2, 1])
+        self.assertEqual(self.store.smembers('s'), {'1', '2'})
+    
+    def test_empty_collections_are_removed(self):
+        """测试清空后键不再存在"""
+        self.store.zadd('z', {'a': 1})
+        self.store.zrem('z', 'a')
+        self.assertEqual(self.store.exists('z'), 0)
+
+
+class FastJSONRendererTest(SimpleTestCase):
+    """JSON 渲染测试"""
+    
+    def test_matches_drf_output(self):
+        """测试输出与DRF的JSONRenderer逐字节一致"""
+        data = {
+            'created_at': datetime.datetime(2024, 1, 1, 8, 30, tzinfo=datetime.timezone.utc),
+            'local': datetime.datetime(2024, 1, 1, 16, 30, tzinfo=datetime.timezone(datetime.timedelta(hours=8))),
+            'date': datetime.date(2024, 1, 1),
+            'price': Decimal('9.99'),
+            'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'message': _('内容'),
+            'text': '行\u2028分隔',
+            'items': [1, 2.5, None, True],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+    
+    def test_indent_falls_back(self):
+        """测试请求缩进时使用DRF的实现"""
+        rendered = FastJSONRenderer().render({'a': 1}, 'application/json; indent=2')
+        self.assertEqual(rendered, b'{\n  "a": 1\n}')
+    
+    def test_iter_json_array(self):
+        """测试逐块编码为一个JSON数组"""
+        self.assertEqual(b''.join(iter_json_array([[1, 2], [], [{'a': 'b'}]])), b'[1,2,{"a":"b"}]')
+        self.assertEqual(b''.join(iter_json_array([])), b'[]')
+
+@override_settings(COUNTER_BUFFER={'BUFFER_LOCAL_STORE': True})
+class CounterReconcileTest(TestCase):
+    """反范式计数对账测试"""
+    
+    def setUp(self):
+        reset_store()
+        from apps.posts.models import Comment, Hashtag, Post, PostHashtag
+        from apps.users.models import User
+        
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com', password='testpass123'
+        )
+        self.posts = [Post.objects.create(author=self.author, content=f'帖子{i}') for i in range(3)]
+        with patch('apps.notifications.tasks.create_comment_notification.delay'):
+            for _ in range(2):
+                Comment.objects.create(post=self.posts[0], author=self.author, content='评论')
+        self.hashtag = Hashtag.objects.create(name='话题')
+        PostHashtag.objects.create(post=self.posts[1], hashtag=self.hashtag)
+        
+        # 人为制造漂移：评论数缺失、多算了一次转发、话题帖子数为0
+        Post.objects.filter(id=self.posts[2].id).update(shares_count=4)
+        self.Post = Post
+    
+    def test_reconcile_fixes_drift_and_reports(self):
+        """测试只修正有差异的行、扣除写回缓冲中的增量并报告漂移"""
+        from apps.posts.counters import get_post_counter
+        get_post_counter().incr(self.posts[0].id, 'comments_count')
+        
+        report = Reconciler('posts.Post', chunk_size=2, workers=1).run()
+        self.assertEqual(report['comments_count']['rows'], 1)
+        self.assertEqual(report['comments_count']['samples'], [(self.posts[0].id, 1)])
+        self.assertEqual(report['shares_count']['samples'], [(self.posts[2].id, -4)])
+        self.assertEqual(report['likes_count']['rows'], 0)
+        
+        self.posts[0].refresh_from_db()
+        self.assertEqual(self.posts[0].comments_count, 1)
+        self.assertEqual(get_post_counter().flush(), 1)
+        self.posts[0].refresh_from_db()
+        self.assertEqual(self.posts[0].comments_count, 2)
+        
+        report = reconcile_all()
+        self.assertEqual(report['posts.Hashtag']['posts_count']['samples'], [(self.hashtag.id, 1)])
+        self.assertEqual(report['posts.Post']['shares_count']['rows'], 0)
+        self.assertEqual(report['users.User']['posts_count']['rows'], 1)
+    
+    def test_reconcile_counts_claimed_batches(self):
+        """测试已取走未提交的批次计入待写入增量，已提交的批次不重复扣除"""
+        from apps.core.models import CounterBatch
+        from apps.posts.counters import get_post_counter
+        counter = get_post_counter()
+        self.Post.objects.filter(id=self.posts[0].id).update(comments_count=1)
+        
+        # 写回进程取走了批次但尚未提交
+        counter.incr(self.posts[0].id, 'comments_count')
+        batch_key = counter.claim()
+        report = Reconciler('posts.Post', chunk_size=10, workers=1).run()
+        self.assertEqual(report['comments_count']['rows'], 0)
+        
+        # 批次提交后、批次键删除前
+        CounterBatch.objects.create(batch_id=batch_key, counter=counter.key, size=1)
+        self.Post.objects.filter(id=self.posts[0].id).update(comments_count=2)
+        report = Reconciler('posts.Post', chunk_size=10, workers=1).run()
+        self.assertEqual(report['comments_count']['rows'], 0)
+        
+        counter.flush()
+        self.assertEqual(self.Post.objects.get(id=self.posts[0].id).comments_count, 2)
+    
+    def test_dry_run_and_resume(self):
+        """测试只统计不修改，以及跳过检查点中已完成的分块"""
+        report = Reconciler('posts.Post', chunk_size=2, workers=1).run(dry_run=True)
+        self.assertEqual(report['shares_count']['rows'], 1)
+        self.assertEqual(self.Post.objects.get(id=self.posts[2].id).shares_count, 4)
+        
+        reconciler = Reconciler('posts.Post', chunk_size=1, workers=1)
+        get_store().sadd(reconciler.checkpoint_key, self.posts[2].id)
+        report = reconciler.run(resume=True)
+        self.assertEqual(report['shares_count']['rows'], 0)
+        self.assertEqual(report['comments_count']['rows'], 1)
+        self.assertFalse(get_store().exists(reconciler.checkpoint_key))
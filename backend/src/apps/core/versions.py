@@ -0,0 +1,49 @@
+"""实体版本号
+
+每个被缓存的实体（帖子、用户、时间线、查看者）在共享存储中有一个单调递增的版本号
+``version:{类型}:{ID}``，实体变化时由信号递增。响应缓存用相关实体的版本号计算 ETag，
+判断缓存是否有效只需一次 MGET，不查询数据库。
+"""
+from django.conf import settings
+from django.db import transaction
+
+from .store import get_store
+
+
+class VersionStore:
+    """实体版本号存储"""
+
+    key = 'version:{}:{}'
+
+    def __init__(self, store=None):
+        self.store = store if store is not None else get_store()
+        self.ttl = settings.RESPONSE_CACHE['VERSION_TTL']
+
+    def get_many(self, entities):
+        """返回各实体的版本号，从未变化过的实体为0"""
+        if not entities:
+            return []
+        values = self.store.mget([self.key.format(kind, obj_id) for kind, obj_id in entities])
+        return [int(value or 0) for value in values]
+
+    def bump(self, *entities):
+        entities = set(entities)
+        if not entities:
+            return
+        pipe = self.store.pipeline(transaction=False)
+        for kind, obj_id in entities:
+            key = self.key.format(kind, obj_id)
+            pipe.incr(key)
+            pipe.expire(key, self.ttl)
+        pipe.execute()
+
+
+def get_version_store():
+    return VersionStore()
+
+
+def bump_versions(*entities):
+    """事务提交后递增实体版本号（在此之前读到的仍是旧数据，不能提前失效）"""
+    entities = [(kind, obj_id) for kind, obj_id in entities if obj_id is not None]
+    if entities:
+        transaction.on_commit(lambda: get_version_store().bump(*entities))
\ No newline at end of file
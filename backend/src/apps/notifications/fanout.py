@@ -0,0 +1,119 @@
+"""新帖子通知的粉丝扩散
+
+发帖请求只在事务提交后登记一次扩散，不再在 ``post_save`` 里读出作者的全部粉丝、一次性 ``bulk_create``。
+扩散按 ``follows.id`` 做keyset分页，每块粉丝在各自的任务（和事务）中批量写入通知，
+写完一块再投递下一块，内存和事务大小只与 CHUNK_SIZE 有关。
+
+每块完成后把进度（最后一条关注记录的ID）记入共享存储；工作进程崩溃或任务丢失时，
+定时任务从进度处重新投递。新帖子通知在 (接收者, 帖子) 上有唯一约束，写入时忽略冲突，
+重放的一块、或与仍在执行的同一块交错时都不会重复写入。
+粉丝数超过 MAX_FOLLOWERS 的作者不做扩散（粉丝从时间线看到新帖子）。
+粉丝数不超过 CHUNK_SIZE 时只有一块，在事务提交后直接写入，省去任务投递；
+更大的扩散都交给Celery，不占用发帖请求（ASYNC 关闭时才在请求中逐块执行，仅用于没有Celery的开发环境）。
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+
+from apps.core.store import get_store
+
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+# 成员为帖子ID：进度（分数为已处理的最后一条关注记录ID）和最近一次推进的时间
+CHECKPOINT_KEY = 'notifications:fanout'
+TOUCHED_KEY = 'notifications:fanout:touched'
+
+
+def followers_count(post):
+    """作者的粉丝数（维护的计数 + 待写入增量）"""
+    from apps.users.counters import get_user_counter
+
+    return get_user_counter().overlay([post.author])[0].followers_count
+
+
+def save_checkpoint(post_id, after_id):
+    store = get_store()
+    pipe = store.pipeline(transaction=False)
+    pipe.zadd(CHECKPOINT_KEY, {post_id: after_id})
+    pipe.zadd(TOUCHED_KEY, {post_id: time.time()})
+    pipe.execute()
+
+
+def finish(post_id):
+    store = get_store()
+    store.zrem(CHECKPOINT_KEY, post_id)
+    store.zrem(TOUCHED_KEY, post_id)
+
+
+def start_fanout(post):
+    """登记一次扩散并开始处理第一块（事务提交后调用）"""
+    config = settings.NOTIFICATION_FANOUT
+    count = followers_count(post)
+    if count > config['MAX_FOLLOWERS']:
+        logger.info(f'作者 {post.author_id} 粉丝数超过阈值，帖子 {post.id} 不发送新帖子通知')
+        return
+
+    save_checkpoint(post.id, 0)
+    if config['ASYNC'] and count > config['CHUNK_SIZE']:
+        from .tasks import notify_followers_chunk
+        notify_followers_chunk.delay(post.id, 0)
+    else:
+        after_id = 0
+        while after_id is not None:
+            after_id = notify_followers_chunk_now(post.id, after_id)
+
+
+def notify_followers_chunk_now(post_id, after_id):
+    """为关注记录ID大于 ``after_id`` 的一块粉丝写入通知，返回下一块的起点，没有更多时返回None"""
+    from apps.posts.models import Post
+    from apps.social.models import Follow
+
+    chunk_size = settings.NOTIFICATION_FANOUT['CHUNK_SIZE']
+    post = Post.objects.select_related('author').filter(id=post_id, is_deleted=False).first()
+    if post is None:
+        finish(post_id)
+        return None
+
+    rows = list(Follow.objects.filter(
+        following_id=post.author_id, id__gt=after_id
+    ).order_by('id').values_list('id', 'follower_id')[:chunk_size])
+    if rows:
+        follower_ids = [follower_id for _, follower_id in rows]
+        content_type = ContentType.objects.get_for_model(Post)
+        # 重放的块中已经写入的接收者由唯一约束跳过
+        Notification.objects.bulk_create([
+            Notification(
+                recipient_id=follower_id,
+                sender=post.author,
+                notification_type='new_post',
+                message=f'{post.author.username} 发布了新帖子',
+                content_type=content_type,
+                object_id=post.id
+            )
+            for follower_id in follower_ids
+        ], ignore_conflicts=True)
+
+    if len(rows) < chunk_size:
+        finish(post_id)
+        return None
+    save_checkpoint(post_id, rows[-1][0])
+    return rows[-1][0]
+
+
+def resume_stalled(stale_after=None):
+    """重新投递超过 ``stale_after`` 秒没有进展的扩散，返回投递数"""
+    from .tasks import notify_followers_chunk
+
+    stale_after = settings.NOTIFICATION_FANOUT['STALE_AFTER'] if stale_after is None else stale_after
+    store = get_store()
+    stalled = store.zrangebyscore(TOUCHED_KEY, '-inf', time.time() - stale_after)
+    for post_id in stalled:
+        after_id = int(store.zscore(CHECKPOINT_KEY, post_id) or 0)
+        save_checkpoint(post_id, after_id)
+        logger.warning(f'帖子 {post_id} 的通知扩散停滞，从关注记录 {after_id} 之后继续')
+        notify_followers_chunk.delay(int(post_id), after_id)
+    return len(stalled)
\ No newline at end of file
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:56
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_new_post_notifications(apps, schema_editor):
+    """删除重复的新帖子通知，每个接收者、帖子保留最早的一条"""
+    Notification = apps.get_model('notifications', 'Notification')
+    duplicates = (
+        Notification.objects.filter(notification_type='new_post')
+        .values('recipient', 'content_type', 'object_id')
+        .annotate(first_id=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for row in duplicates.iterator():
+        Notification.objects.filter(
+            notification_type='new_post',
+            recipient=row['recipient'],
+            content_type=row['content_type'],
+            object_id=row['object_id'],
+        ).exclude(id=row['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_new_post_notifications, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('notification_type', 'new_post')), fields=('recipient', 'content_type', 'object_id'), name='notifications_unique_new_post'),
+        ),
+    ]
@@ -73,6 +73,14 @@ class Notification(models.Model):
             models.Index(fields=['recipient', 'is_read', '-created_at']),
             models.Index(fields=['notification_type', '-created_at']),
         ]
+        constraints = [
+            # 每个粉丝对同一帖子只有一条新帖子通知（扩散的块被重放或并发执行时不重复写入）
+            models.UniqueConstraint(
+                fields=['recipient', 'content_type', 'object_id'],
+                condition=models.Q(notification_type='new_post'),
+                name='notifications_unique_new_post'
+            ),
+        ]
     
     def __str__(self):
         return f'{self.recipient.username}: {self.title}'
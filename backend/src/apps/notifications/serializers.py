@@ -1,7 +1,9 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import Notification, NotificationSettings, PushDevice
-from apps.users.serializers import UserSerializer
+from apps.users.cards import UserCardField
+from apps.core.compiled import CompiledListSerializer
+from apps.core.loaders import BatchedListSerializer
 
 User = get_user_model()
 
@@ -9,8 +11,8 @@ User = get_user_model()
 class NotificationSerializer(serializers.ModelSerializer):
     """通知序列化器"""
     
-    sender = UserSerializer(read_only=True)
-    recipient = UserSerializer(read_only=True)
+    sender = UserCardField(card='full')
+    recipient = UserCardField(card='full')
     content_object_data = serializers.SerializerMethodField()
     time_since = serializers.SerializerMethodField()
     
@@ -25,6 +27,7 @@ class NotificationSerializer(serializers.ModelSerializer):
         read_only_fields = [
             'id', 'recipient', 'sender', 'created_at', 'read_at'
         ]
+        list_serializer_class = BatchedListSerializer
     
     def get_content_object_data(self, obj):
         """获取关联对象的数据"""
@@ -94,6 +97,7 @@ class NotificationListSerializer(serializers.ModelSerializer):
             'id', 'sender', 'notification_type', 'title',
             'message', 'is_read', 'created_at', 'time_since'
         ]
+        list_serializer_class = CompiledListSerializer
     
     def get_sender(self, obj):
         """获取发送者信息"""
@@ -182,7 +186,7 @@ class NotificationSettingsUpdateSerializer(serializers.ModelSerializer):
 class PushDeviceSerializer(serializers.ModelSerializer):
     """推送设备序列化器"""
     
-    user = UserSerializer(read_only=True)
+    user = UserCardField(card='full')
     
     class Meta:
         model = PushDevice
@@ -195,6 +199,7 @@ class PushDeviceSerializer(serializers.ModelSerializer):
         read_only_fields = [
             'id', 'user', 'created_at', 'updated_at', 'last_used'
         ]
+        list_serializer_class = BatchedListSerializer
 
 
 class PushDeviceCreateSerializer(serializers.ModelSerializer):
@@ -313,6 +313,33 @@ def create_mention_notification(post_id, mentioned_usernames):
         logger.error(f'创建提及通知失败: {e}')
 
 
+@shared_task(bind=True, max_retries=3)
+def notify_followers_chunk(self, post_id, after_id=0):
+    """为一块粉丝写入新帖子通知，完成后投递下一块"""
+    from .fanout import notify_followers_chunk_now
+    
+    try:
+        next_after_id = notify_followers_chunk_now(post_id, after_id)
+    except Exception as exc:
+        logger.error(f'帖子 {post_id} 的通知扩散失败: {exc}')
+        raise self.retry(exc=exc, countdown=60 * (self.request.retries + 1))
+    
+    if next_after_id is not None:
+        notify_followers_chunk.delay(post_id, next_after_id)
+
+
+@shared_task
+def resume_notification_fanouts():
+    """重新投递停滞的新帖子通知扩散"""
+    from .fanout import resume_stalled
+    
+    try:
+        resume_stalled()
+        
+    except Exception as e:
+        logger.error(f'恢复通知扩散失败: {e}')
+
+
 @shared_task
 def cleanup_old_notifications():
     """清理旧通知"""
@@ -1,10 +1,13 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.core import mail
 from unittest.mock import patch, MagicMock
 from datetime import timedelta
 
+from .fanout import CHECKPOINT_KEY, notify_followers_chunk_now, resume_stalled
 from .models import Notification, NotificationSettings, PushDevice
 from .utils import NotificationManager, NotificationTemplateManager
 from .tasks import (
@@ -14,6 +17,7 @@ from .tasks import (
     cleanup_old_notifications
 )
 from apps.posts.models import Post, Like, Comment
+from apps.core.store import get_store, reset_store
 from apps.social.models import Follow
 
 User = get_user_model()
@@ -481,4 +485,108 @@ class NotificationAPITest(TestCase):
         
         self.assertEqual(response.status_code, 200)
         data = response.json()
-        self.assertEqual(data['count'], 1)
\ No newline at end of file
+        self.assertEqual(data['count'], 1)
+
+
+FANOUT = {'ASYNC': False, 'CHUNK_SIZE': 2, 'MAX_FOLLOWERS': 10, 'STALE_AFTER': 300}
+
+
+@override_settings(NOTIFICATION_FANOUT=FANOUT, COUNTER_BUFFER={'BUFFER_LOCAL_STORE': True})
+class NotificationFanoutTest(TestCase):
+    """新帖子通知分块扩散测试"""
+    
+    def setUp(self):
+        reset_store()
+        self.author = User.objects.create_user(
+            username='author',
+            email='author@test.com',
+            password='testpass123'
+        )
+        self.followers = [
+            User.objects.create_user(
+                username=f'fan{i}',
+                email=f'fan{i}@test.com',
+                password='testpass123'
+            )
+            for i in range(5)
+        ]
+        with patch('apps.notifications.tasks.create_follow_notification.delay'):
+            with self.captureOnCommitCallbacks(execute=True):
+                for follower in self.followers:
+                    Follow.objects.create(follower=follower, following=self.author)
+    
+    def notified(self, post):
+        return sorted(Notification.objects.filter(
+            notification_type='new_post', object_id=post.id
+        ).values_list('recipient_id', flat=True))
+    
+    def test_chunks_after_commit(self):
+        """测试通知在事务提交后分块写入，发帖事务中不写通知"""
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            post = Post.objects.create(author=self.author, content='新帖子')
+        self.assertEqual(self.notified(post), [])
+        
+        with CaptureQueriesContext(connection) as queries:
+            for callback in callbacks:
+                callback()
+        self.assertEqual(self.notified(post), sorted(user.id for user in self.followers))
+        inserts = [q for q in queries if q['sql'].startswith('INSERT') and 'INTO "notifications"' in q['sql']]
+        self.assertEqual(len(inserts), 3)
+    
+    @patch('apps.notifications.tasks.notify_followers_chunk.delay')
+    def test_resumes_from_checkpoint(self, mock_delay):
+        """测试异步扩散从进度处恢复，重放的块不重复写入"""
+        with override_settings(NOTIFICATION_FANOUT={**FANOUT, 'ASYNC': True}):
+            with self.captureOnCommitCallbacks(execute=True):
+                post = Post.objects.create(author=self.author, content='新帖子')
+        mock_delay.assert_called_once_with(post.id, 0)
+        
+        after_id = notify_followers_chunk_now(post.id, 0)
+        # 工作进程在写入下一块后、记录进度前崩溃
+        notify_followers_chunk_now(post.id, after_id)
+        get_store().zadd(CHECKPOINT_KEY, {post.id: after_id})
+        
+        mock_delay.reset_mock()
+        self.assertEqual(resume_stalled(stale_after=0), 1)
+        mock_delay.assert_called_once_with(post.id, after_id)
+        
+        next_after_id = after_id
+        while next_after_id is not None:
+            next_after_id = notify_followers_chunk_now(post.id, next_after_id)
+        self.assertEqual(self.notified(post), sorted(user.id for user in self.followers))
+        self.assertEqual(resume_stalled(stale_after=0), 0)
+    
+    @patch('apps.notifications.tasks.notify_followers_chunk.delay')
+    def test_small_fanout_inline_when_async(self, mock_delay):
+        """测试粉丝数不超过一块时直接写入，不投递任务"""
+        with override_settings(NOTIFICATION_FANOUT={**FANOUT, 'ASYNC': True, 'CHUNK_SIZE': 5}):
+            with self.captureOnCommitCallbacks(execute=True):
+                post = Post.objects.create(author=self.author, content='新帖子')
+        mock_delay.assert_not_called()
+        self.assertEqual(self.notified(post), sorted(user.id for user in self.followers))
+        self.assertFalse(get_store().exists(CHECKPOINT_KEY))
+    
+    def test_interleaved_chunks_do_not_duplicate(self):
+        """测试同一块的两次执行交错时（另一次已写入部分接收者），每个粉丝只有一条通知"""
+        with self.captureOnCommitCallbacks(execute=False):
+            post = Post.objects.create(author=self.author, content='新帖子')
+        Notification.objects.create(
+            recipient=self.followers[0],
+            sender=self.author,
+            notification_type='new_post',
+            message='另一次执行写入',
+            content_object=post
+        )
+        
+        after_id = 0
+        while after_id is not None:
+            after_id = notify_followers_chunk_now(post.id, after_id)
+        notify_followers_chunk_now(post.id, 0)
+        self.assertEqual(self.notified(post), sorted(user.id for user in self.followers))
+    
+    def test_skips_authors_above_threshold(self):
+        """测试粉丝数超过阈值的作者不发送新帖子通知"""
+        with override_settings(NOTIFICATION_FANOUT={**FANOUT, 'MAX_FOLLOWERS': 4}):
+            with self.captureOnCommitCallbacks(execute=True):
+                post = Post.objects.create(author=self.author, content='新帖子')
+        self.assertEqual(self.notified(post), [])
\ No newline at end of file
@@ -393,11 +393,13 @@ class NotificationTemplateManager:
             template_type: 模板类型
             sender: 发送者
             content_object: 关联对象
-            **kwargs: 模板变量
+            **kwargs: 模板变量（模板中的 ``{sender}`` 为发送者的用户名）
             
         Returns:
             创建的通知对象
         """
+        if sender is not None:
+            kwargs['sender'] = sender.username
         title, message = cls.render_template(template_type, **kwargs)
         
         return NotificationManager.create_notification(
@@ -447,7 +449,6 @@ def create_like_notification_helper(like_obj):
         template_type='like',
         sender=like_obj.user,
         content_object=like_obj.post,
-        sender=like_obj.user.username,
         content_type='帖子'
     )
 
@@ -464,7 +465,6 @@ def create_comment_notification_helper(comment_obj):
         template_type='comment',
         sender=comment_obj.author,
         content_object=comment_obj,
-        sender=comment_obj.author.username,
         content_type='帖子',
         content_preview=content_preview
     )
@@ -476,6 +476,5 @@ def create_follow_notification_helper(follow_obj):
         recipient=follow_obj.following,
         template_type='follow',
         sender=follow_obj.follower,
-        content_object=follow_obj.follower,
-        sender=follow_obj.follower.username
+        content_object=follow_obj.follower
     )
\ No newline at end of file
@@ -8,6 +8,8 @@ from datetime import timedelta
 from django.conf import settings
 
 from .models import Notification, NotificationSettings, PushDevice
+from apps.core.pagination import KeysetPagination
+from apps.core.streaming import StreamingListMixin
 from .serializers import (
     NotificationSerializer,
     NotificationListSerializer,
@@ -21,10 +23,11 @@ from .serializers import (
 )
 
 
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(StreamingListMixin, viewsets.ModelViewSet):
     """通知视图集"""
     
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         queryset = Notification.objects.filter(
@@ -0,0 +1,13 @@
+from apps.core.counters import CounterBuffer
+
+from .models import Post, Comment
+
+
+def get_post_counter():
+    """帖子计数（点赞、评论、转发、浏览）的写回缓冲"""
+    return CounterBuffer(Post, ('likes_count', 'comments_count', 'shares_count', 'views_count'))
+
+
+def get_comment_counter():
+    """评论计数（点赞、回复）的写回缓冲"""
+    return CounterBuffer(Comment, ('likes_count', 'replies_count'))
\ No newline at end of file
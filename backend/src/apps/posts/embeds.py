@@ -0,0 +1,60 @@
+"""被转发原帖的嵌入缓存
+
+转发总是指向最初的原帖，同一条热门帖子会被成千上万条转发嵌入。
+原帖的嵌入内容（正文、图片、标签等）与查看者无关，按 ``帖子ID + 更新时间`` 缓存，
+所有转发共用一份渲染结果；帖子编辑后 ``updated_at`` 变化，自然换用新键。
+计数和 is_liked 等随时变化或因人而异的字段在读取时覆盖。
+作者信息不随原帖缓存（作者改名、换头像不会改变原帖的 ``updated_at``），读取时从用户卡片缓存取出
+（见 apps.users.cards，用户资料变化时删除卡片），再叠加 is_following。
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.core.loaders import get_viewer_loader
+from apps.users.cards import get_card_loader
+
+# 读取时用实例上的最新值覆盖的字段
+COUNT_FIELDS = ('likes_count', 'comments_count', 'shares_count', 'views_count')
+
+
+def embed_key(post):
+    return f'posts:embed:{post.id}:{post.updated_at.timestamp():.6f}'
+
+
+def attach_embeds(posts, context):
+    """批量取出（或渲染并缓存）原帖的嵌入内容，挂在 ``_embed`` 上"""
+    from .serializers import EmbeddedPostSerializer
+
+    get_card_loader(context).queue('list', [post.author_id for post in posts])
+    posts = [post for post in posts if not hasattr(post, '_embed')]
+    if not posts:
+        return
+    keys = {post.id: embed_key(post) for post in posts}
+    cached = cache.get_many(set(keys.values()))
+
+    missing = [post for post in posts if keys[post.id] not in cached]
+    if missing:
+        rendered = EmbeddedPostSerializer(missing, many=True, context=context).data
+        fresh = {keys[post.id]: dict(data) for post, data in zip(missing, rendered)}
+        cache.set_many(fresh, settings.REPOSTS['EMBED_CACHE_TIMEOUT'])
+        cached.update(fresh)
+
+    for post in posts:
+        post._embed = cached[keys[post.id]]
+
+
+def render_embed(post, context):
+    """原帖的嵌入内容，叠加最新计数和当前用户状态"""
+    attach_embeds([post], context)
+    data = dict(post._embed)
+    for field in COUNT_FIELDS:
+        data[field] = getattr(post, field)
+
+    loader = get_viewer_loader(context)
+    data['is_liked'] = loader.get('liked_posts', post.id) if loader else False
+    card = get_card_loader(context).get('list', post.author_id)
+    data['author'] = card if card is None else dict(
+        card,
+        is_following=loader.get('following', post.author_id) if loader else False
+    )
+    return data
\ No newline at end of file
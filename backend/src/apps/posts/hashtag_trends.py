@@ -0,0 +1,117 @@
+"""话题标签趋势
+
+``Hashtag.posts_count`` 是累计值，无法反映"现在"什么话题最热。这里按时间分桶统计每个标签的使用次数，
+每个桶在共享存储中保存两份数据：
+
+- Count-Min Sketch：``hashtags:cms:{桶长}:{桶号}``，成员为 ``行:列``，分数为计数。
+  每个标签按 DEPTH 个哈希各落在一行的一列上，估计值取各行计数的最小值（只会高估，不会低估），
+  内存占用与标签种类无关。
+- Top-K：``hashtags:top:{桶长}:{桶号}``，保存该桶内估计次数最高的 TOP_K 个标签。
+
+查询某个时间窗口时，取窗口内各桶 Top-K 的并集作为候选，再用各桶的 Sketch 估计值求和排序，
+全程不扫描 ``post_hashtags``。桶键自动过期。
+"""
+import time
+from hashlib import blake2b
+
+from django.conf import settings
+from django.db import transaction
+
+from apps.core.store import get_store
+
+
+class HashtagTrends:
+    """滑动窗口话题标签趋势"""
+
+    cms_key = 'hashtags:cms:{}:{}'
+    top_key = 'hashtags:top:{}:{}'
+
+    def __init__(self, store=None):
+        config = settings.HASHTAG_TRENDS
+        self.store = store if store is not None else get_store()
+        self.width = config['CMS_WIDTH']
+        self.depth = config['CMS_DEPTH']
+        self.top_k = config['TOP_K']
+        self.windows = config['WINDOWS']
+
+        # 每种桶长的保留时间取使用它的最长窗口
+        self.ttl = {}
+        for bucket_seconds, buckets in self.windows.values():
+            ttl = bucket_seconds * (buckets + 1)
+            self.ttl[bucket_seconds] = max(self.ttl.get(bucket_seconds, 0), ttl)
+
+    def cells(self, name):
+        """标签在 Sketch 每一行中的位置（跨进程稳定的哈希）"""
+        digest = blake2b(name.encode(), digest_size=4 * self.depth).digest()
+        return [
+            f'{row}:{int.from_bytes(digest[row * 4:row * 4 + 4], "little") % self.width}'
+            for row in range(self.depth)
+        ]
+
+    def record(self, names, now=None):
+        """记录一批标签各被使用一次"""
+        names = list(dict.fromkeys(names))
+        if not names:
+            return
+        now = time.time() if now is None else now
+        buckets = [(size, int(now // size)) for size in self.ttl]
+
+        pipe = self.store.pipeline(transaction=False)
+        for size, bucket in buckets:
+            key = self.cms_key.format(size, bucket)
+            for name in names:
+                for cell in self.cells(name):
+                    pipe.zincrby(key, 1, cell)
+            pipe.expire(key, self.ttl[size])
+        results = iter(pipe.execute())
+
+        pipe = self.store.pipeline(transaction=False)
+        for size, bucket in buckets:
+            key = self.top_key.format(size, bucket)
+            estimates = {
+                name: min(next(results) for _ in range(self.depth))
+                for name in names
+            }
+            next(results)  # expire
+            pipe.zadd(key, estimates)
+            pipe.zremrangebyrank(key, 0, -self.top_k - 1)
+            pipe.expire(key, self.ttl[size])
+        pipe.execute()
+
+    def top(self, window, limit=10, now=None):
+        """时间窗口内使用次数最高的标签，返回 [(标签名, 估计次数)]"""
+        size, count = self.windows[window]
+        now = time.time() if now is None else now
+        current = int(now // size)
+        buckets = range(current - count + 1, current + 1)
+
+        pipe = self.store.pipeline(transaction=False)
+        for bucket in buckets:
+            pipe.zrange(self.top_key.format(size, bucket), 0, -1)
+        candidates = list(set().union(*pipe.execute()))
+        if not candidates:
+            return []
+
+        cells = [cell for name in candidates for cell in self.cells(name)]
+        pipe = self.store.pipeline(transaction=False)
+        for bucket in buckets:
+            pipe.zmscore(self.cms_key.format(size, bucket), cells)
+
+        totals = dict.fromkeys(candidates, 0)
+        for scores in pipe.execute():
+            for i, name in enumerate(candidates):
+                row_counts = scores[i * self.depth:(i + 1) * self.depth]
+                totals[name] += min(score or 0 for score in row_counts)
+
+        ranked = sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+        return [(name, int(total)) for name, total in ranked[:limit] if total > 0]
+
+
+def get_hashtag_trends():
+    return HashtagTrends()
+
+
+def schedule_record(names):
+    """事务提交后记录标签使用"""
+    names = list(names)
+    transaction.on_commit(lambda: get_hashtag_trends().record(names))
\ No newline at end of file
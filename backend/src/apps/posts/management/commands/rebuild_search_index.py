@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from apps.posts.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = '重建帖子全文检索文档'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='每批处理的帖子数（默认1000）'
+        )
+    
+    def handle(self, *args, **options):
+        self.stdout.write('开始重建帖子检索索引...')
+        total = rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'重建完成：共写入 {total} 条检索文档')
+        )
\ No newline at end of file
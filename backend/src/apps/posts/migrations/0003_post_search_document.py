@@ -0,0 +1,108 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# 各数据库的全文索引（检索文档已在Python中分词，见 apps.posts.search）
+FULLTEXT_SQL = {
+    'sqlite': (
+        [
+            "CREATE VIRTUAL TABLE post_search_fts USING fts5("
+            "document, content='post_search_documents', content_rowid='post_id')",
+            "CREATE TRIGGER post_search_documents_ai AFTER INSERT ON post_search_documents BEGIN "
+            "INSERT INTO post_search_fts(rowid, document) VALUES (new.post_id, new.document); END",
+            "CREATE TRIGGER post_search_documents_ad AFTER DELETE ON post_search_documents BEGIN "
+            "INSERT INTO post_search_fts(post_search_fts, rowid, document) "
+            "VALUES ('delete', old.post_id, old.document); END",
+            "CREATE TRIGGER post_search_documents_au AFTER UPDATE ON post_search_documents BEGIN "
+            "INSERT INTO post_search_fts(post_search_fts, rowid, document) "
+            "VALUES ('delete', old.post_id, old.document); "
+            "INSERT INTO post_search_fts(rowid, document) VALUES (new.post_id, new.document); END",
+        ],
+        [
+            "DROP TRIGGER IF EXISTS post_search_documents_au",
+            "DROP TRIGGER IF EXISTS post_search_documents_ad",
+            "DROP TRIGGER IF EXISTS post_search_documents_ai",
+            "DROP TABLE IF EXISTS post_search_fts",
+        ],
+    ),
+    'mysql': (
+        [
+            "ALTER TABLE post_search_documents "
+            "ADD FULLTEXT INDEX post_search_documents_ft (document) WITH PARSER ngram",
+        ],
+        [
+            "ALTER TABLE post_search_documents DROP INDEX post_search_documents_ft",
+        ],
+    ),
+    'postgresql': (
+        [
+            "CREATE INDEX post_search_documents_tsv ON post_search_documents "
+            "USING GIN (to_tsvector('simple', document))",
+        ],
+        [
+            "DROP INDEX IF EXISTS post_search_documents_tsv",
+        ],
+    ),
+}
+
+
+def create_fulltext_index(apps, schema_editor):
+    for sql in FULLTEXT_SQL.get(schema_editor.connection.vendor, ([], []))[0]:
+        schema_editor.execute(sql)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    for sql in FULLTEXT_SQL.get(schema_editor.connection.vendor, ([], []))[1]:
+        schema_editor.execute(sql)
+
+
+def backfill_search_documents(apps, schema_editor):
+    """为已有的帖子生成检索文档（在全文索引之后写入，由触发器或索引同步）"""
+    from apps.posts.search import build_document
+
+    Post = apps.get_model('posts', 'Post')
+    PostSearchDocument = apps.get_model('posts', 'PostSearchDocument')
+    last_id = 0
+    while True:
+        posts = list(
+            Post.objects.filter(id__gt=last_id, is_deleted=False)
+            .prefetch_related('hashtags__hashtag')
+            .order_by('id')[:1000]
+        )
+        if not posts:
+            break
+        PostSearchDocument.objects.bulk_create([
+            PostSearchDocument(
+                post=post,
+                document=build_document(post.content, [item.hashtag.name for item in post.hashtags.all()])
+            )
+            for post in posts
+        ])
+        last_id = posts[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearchDocument',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='posts.post', verbose_name='帖子')),
+                ('document', models.TextField(blank=True, verbose_name='检索文档')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '帖子检索文档',
+                'verbose_name_plural': '帖子检索文档',
+                'db_table': 'post_search_documents',
+            },
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+    ]
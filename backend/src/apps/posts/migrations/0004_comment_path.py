@@ -0,0 +1,58 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:33
+
+from django.db import migrations, models
+from django.db.models import Q
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def encode_path_step(value):
+    digits = ''
+    while value:
+        value, remainder = divmod(value, 36)
+        digits = DIGITS[remainder] + digits
+    return digits.rjust(8, '0') + '/'
+
+
+def backfill_comment_paths(apps, schema_editor):
+    """逐层回填已有评论的路径：每轮处理父评论路径已确定的评论"""
+    Comment = apps.get_model('posts', 'Comment')
+    while True:
+        batch = list(
+            Comment.objects.filter(path='')
+            .filter(Q(parent__isnull=True) | ~Q(parent__path=''))
+            .select_related('parent')
+            .order_by('id')[:1000]
+        )
+        if not batch:
+            break
+        for comment in batch:
+            parent = comment.parent
+            comment.path = (parent.path if parent else '') + encode_path_step(comment.id)
+            comment.depth = parent.depth + 1 if parent else 0
+        Comment.objects.bulk_update(batch, ['path', 'depth'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_post_search_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='层级'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='路径'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='comments_post_id_5f9abc_idx'),
+        ),
+        migrations.RunPython(backfill_comment_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:36
+
+from django.db import migrations, models
+
+
+def flatten_repost_chains(apps, schema_editor):
+    """把已有的转发链指向最初的原帖
+
+    指针跳跃：每一轮把"原帖还有原帖"的转发改指向原帖的原帖，层级相加，
+    始终保持 repost_depth 等于到当前指向帖子的转发次数。
+    """
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.filter(original_post__isnull=False).update(repost_depth=1)
+    while True:
+        batch = list(
+            Post.objects.filter(original_post__original_post__isnull=False)
+            .select_related('original_post')
+            .order_by('id')[:1000]
+        )
+        if not batch:
+            break
+        for post in batch:
+            original = post.original_post
+            post.repost_depth += original.repost_depth
+            post.original_post_id = original.original_post_id
+        Post.objects.bulk_update(batch, ['original_post', 'repost_depth'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_comment_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='repost_depth',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='转发层级'),
+        ),
+        migrations.RunPython(flatten_repost_chains, migrations.RunPython.noop),
+    ]
@@ -53,6 +53,8 @@ class Post(models.Model):
         related_name='reposts',
         verbose_name=_('原帖')
     )
+    # 转发链上与最初原帖之间的转发次数（original_post 总是指向最初原帖）
+    repost_depth = models.PositiveSmallIntegerField(_('转发层级'), default=0)
     
     # 时间戳
     created_at = models.DateTimeField(_('创建时间'), auto_now_add=True)
@@ -72,6 +74,25 @@ class Post(models.Model):
     def __str__(self):
         return f'{self.author.username}: {self.content[:50]}...'
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 记录加载时是否已删除，保存时据此判断软删除/恢复（作者帖子数）
+        instance._loaded_is_deleted = instance.__dict__.get('is_deleted', False)
+        return instance
+    
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.original_post_id:
+            self.resolve_original()
+        super().save(*args, **kwargs)
+    
+    def resolve_original(self):
+        """把转发的转发指向最初的原帖，并记录转发层级"""
+        original = self.original_post
+        if original.original_post_id:
+            self.original_post = original.original_post
+        self.repost_depth = min(original.repost_depth + 1, 32767)
+    
     @property
     def is_reply(self):
         """是否为回复"""
@@ -180,6 +201,10 @@ class Comment(models.Model):
         verbose_name=_('父评论')
     )
     
+    # 物化路径：祖先到自身的ID依次编码，整棵子树是一个前缀区间
+    path = models.CharField(_('路径'), max_length=255, blank=True, default='')
+    depth = models.PositiveSmallIntegerField(_('层级'), default=0)
+    
     # 统计数据
     likes_count = models.PositiveIntegerField(_('点赞数'), default=0)
     replies_count = models.PositiveIntegerField(_('回复数'), default=0)
@@ -199,11 +224,27 @@ class Comment(models.Model):
         indexes = [
             models.Index(fields=['post', '-created_at']),
             models.Index(fields=['author', '-created_at']),
+            models.Index(fields=['post', 'path']),
         ]
     
+    # 路径中每层ID的编码宽度（36进制），以及由此决定的最大层级
+    PATH_STEP = 8
+    MAX_DEPTH = 255 // (PATH_STEP + 1) - 1
+    
     def __str__(self):
         return f'{self.author.username}: {self.content[:50]}...'
     
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # 新评论插入后才有ID，随即写入路径
+        if not self.path:
+            from .threads import encode_path_step
+            
+            parent_path = self.parent.path if self.parent_id else ''
+            self.path = parent_path + encode_path_step(self.id)
+            self.depth = self.parent.depth + 1 if self.parent_id else 0
+            Comment.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+    
     @property
     def is_reply(self):
         """是否为回复评论"""
@@ -284,4 +325,32 @@ class PostHashtag(models.Model):
         unique_together = ['post', 'hashtag']
     
     def __str__(self):
-        return f'{self.post.id} - {self.hashtag.name}'
\ No newline at end of file
+        return f'{self.post.id} - {self.hashtag.name}'
+
+
+class PostSearchDocument(models.Model):
+    """帖子全文检索文档
+
+    ``document`` 保存分词后的正文和标签（以空格分隔），
+    由数据库各自的全文索引（SQLite FTS5 / MySQL FULLTEXT / PostgreSQL tsvector）检索，
+    见 ``apps.posts.search``。
+    """
+    
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document',
+        verbose_name=_('帖子')
+    )
+    
+    document = models.TextField(_('检索文档'), blank=True)
+    updated_at = models.DateTimeField(_('更新时间'), auto_now=True)
+    
+    class Meta:
+        db_table = 'post_search_documents'
+        verbose_name = _('帖子检索文档')
+        verbose_name_plural = _('帖子检索文档')
+    
+    def __str__(self):
+        return f'{self.post_id}'
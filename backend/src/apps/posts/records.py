@@ -0,0 +1,164 @@
+"""帖子记录缓存（按ID列表批量取出帖子）
+
+时间线、热门、话题、搜索等列表最终都是"渲染这些帖子ID"，原来每个接口各自关联查询
+``post_images``、``hashtags__hashtag``。这里把带预取关系的帖子实例缓存为"记录"，两级缓存：
+
+- 进程内LRU：命中时不经过网络，条目在 ``LOCAL_TTL`` 秒后过期（其他进程的失效通知不到这里）；
+- 共享缓存（Django cache）：所有进程共用。
+
+两级都未命中的帖子一次批量查询取出并写回。取出的实例每次都是反序列化的新对象，
+序列化器叠加计数、挂上评论等修改不会影响缓存。
+
+帖子、图片、标签保存或删除，以及计数写回数据库后删除对应记录（见 signals.py）。
+作者信息不放在记录里，由用户卡片缓存提供（见 apps.users.cards）。
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+RECORD_KEY = 'posts:record:{}'
+
+
+class LocalLRU:
+    """进程内LRU缓存，条目带过期时间"""
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is None:
+                    continue
+                expires, value = entry
+                if expires <= now:
+                    del self._data[key]
+                    continue
+                self._data.move_to_end(key)
+                found[key] = value
+        return found
+
+    def set_many(self, mapping):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in mapping.items():
+                self._data[key] = (expires, value)
+                self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_local = None
+
+
+def _local_cache():
+    global _local
+    if _local is None:
+        config = settings.POST_RECORDS
+        _local = LocalLRU(config['LOCAL_SIZE'], config['LOCAL_TTL'])
+    return _local
+
+
+class PostRecordCache:
+    """帖子记录的两级缓存"""
+
+    def __init__(self):
+        self.local = _local_cache()
+        self.timeout = settings.POST_RECORDS['TIMEOUT']
+
+    @staticmethod
+    def key(post_id):
+        return RECORD_KEY.format(post_id)
+
+    def get_many(self, post_ids):
+        """返回 ``{帖子ID: 帖子}``，不存在的帖子不在结果中"""
+        return {post_id: pickle.loads(blob) for post_id, blob in self.blobs(post_ids).items()}
+
+    def blobs(self, post_ids):
+        """依次读取进程内缓存、共享缓存和数据库，返回 ``{帖子ID: 序列化后的记录}``"""
+        keys = {self.key(post_id): post_id for post_id in set(post_ids)}
+        if not keys:
+            return {}
+
+        blobs = self.local.get_many(keys)
+        missing = [key for key in keys if key not in blobs]
+        if missing:
+            shared = cache.get_many(missing)
+            self.local.set_many(shared)
+            blobs.update(shared)
+
+        loaded = self.load([keys[key] for key in keys if key not in blobs])
+        if loaded:
+            fresh = {self.key(post_id): blob for post_id, blob in loaded.items()}
+            cache.set_many(fresh, self.timeout)
+            self.local.set_many(fresh)
+            blobs.update(fresh)
+
+        return {keys[key]: blob for key, blob in blobs.items()}
+
+    @staticmethod
+    def load(post_ids):
+        """一次批量查询取出缓存未命中的帖子，返回 ``{帖子ID: 序列化后的记录}``"""
+        from .models import Post
+
+        if not post_ids:
+            return {}
+        posts = Post.objects.filter(id__in=post_ids).prefetch_related(
+            'post_images', 'hashtags__hashtag'
+        )
+        return {post.id: pickle.dumps(post, pickle.HIGHEST_PROTOCOL) for post in posts}
+
+    def hydrate(self, post_ids, include_deleted=False):
+        """按给定顺序返回帖子（跳过不存在和已删除的），并挂上被转发的原帖
+
+        原帖即使也在本页中，也是单独的实例（叠加计数时不会重复叠加）。
+        """
+        blobs = self.blobs(post_ids)
+        posts = [pickle.loads(blobs[post_id]) for post_id in post_ids if post_id in blobs]
+        if not include_deleted:
+            posts = [post for post in posts if not post.is_deleted]
+
+        original_ids = {post.original_post_id for post in posts if post.original_post_id}
+        if original_ids - set(blobs):
+            blobs.update(self.blobs(original_ids - set(blobs)))
+        for post in posts:
+            if post.original_post_id in blobs:
+                post.original_post = pickle.loads(blobs[post.original_post_id])
+        return posts
+
+    def invalidate(self, *post_ids):
+        """删除帖子记录；提交后再删除一次，避免事务期间其他请求写回旧数据"""
+        keys = [self.key(post_id) for post_id in post_ids if post_id is not None]
+        if not keys:
+            return
+        self.local.delete_many(keys)
+        cache.delete_many(keys)
+
+        def delete():
+            self.local.delete_many(keys)
+            cache.delete_many(keys)
+        transaction.on_commit(delete)
+
+
+def get_post_records():
+    return PostRecordCache()
\ No newline at end of file
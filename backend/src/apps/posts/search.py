@@ -0,0 +1,199 @@
+"""帖子全文检索
+
+``?search=`` 原本使用 ``content__icontains`` 加标签连表，每次搜索都要全表扫描。
+这里为每个帖子维护一份检索文档（``PostSearchDocument``），交给数据库自带的全文索引：
+
+- SQLite：FTS5 虚拟表 ``post_search_fts``（外部内容表，触发器同步），按 bm25 排序
+- MySQL：``FULLTEXT ... WITH PARSER ngram`` 索引，按 MATCH 相关度排序
+- PostgreSQL：``to_tsvector('simple', document)`` 表达式GIN索引，按 ts_rank 排序
+
+中文没有空格分词，文档和查询都先在Python中切分：连续的中日韩字符切成重叠的二元组，
+其余字母数字按词切分。三种数据库因此都只需做按空格分词的精确匹配。
+"""
+import logging
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+_CJK = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af'
+_TOKEN_RE = re.compile(rf'[{_CJK}]+|[^\W_{_CJK}]+')
+_CJK_RE = re.compile(rf'[{_CJK}]')
+
+
+def tokenize(text, document=False):
+    """切分文本：中日韩字符取二元组（单字保留原字），其余按词
+
+    切分文档时额外保留每段中文的最后一个字，使任意单字都是某个词的前缀。
+    """
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    tokens = []
+    for run in _TOKEN_RE.findall(text):
+        if _CJK_RE.match(run) and len(run) > 1:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            if document:
+                tokens.append(run[-1])
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def build_document(content, hashtag_names=()):
+    return ' '.join(tokenize(' '.join([content, *hashtag_names]), document=True))
+
+
+def parse_query(query, max_terms=32):
+    """把搜索词切分为 [(词, 是否前缀匹配)]
+
+    文档中的中文以二元组存储，单个汉字的查询按前缀匹配。
+    """
+    terms = []
+    for token in dict.fromkeys(tokenize(query)):
+        terms.append((token, len(token) == 1 and bool(_CJK_RE.match(token))))
+    return terms[:max_terms]
+
+
+class SQLiteSearchBackend:
+    """SQLite FTS5"""
+
+    sql = (
+        'SELECT rowid FROM post_search_fts WHERE post_search_fts MATCH %s '
+        'ORDER BY bm25(post_search_fts) LIMIT %s'
+    )
+
+    def expression(self, terms):
+        return ' '.join(f'"{token}"*' if prefix else f'"{token}"' for token, prefix in terms)
+
+    def search(self, cursor, terms, limit):
+        cursor.execute(self.sql, [self.expression(terms), limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+class MySQLSearchBackend:
+    """MySQL FULLTEXT（ngram 解析器）"""
+
+    sql = (
+        'SELECT post_id FROM post_search_documents '
+        'WHERE MATCH(document) AGAINST(%s IN BOOLEAN MODE) '
+        'ORDER BY MATCH(document) AGAINST(%s IN BOOLEAN MODE) DESC LIMIT %s'
+    )
+
+    def expression(self, terms):
+        return ' '.join(f'+{token}*' if prefix else f'+"{token}"' for token, prefix in terms)
+
+    def search(self, cursor, terms, limit):
+        expression = self.expression(terms)
+        cursor.execute(self.sql, [expression, expression, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+class PostgreSQLSearchBackend:
+    """PostgreSQL tsvector（simple 配置，不做词干化）"""
+
+    sql = (
+        "SELECT post_id FROM post_search_documents "
+        "WHERE to_tsvector('simple', document) @@ to_tsquery('simple', %s) "
+        "ORDER BY ts_rank(to_tsvector('simple', document), to_tsquery('simple', %s)) DESC LIMIT %s"
+    )
+
+    def expression(self, terms):
+        return ' & '.join(f'{token}:*' if prefix else token for token, prefix in terms)
+
+    def search(self, cursor, terms, limit):
+        expression = self.expression(terms)
+        cursor.execute(self.sql, [expression, expression, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+class FallbackSearchBackend:
+    """其他数据库：在检索文档上做子串匹配（仍然避免了标签连表）"""
+
+    def search(self, cursor, terms, limit):
+        from .models import PostSearchDocument
+
+        queryset = PostSearchDocument.objects.all()
+        for token, _ in terms:
+            queryset = queryset.filter(document__contains=token)
+        return list(queryset.order_by('-post_id').values_list('post_id', flat=True)[:limit])
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'mysql': MySQLSearchBackend,
+    'postgresql': PostgreSQLSearchBackend,
+}
+
+
+def get_search_backend():
+    return BACKENDS.get(connection.vendor, FallbackSearchBackend)()
+
+
+def search_posts(query, limit=None):
+    """按相关度返回匹配的帖子ID"""
+    terms = parse_query(query)
+    if not terms:
+        return []
+    limit = limit or settings.POST_SEARCH['MAX_RESULTS']
+    with connection.cursor() as cursor:
+        return get_search_backend().search(cursor, terms, limit)
+
+
+# 索引维护
+
+def index_post(post_id):
+    """更新一个帖子的检索文档，帖子已删除时移除文档"""
+    from .models import Post, PostSearchDocument
+
+    post = Post.objects.filter(id=post_id, is_deleted=False).first()
+    if post is None:
+        PostSearchDocument.objects.filter(post_id=post_id).delete()
+        return
+    hashtag_names = post.hashtags.values_list('hashtag__name', flat=True)
+    PostSearchDocument.objects.update_or_create(
+        post_id=post_id,
+        defaults={'document': build_document(post.content, hashtag_names)}
+    )
+
+
+def schedule_index(post_id):
+    """事务提交后更新检索文档"""
+    transaction.on_commit(lambda: index_post(post_id))
+
+
+def rebuild_index(batch_size=1000):
+    """重建所有帖子的检索文档，返回写入的文档数"""
+    from .models import Post, PostSearchDocument
+
+    total = 0
+    last_id = 0
+    while True:
+        posts = list(
+            Post.objects.filter(id__gt=last_id, is_deleted=False)
+            .prefetch_related('hashtags__hashtag')
+            .order_by('id')[:batch_size]
+        )
+        if not posts:
+            break
+        PostSearchDocument.objects.bulk_create(
+            [
+                PostSearchDocument(
+                    post=post,
+                    document=build_document(
+                        post.content, [item.hashtag.name for item in post.hashtags.all()]
+                    )
+                )
+                for post in posts
+            ],
+            update_conflicts=True,
+            unique_fields=['post'] if connection.features.supports_update_conflicts_with_target else None,
+            update_fields=['document', 'updated_at']
+        )
+        total += len(posts)
+        last_id = posts[-1].id
+
+    PostSearchDocument.objects.filter(post__is_deleted=True).delete()
+    logger.info(f'帖子检索索引重建完成，共 {total} 条')
+    return total
\ No newline at end of file
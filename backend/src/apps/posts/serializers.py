@@ -1,7 +1,17 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Post, Comment, Like, CommentLike, Hashtag, PostImage
-from apps.users.serializers import UserListSerializer
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Post, Comment, Like, CommentLike, Hashtag, PostHashtag, PostImage
+from apps.users.cards import UserCardField, get_card_loader
+from apps.core.compiled import CompiledListSerializer
+from apps.core.loaders import BatchedListSerializer, get_viewer_loader
+from apps.social.blocks import get_block_filter
+from .counters import get_post_counter, get_comment_counter
+from .hashtag_trends import schedule_record
+from .threads import attach_replies, attach_top_comments
+from .embeds import attach_embeds, render_embed
 
 User = get_user_model()
 
@@ -24,10 +34,19 @@ class HashtagSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'posts_count')
 
 
+class TrendingHashtagSerializer(serializers.Serializer):
+    """趋势话题标签序列化器"""
+    
+    id = serializers.IntegerField(allow_null=True)
+    name = serializers.CharField()
+    posts_count = serializers.IntegerField()
+    recent_count = serializers.IntegerField()
+
+
 class CommentSerializer(serializers.ModelSerializer):
     """评论序列化器"""
     
-    author = UserListSerializer(read_only=True)
+    author = UserCardField()
     is_liked = serializers.SerializerMethodField()
     replies = serializers.SerializerMethodField()
     
@@ -40,28 +59,56 @@ class CommentSerializer(serializers.ModelSerializer):
         read_only_fields = (
             'id', 'author', 'likes_count', 'replies_count', 'created_at', 'updated_at'
         )
+        list_serializer_class = CompiledListSerializer
+    
+    reply_limit = 3
+    
+    def prime_viewer_state(self, instances, loader):
+        comments = self.flatten_thread(instances)
+        loader.queue('liked_comments', [obj.id for obj in comments])
+        loader.queue('following', [obj.author_id for obj in comments])
+    
+    def prime_instances(self, instances):
+        """一次查询挂上整页评论的回复楼层，叠加尚未写回数据库的计数，登记整个楼层的作者卡片
+
+        嵌套的回复列表在顶层已经处理过，这里直接跳过。
+        """
+        fresh = [obj for obj in instances if not hasattr(obj, '_thread_replies')]
+        replies = attach_replies(fresh, self.reply_limit)
+        get_comment_counter().overlay(fresh + replies)
+        get_card_loader(self.context).queue('list', [obj.author_id for obj in fresh + replies])
+    
+    @staticmethod
+    def flatten_thread(instances):
+        comments = []
+        pending = list(instances)
+        while pending:
+            comment = pending.pop()
+            comments.append(comment)
+            pending.extend(getattr(comment, '_thread_replies', []))
+        return comments
     
     def get_is_liked(self, obj):
         """检查当前用户是否点赞了该评论"""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return CommentLike.objects.filter(
-                user=request.user, comment=obj
-            ).exists()
+        loader = get_viewer_loader(self.context)
+        if loader:
+            return loader.get('liked_comments', obj.id)
         return False
     
     def get_replies(self, obj):
         """获取评论的回复（只显示前3条）"""
-        if obj.replies.exists():
-            replies = obj.replies.filter(is_deleted=False)[:3]
-            return CommentSerializer(replies, many=True, context=self.context).data
-        return []
+        if not hasattr(obj, '_thread_replies'):
+            self.prime_instances([obj])
+        replies = get_block_filter(self.context.get('request')).comments(obj._thread_replies)
+        if not replies:
+            return []
+        return CommentSerializer(replies, many=True, context=self.context).data
 
 
 class PostSerializer(serializers.ModelSerializer):
     """帖子序列化器"""
     
-    author = UserListSerializer(read_only=True)
+    author = UserCardField()
     images = PostImageSerializer(source='post_images', many=True, read_only=True)
     hashtags = HashtagSerializer(many=True, read_only=True)
     is_liked = serializers.SerializerMethodField()
@@ -73,32 +120,54 @@ class PostSerializer(serializers.ModelSerializer):
         fields = (
             'id', 'author', 'content', 'images', 'video', 'hashtags',
             'likes_count', 'comments_count', 'shares_count', 'views_count',
-            'is_pinned', 'is_deleted', 'parent', 'original_post',
+            'is_pinned', 'is_deleted', 'parent', 'original_post', 'repost_depth',
             'created_at', 'updated_at', 'is_liked', 'comments'
         )
         read_only_fields = (
             'id', 'author', 'likes_count', 'comments_count', 'shares_count',
-            'views_count', 'created_at', 'updated_at'
+            'views_count', 'repost_depth', 'created_at', 'updated_at'
         )
+        list_serializer_class = BatchedListSerializer
+    
+    comment_limit = 5
+    
+    def prime_viewer_state(self, instances, loader):
+        posts = instances + self.originals(instances)
+        loader.queue('liked_posts', [obj.id for obj in posts])
+        loader.queue('following', [obj.author_id for obj in posts])
+        comments = [comment for obj in instances for comment in getattr(obj, '_top_comments', [])]
+        CommentSerializer(context=self.context).prime_viewer_state(comments, loader)
+    
+    def prime_instances(self, instances):
+        """叠加尚未写回数据库的计数，一次查询取出整页帖子的前5条评论及其楼层，批量读取原帖嵌入缓存"""
+        originals = self.originals(instances)
+        get_post_counter().overlay(instances + originals)
+        comments = attach_top_comments(instances, self.comment_limit)
+        CommentSerializer(context=self.context).prime_instances(comments)
+        attach_embeds(originals, self.context)
+    
+    @staticmethod
+    def originals(instances):
+        return [obj.original_post for obj in instances if obj.original_post_id]
     
     def get_is_liked(self, obj):
         """检查当前用户是否点赞了该帖子"""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return Like.objects.filter(user=request.user, post=obj).exists()
+        loader = get_viewer_loader(self.context)
+        if loader:
+            return loader.get('liked_posts', obj.id)
         return False
     
     def get_comments(self, obj):
         """获取帖子的评论（只显示前5条）"""
-        comments = obj.post_comments.filter(
-            is_deleted=False, parent__isnull=True
-        )[:5]
+        if not hasattr(obj, '_top_comments'):
+            attach_top_comments([obj], self.comment_limit)
+        comments = get_block_filter(self.context.get('request')).comments(obj._top_comments)
         return CommentSerializer(comments, many=True, context=self.context).data
     
     def get_original_post(self, obj):
         """获取转发的原帖信息"""
         if obj.original_post:
-            return PostSerializer(obj.original_post, context=self.context).data
+            return render_embed(obj.original_post, self.context)
         return None
     
     def create(self, validated_data):
@@ -107,6 +176,27 @@ class PostSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class EmbeddedPostSerializer(PostSerializer):
+    """被转发原帖的嵌入序列化器，只包含与查看者无关的字段（结果按帖子缓存，见 embeds.py）
+
+    作者只保存ID，读取时从用户卡片缓存填入。
+    """
+    
+    author = serializers.IntegerField(source='author_id', read_only=True)
+    
+    class Meta(PostSerializer.Meta):
+        fields = tuple(
+            field for field in PostSerializer.Meta.fields
+            if field not in ('original_post', 'comments', 'is_liked')
+        )
+    
+    def prime_viewer_state(self, instances, loader):
+        pass
+    
+    def prime_instances(self, instances):
+        pass
+
+
 class PostCreateSerializer(serializers.ModelSerializer):
     """帖子创建序列化器"""
     
@@ -130,25 +220,36 @@ class PostCreateSerializer(serializers.ModelSerializer):
         hashtag_names = validated_data.pop('hashtag_names', [])
         
         validated_data['author'] = self.context['request'].user
-        post = super().create(validated_data)
-        
-        # 处理图片
-        for i, image in enumerate(images_data):
-            PostImage.objects.create(
-                post=post,
-                image=image,
-                order=i
-            )
         
-        # 处理标签
-        for name in hashtag_names:
-            hashtag, created = Hashtag.objects.get_or_create(name=name)
-            post.hashtags.create(hashtag=hashtag)
-            if created:
-                hashtag.posts_count = 1
-            else:
-                hashtag.posts_count += 1
-            hashtag.save()
+        with transaction.atomic():
+            post = super().create(validated_data)
+            
+            # 处理图片
+            PostImage.objects.bulk_create([
+                PostImage(post=post, image=image, order=i)
+                for i, image in enumerate(images_data)
+            ])
+            
+            # 处理标签：无论多少个标签都是固定的4条语句，计数在数据库中原子递增
+            names = list(dict.fromkeys(name.strip() for name in hashtag_names if name.strip()))
+            if names:
+                Hashtag.objects.bulk_create(
+                    [Hashtag(name=name) for name in names],
+                    ignore_conflicts=True
+                )
+                hashtag_ids = list(
+                    Hashtag.objects.filter(name__in=names).values_list('id', flat=True)
+                )
+                PostHashtag.objects.bulk_create([
+                    PostHashtag(post=post, hashtag_id=hashtag_id)
+                    for hashtag_id in hashtag_ids
+                ])
+                Hashtag.objects.filter(id__in=hashtag_ids).update(
+                    posts_count=F('posts_count') + 1,
+                    updated_at=timezone.now()
+                )
+                # bulk_create 不触发 post_save，单独计入标签趋势
+                schedule_record(names)
         
         return post
 
@@ -160,6 +261,12 @@ class CommentCreateSerializer(serializers.ModelSerializer):
         model = Comment
         fields = ('content', 'parent')
     
+    def validate_parent(self, value):
+        """物化路径的长度有限，回复层级不能超过上限"""
+        if value is not None and value.depth >= Comment.MAX_DEPTH:
+            raise serializers.ValidationError('回复层级过深')
+        return value
+    
     def create(self, validated_data):
         """创建评论"""
         validated_data['author'] = self.context['request'].user
@@ -170,7 +277,7 @@ class CommentCreateSerializer(serializers.ModelSerializer):
 class PostListSerializer(serializers.ModelSerializer):
     """帖子列表序列化器（简化版）"""
     
-    author = UserListSerializer(read_only=True)
+    author = UserCardField()
     images = PostImageSerializer(source='post_images', many=True, read_only=True)
     is_liked = serializers.SerializerMethodField()
     
@@ -180,10 +287,19 @@ class PostListSerializer(serializers.ModelSerializer):
             'id', 'author', 'content', 'images', 'likes_count',
             'comments_count', 'shares_count', 'created_at', 'is_liked'
         )
+        list_serializer_class = CompiledListSerializer
+    
+    def prime_viewer_state(self, instances, loader):
+        loader.queue('liked_posts', [obj.id for obj in instances])
+        loader.queue('following', [obj.author_id for obj in instances])
+    
+    def prime_instances(self, instances):
+        """叠加尚未写回数据库的计数"""
+        get_post_counter().overlay(instances, ('likes_count', 'comments_count', 'shares_count'))
     
     def get_is_liked(self, obj):
         """检查当前用户是否点赞了该帖子"""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return Like.objects.filter(user=request.user, post=obj).exists()
+        loader = get_viewer_loader(self.context)
+        if loader:
+            return loader.get('liked_posts', obj.id)
         return False
\ No newline at end of file
@@ -1,7 +1,19 @@
-from django.db.models.signals import post_save, post_delete
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
 from django.contrib.contenttypes.models import ContentType
-from .models import Post, Comment, Like
+from .counters import get_post_counter
+from .models import Post, Comment, Like, CommentLike, PostHashtag, PostImage
+from .records import get_post_records
+from .search import schedule_index
+from .hashtag_trends import schedule_record
+from .timeline import get_timeline_store
+from .trending import get_trending_engine
+from apps.core.counters import counters_applied
+from apps.core.versions import bump_versions
+from apps.users.counters import schedule_incr
+from apps.notifications.fanout import start_fanout
 from apps.notifications.models import Notification
 
 
@@ -73,28 +85,201 @@ def create_comment_notification(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=Post)
 def create_post_notification(sender, instance, created, **kwargs):
-    """当用户发布新帖子时，通知关注者"""
+    """当用户发布新帖子时，事务提交后分块通知关注者"""
     if created:
-        # 获取所有关注该用户的用户
-        from apps.social.models import Follow
-        followers = Follow.objects.filter(
-            following=instance.author
-        ).select_related('follower')
-        
-        # 为每个关注者创建通知
-        notifications = []
-        for follow in followers:
-            notifications.append(
-                Notification(
-                    recipient=follow.follower,
-                    sender=instance.author,
-                    notification_type='new_post',
-                    message=f'{instance.author.username} 发布了新帖子',
-                    content_type=ContentType.objects.get_for_model(instance),
-                    object_id=instance.id
-                )
+        transaction.on_commit(lambda: start_fanout(instance))
+
+
+@receiver(post_save, sender=Post)
+def fanout_post_to_timelines(sender, instance, created, **kwargs):
+    """新帖子写扩散到粉丝的时间线"""
+    if not created:
+        return
+    
+    if settings.FEED_TIMELINE['FANOUT_ASYNC']:
+        from .tasks import fanout_post_to_timelines as fanout_task
+        transaction.on_commit(lambda: fanout_task.delay(instance.id))
+    else:
+        transaction.on_commit(lambda: get_timeline_store().fanout(instance))
+
+
+@receiver(post_delete, sender=Post)
+def remove_post_from_trending(sender, instance, **kwargs):
+    """帖子删除后移出热门榜"""
+    get_trending_engine().remove(instance.id)
+
+
+@receiver(post_save, sender=Post)
+def update_post_search_index(sender, instance, **kwargs):
+    """帖子创建、编辑或软删除后更新检索文档"""
+    schedule_index(instance.id)
+
+
+@receiver(post_save, sender=PostHashtag)
+@receiver(post_delete, sender=PostHashtag)
+def update_post_search_hashtags(sender, instance, **kwargs):
+    """帖子标签变化后更新检索文档"""
+    schedule_index(instance.post_id)
+
+
+@receiver(post_save, sender=PostHashtag)
+def record_hashtag_trend(sender, instance, created, **kwargs):
+    """新帖子使用标签时计入标签趋势"""
+    if created:
+        schedule_record([instance.hashtag.name])
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post_versions(sender, instance, **kwargs):
+    """帖子变化后使帖子详情、原帖详情（转发数）和作者统计的响应缓存失效"""
+    bump_versions(
+        ('post', instance.id),
+        ('post', instance.original_post_id),
+        ('user', instance.author_id)
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment_versions(sender, instance, **kwargs):
+    """评论变化后使所属帖子详情的响应缓存失效"""
+    bump_versions(('post', instance.post_id))
+
+
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+def bump_like_versions(sender, instance, **kwargs):
+    """点赞变化后使帖子详情、作者统计（获赞数）和点赞者的响应缓存失效"""
+    bump_versions(
+        ('post', instance.post_id),
+        ('user', instance.post.author_id),
+        ('viewer', instance.user_id)
+    )
+
+
+@receiver(post_save, sender=CommentLike)
+@receiver(post_delete, sender=CommentLike)
+def bump_comment_like_versions(sender, instance, **kwargs):
+    """评论点赞变化后使所属帖子详情和点赞者的响应缓存失效"""
+    bump_versions(('post', instance.comment.post_id), ('viewer', instance.user_id))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_record(sender, instance, **kwargs):
+    """帖子变化后删除其记录缓存"""
+    get_post_records().invalidate(instance.id)
+
+
+@receiver(post_save, sender=PostImage)
+@receiver(post_delete, sender=PostImage)
+@receiver(post_save, sender=PostHashtag)
+@receiver(post_delete, sender=PostHashtag)
+def invalidate_post_record_relations(sender, instance, **kwargs):
+    """帖子图片、标签变化后删除帖子的记录缓存"""
+    get_post_records().invalidate(instance.post_id)
+
+
+@receiver(counters_applied, sender=Post)
+def invalidate_flushed_post_records(sender, ids, **kwargs):
+    """计数写回数据库后删除记录缓存（记录中的计数已过时，缓冲中的增量已清空）"""
+    get_post_records().invalidate(*ids)
+
+
+def received_totals(post_id):
+    """帖子当前的点赞数、评论数：数据库值加上尚未写入的增量（实例上的计数可能已过时）"""
+    row = Post.objects.filter(id=post_id).values_list('likes_count', 'comments_count').first()
+    if row is None:
+        return 0, 0
+    pending = get_post_counter().unapplied_many([post_id], ('likes_count', 'comments_count'))
+    return (
+        max(row[0] + pending.get((post_id, 'likes_count'), 0), 0),
+        max(row[1] + pending.get((post_id, 'comments_count'), 0), 0),
+    )
+
+
+@receiver(post_save, sender=Post)
+def update_author_posts_count(sender, instance, created, **kwargs):
+    """发帖、软删除或恢复后累加作者的帖子数（批量写回）"""
+    if created:
+        amount = 0 if instance.is_deleted else 1
+        schedule_incr((instance.author_id, 'posts_count', amount))
+    else:
+        amount = int(getattr(instance, '_loaded_is_deleted', instance.is_deleted)) - int(instance.is_deleted)
+        if amount:
+            # 软删除或恢复时，帖子收到的点赞、评论一并移出或计回作者的统计
+            likes, comments = received_totals(instance.id)
+            schedule_incr(
+                (instance.author_id, 'posts_count', amount),
+                (instance.author_id, 'likes_received_count', amount * likes),
+                (instance.author_id, 'comments_received_count', amount * comments)
             )
-        
-        # 批量创建通知
-        if notifications:
-            Notification.objects.bulk_create(notifications)
\ No newline at end of file
+    instance._loaded_is_deleted = instance.is_deleted
+
+
+@receiver(pre_delete, sender=Post)
+def remember_received_totals(sender, instance, origin=None, **kwargs):
+    """删除帖子前记下它收到的点赞、评论数，并在 ``origin`` 上登记正在删除的帖子
+    （同一次级联删除的点赞、评论不再逐条扣减）"""
+    if not instance.is_deleted:
+        instance._received_totals = received_totals(instance.id)
+    if origin is not None:
+        if not hasattr(origin, '_deleting_post_ids'):
+            origin._deleting_post_ids = set()
+        origin._deleting_post_ids.add(instance.id)
+
+
+@receiver(post_delete, sender=Post)
+def decrement_author_posts_count(sender, instance, **kwargs):
+    """删除未软删除的帖子后减少作者的帖子数和收到的点赞、评论数"""
+    if not instance.is_deleted:
+        likes, comments = getattr(instance, '_received_totals', (0, 0))
+        schedule_incr(
+            (instance.author_id, 'posts_count', -1),
+            (instance.author_id, 'likes_received_count', -likes),
+            (instance.author_id, 'comments_received_count', -comments)
+        )
+
+
+@receiver(post_save, sender=Like)
+@receiver(post_save, sender=Comment)
+def increment_received_counts(sender, instance, created, **kwargs):
+    """点赞、评论后累加帖子作者收到的点赞数、评论数（批量写回）"""
+    if created and not instance.post.is_deleted and not getattr(instance, 'is_deleted', False):
+        field = 'likes_received_count' if sender is Like else 'comments_received_count'
+        schedule_incr((instance.post.author_id, field, 1))
+
+
+def _post_state(instance, origin):
+    """点赞、评论所属帖子的 (作者ID, 是否已删除)
+
+    优先使用实例上已缓存的帖子；级联删除时查询结果缓存在 ``origin`` 上，每个帖子只查询一次。
+    """
+    if instance._meta.get_field('post').is_cached(instance):
+        return instance.post.author_id, instance.post.is_deleted
+    memo = getattr(origin, '_received_post_state', None)
+    if memo is None:
+        memo = {}
+        if origin is not None:
+            origin._received_post_state = memo
+    if instance.post_id not in memo:
+        memo[instance.post_id] = Post.objects.filter(id=instance.post_id).values_list(
+            'author_id', 'is_deleted'
+        ).first()
+    return memo[instance.post_id]
+
+
+@receiver(post_delete, sender=Like)
+@receiver(post_delete, sender=Comment)
+def decrement_received_counts(sender, instance, origin=None, **kwargs):
+    """取消点赞、删除评论后减少帖子作者收到的点赞数、评论数
+
+    帖子已软删除，或在同一次删除中被删除（扣除帖子的总数）时跳过。
+    """
+    if getattr(instance, 'is_deleted', False) or instance.post_id in getattr(origin, '_deleting_post_ids', ()):
+        return
+    state = _post_state(instance, origin)
+    if state is not None and not state[1]:
+        field = 'likes_received_count' if sender is Like else 'comments_received_count'
+        schedule_incr((state[0], field, -1))
\ No newline at end of file
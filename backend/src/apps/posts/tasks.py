@@ -0,0 +1,50 @@
+from celery import shared_task
+import logging
+
+from .counters import get_post_counter, get_comment_counter
+from .models import Post
+from .timeline import get_timeline_store
+from .trending import get_trending_engine
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def fanout_post_to_timelines(post_id):
+    """把新帖子写扩散到粉丝的时间线"""
+    try:
+        post = Post.objects.get(id=post_id)
+        pushed = get_timeline_store().fanout(post)
+        logger.info(f'帖子 {post_id} 已推送到 {pushed} 条时间线')
+        
+    except Post.DoesNotExist:
+        logger.error(f'帖子 {post_id} 不存在')
+    except Exception as e:
+        logger.error(f'时间线写扩散失败: {e}')
+
+
+@shared_task
+def rescore_trending_posts():
+    """定时批量重算热门帖子热度"""
+    try:
+        get_trending_engine().rescore()
+        
+    except Exception as e:
+        logger.error(f'热门帖子重算失败: {e}')
+
+
+@shared_task
+def flush_engagement_counters():
+    """把缓冲的帖子和评论计数批量写回数据库"""
+    from apps.core.counters import prune_counter_batches
+    
+    for counter in (get_post_counter(), get_comment_counter()):
+        try:
+            flushed = counter.flush()
+            if flushed:
+                logger.info(f'计数器 {counter.key} 已写回 {flushed} 个对象')
+            
+        except Exception as e:
+            logger.error(f'计数器 {counter.key} 写回失败: {e}')
+    
+    prune_counter_batches()
\ No newline at end of file
@@ -0,0 +1,956 @@
+import json
+from importlib import import_module
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.core.cache import cache
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from unittest.mock import patch
+from datetime import timedelta
+
+from .counters import get_post_counter
+from .embeds import embed_key
+from .serializers import CommentSerializer, HashtagSerializer, PostListSerializer, PostSerializer
+from .models import Post, PostImage, Comment, Hashtag
+from .records import _local_cache, get_post_records
+from .search import rebuild_index, search_posts, tokenize
+from .hashtag_trends import get_hashtag_trends
+from .timeline import get_timeline_store
+from .trending import TrendingEngine, get_trending_engine
+from apps.core.compiled import get_renderer, nest_values
+from apps.core.pagination import KeysetPagination
+from apps.core.store import get_store, reset_store
+from apps.social.graph import get_social_graph
+from apps.social.models import Block, Follow
+from apps.users.search import get_user_search_index
+from apps.users.serializers import UserListSerializer
+
+User = get_user_model()
+
+
+def create_user(username):
+    return User.objects.create_user(
+        username=username,
+        email=f'{username}@test.com',
+        password='testpass123'
+    )
+
+
+@override_settings(FEED_TIMELINE={**settings.FEED_TIMELINE, 'CACHE_LOCAL_STORE': True})
+@patch('apps.notifications.tasks.create_follow_notification.delay')
+class TimelineStoreTest(TestCase):
+    """时间线存储测试"""
+    
+    def setUp(self):
+        reset_store()
+        self.author = create_user('author')
+        self.reader = create_user('reader')
+    
+    def create_post(self, author, content='测试帖子'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Post.objects.create(author=author, content=content)
+    
+    def test_rebuild_on_first_read(self, mock_task):
+        """测试首次读取时从数据库重建时间线"""
+        Follow.objects.create(follower=self.reader, following=self.author)
+        post = self.create_post(self.author)
+        own_post = self.create_post(self.reader)
+        
+        post_ids = get_timeline_store().post_ids(self.reader.id)
+        
+        self.assertEqual(post_ids, [own_post.id, post.id])
+    
+    def test_fanout_on_create(self, mock_task):
+        """测试新帖子写扩散到已构建的时间线"""
+        Follow.objects.create(follower=self.reader, following=self.author)
+        store = get_timeline_store()
+        self.assertEqual(store.post_ids(self.reader.id), [])
+        
+        post = self.create_post(self.author)
+        
+        self.assertEqual(store.post_ids(self.reader.id), [post.id])
+    
+    def test_unfollow_invalidates_timeline(self, mock_task):
+        """测试取消关注后时间线被重建"""
+        follow = Follow.objects.create(follower=self.reader, following=self.author)
+        self.create_post(self.author)
+        store = get_timeline_store()
+        self.assertEqual(len(store.post_ids(self.reader.id)), 1)
+        
+        follow.delete()
+        
+        self.assertEqual(store.post_ids(self.reader.id), [])
+    
+    @override_settings(FEED_TIMELINE={
+        'MAX_LENGTH': 2, 'CELEBRITY_THRESHOLD': 1, 'TTL': 60,
+        'FANOUT_ASYNC': False, 'FANOUT_BATCH_SIZE': 10, 'CACHE_LOCAL_STORE': True,
+    })
+    def test_celebrity_posts_merged_on_read(self, mock_task):
+        """测试大V帖子不写扩散而在读取时合并，并截断到固定长度"""
+        Follow.objects.create(follower=self.reader, following=self.author)
+        store = get_timeline_store()
+        store.post_ids(self.reader.id)
+        
+        posts = [self.create_post(self.author) for _ in range(3)]
+        
+        self.assertFalse(store.store.zscore(store.key(self.reader.id), posts[-1].id))
+        self.assertEqual(
+            store.post_ids(self.reader.id),
+            [posts[2].id, posts[1].id]
+        )
+    
+    @override_settings(FEED_TIMELINE={**settings.FEED_TIMELINE, 'CACHE_LOCAL_STORE': False})
+    def test_local_store_reads_database(self, mock_task):
+        """测试共享存储不能跨进程共享时不缓存时间线，其他进程发布的帖子立即可见"""
+        Follow.objects.create(follower=self.reader, following=self.author)
+        store = get_timeline_store()
+        first = self.create_post(self.author)
+        self.assertEqual(store.post_ids(self.reader.id), [first.id])
+        
+        # 其他进程发布、没有写扩散到本进程的帖子
+        second = Post.objects.create(author=self.author, content='其他进程')
+        self.assertEqual(store.post_ids(self.reader.id), [second.id, first.id])
+        self.assertFalse(store.store.exists(store.key(self.reader.id)))
+
+
+@patch.object(KeysetPagination, 'page_size', 2)
+class KeysetPaginationTest(TestCase):
+    """游标分页测试"""
+    
+    def setUp(self):
+        reset_store()
+        self.author = create_user('author')
+        self.posts = [
+            Post.objects.create(author=self.author, content=f'帖子 {i}')
+            for i in range(5)
+        ]
+    
+    def fetch(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return [item['id'] for item in data['results']], data
+    
+    def test_page_number_mode_is_default(self):
+        """测试不带游标时仍使用页码分页"""
+        ids, data = self.fetch('/api/posts/')
+        self.assertEqual(data['count'], 5)
+        self.assertEqual(len(ids), 2)
+    
+    def test_walk_forward_and_back(self):
+        """测试游标向后、向前翻页"""
+        expected = [post.id for post in reversed(self.posts)]
+        
+        ids, data = self.fetch('/api/posts/?cursor=')
+        self.assertNotIn('count', data)
+        self.assertIsNone(data['previous'])
+        pages = [ids]
+        while data['next']:
+            ids, data = self.fetch(data['next'])
+            pages.append(ids)
+        self.assertEqual(sum(pages, []), expected)
+        
+        ids, data = self.fetch(data['previous'])
+        self.assertEqual(ids, pages[-2])
+        ids, data = self.fetch(data['previous'])
+        self.assertEqual(ids, pages[0])
+        self.assertIsNone(data['previous'])
+    
+    def test_invalid_cursor(self):
+        """测试无效游标返回404"""
+        response = self.client.get('/api/posts/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+
+class ViewerStateLoaderTest(TestCase):
+    """批量加载当前用户状态测试"""
+    
+    def setUp(self):
+        reset_store()
+        self.viewer = create_user('viewer')
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+        # 关系图索引在进程内首次使用时从数据库构建一次，不计入列表页查询
+        get_social_graph().sync()
+    
+    def count_list_queries(self, posts_count):
+        for i in range(posts_count):
+            author = create_user(f'author{posts_count}_{i}')
+            Post.objects.create(author=author, content=f'帖子 {i}')
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/posts/?cursor=')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(item['is_liked'] is False for item in response.json()['results']))
+        return len(queries)
+    
+    def test_queries_do_not_grow_with_page_size(self):
+        """测试列表页查询数与行数无关"""
+        small = self.count_list_queries(2)
+        Post.objects.all().delete()
+        large = self.count_list_queries(6)
+        self.assertEqual(small, large)
+
+
+class TrendingEngineTest(TestCase):
+    """热门帖子引擎测试"""
+    
+    def setUp(self):
+        reset_store()
+        self.author = create_user('author')
+    
+    def create_post(self, hours_ago, **counts):
+        post = Post.objects.create(author=self.author, content='测试帖子')
+        Post.objects.filter(id=post.id).update(
+            created_at=timezone.now() - timedelta(hours=hours_ago),
+            **counts
+        )
+        post.refresh_from_db()
+        return post
+    
+    def test_rescore_decays_by_age(self):
+        """测试重算时热度按帖子年龄衰减"""
+        old = self.create_post(hours_ago=12, likes_count=30)
+        fresh = self.create_post(hours_ago=1, likes_count=10)
+        expired = self.create_post(hours_ago=100, likes_count=1000)
+        self.create_post(hours_ago=1)
+        
+        engine = get_trending_engine()
+        self.assertEqual(engine.rescore(), 2)
+        
+        # 12小时（两个半衰期）后30个赞只相当于7.5个
+        self.assertEqual(engine.top(10), [fresh.id, old.id])
+        self.assertNotIn(expired.id, engine.top(10))
+    
+    def test_incremental_record_matches_rescore(self):
+        """测试增量更新与批量重算的排序一致"""
+        first = self.create_post(hours_ago=6, likes_count=4)
+        second = self.create_post(hours_ago=0, likes_count=3)
+        engine = get_trending_engine()
+        engine.rescore()
+        self.assertEqual(engine.top(2), [second.id, first.id])
+        
+        engine.record(first, 'likes', 3)
+        Post.objects.filter(id=first.id).update(likes_count=7)
+        
+        self.assertEqual(engine.top(2), [first.id, second.id])
+        
+        # 增量更新后的相对热度应与按数据库计数重算的结果一致
+        def ratio():
+            scores = engine.store.zmscore(engine.key, [first.id, second.id])
+            return scores[0] / scores[1]
+        incremental = ratio()
+        engine.rescore()
+        self.assertAlmostEqual(ratio(), incremental, places=3)
+    
+    def test_trending_view(self):
+        """测试热门帖子接口按热度排序"""
+        low = self.create_post(hours_ago=1, likes_count=1)
+        high = self.create_post(hours_ago=1, comments_count=5)
+        
+        response = self.client.get('/api/posts/trending/')
+        
+        self.assertEqual(response.status_code, 200)
+        ids = [item['id'] for item in response.json()['results']]
+        self.assertEqual(ids, [high.id, low.id])
+    
+    def test_empty_board_rescored_once(self):
+        """测试窗口内没有热门帖子时，冷启动重算的空榜也会缓存，请求不再反复重算"""
+        self.create_post(hours_ago=1)
+        engine = get_trending_engine()
+        self.assertTrue(engine.bootstrap())
+        self.assertFalse(engine.store.exists(engine.key))
+        
+        with patch.object(TrendingEngine, 'rescore') as rescore:
+            self.assertEqual(self.client.get('/api/posts/trending/').status_code, 200)
+            self.client.get('/api/posts/trending/')
+        rescore.assert_not_called()
+
+
+@override_settings(COUNTER_BUFFER={'BUFFER_LOCAL_STORE': True})
+class EngagementCounterTest(TestCase):
+    """互动计数写回缓冲测试"""
+    
+    def setUp(self):
+        reset_store()
+        self.client = APIClient()
+        self.post = Post.objects.create(author=create_user('author'), content='测试帖子')
+        self.counter = get_post_counter()
+    
+    def test_views_buffered_until_flush(self):
+        """测试浏览数先进入缓冲，读取时叠加，定时写回"""
+        for expected in (1, 2, 3):
+            response = self.client.get(f'/api/posts/{self.post.id}/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['views_count'], expected)
+        
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views_count, 0)
+        
+        self.assertEqual(self.counter.flush(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views_count, 3)
+        self.assertEqual(self.counter.pending(self.post.id, 'views_count'), 0)
+        self.assertEqual(self.counter.flush(), 0)
+    
+    @override_settings(COUNTER_BUFFER={'BUFFER_LOCAL_STORE': False})
+    def test_local_store_writes_through(self):
+        """测试共享存储不能跨进程共享时，增量直接写入数据库而不是留在进程内存中"""
+        self.assertFalse(self.counter.buffered)
+        self.client.get(f'/api/posts/{self.post.id}/')
+        self.counter.incr(self.post.id, 'likes_count', 2)
+        
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.views_count, self.post.likes_count), (1, 2))
+        self.assertEqual(self.counter.pending(self.post.id, 'likes_count'), 0)
+        self.assertEqual(self.counter.flush(), 0)
+    
+    def test_deltas_coalesced_into_one_update(self):
+        """测试同一模型的多个字段合并为一条UPDATE，且不会减成负数"""
+        other = Post.objects.create(author=self.post.author, content='另一条帖子')
+        self.counter.incr(self.post.id, 'likes_count', 3)
+        self.counter.incr(self.post.id, 'likes_count', -1)
+        self.counter.incr(self.post.id, 'shares_count')
+        self.counter.incr(other.id, 'likes_count', -2)
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.counter.flush()
+        updates = [q for q in queries.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        
+        self.post.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.post.shares_count), (2, 1))
+        self.assertEqual(other.likes_count, 0)
+    
+    def test_crashed_batch_replayed_once(self):
+        """测试崩溃遗留的批次被重放，且已提交的批次不会重复写回"""
+        self.counter.incr(self.post.id, 'comments_count', 2)
+        batch_key = self.counter.claim()
+        self.assertIsNotNone(batch_key)
+        self.counter.incr(self.post.id, 'comments_count')
+        
+        # 写回进程在RENAME之后崩溃：下次写回时重放
+        self.assertEqual(self.counter.replay(grace=60), 0)
+        self.assertEqual(self.counter.replay(grace=0), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 2)
+        
+        # 写回进程在事务提交之后、删除批次键之前崩溃：重放时跳过
+        batch_key = self.counter.claim()
+        store = self.counter.store
+        with patch.object(store, 'delete', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.counter.apply_batch(batch_key)
+        self.assertTrue(store.exists(batch_key))
+        self.assertEqual(self.counter.replay(grace=0), 0)
+        self.assertFalse(store.exists(batch_key))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 3)
+
+
+class PostSearchTest(TestCase):
+    """帖子全文检索测试"""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.author = create_user('author')
+    
+    def create_post(self, content, hashtags=()):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(author=self.author, content=content)
+            for name in hashtags:
+                post.hashtags.create(hashtag=Hashtag.objects.get_or_create(name=name)[0])
+        return post
+    
+    def test_tokenize_cjk_bigrams(self):
+        """测试中文切分为二元组，英文按词切分"""
+        self.assertEqual(tokenize('今天天气 Django!'), ['今天', '天天', '天气', 'django'])
+    
+    def test_search_ranked_and_maintained(self):
+        """测试搜索结果按相关度排序，并随帖子编辑和删除更新"""
+        weak = self.create_post('今天天气不错')
+        strong = self.create_post('天气预报：明天天气晴，后天天气多云', hashtags=['天气'])
+        tagged = self.create_post('出门散步', hashtags=['天气'])
+        self.create_post('完全无关的内容')
+        
+        self.assertEqual(set(search_posts('天气')), {weak.id, strong.id, tagged.id})
+        self.assertEqual(search_posts('天气')[0], strong.id)
+        self.assertEqual(search_posts('今天 天气'), [weak.id])
+        self.assertEqual(search_posts('晴'), [strong.id])
+        
+        response = self.client.get('/api/posts/', {'search': '天气'})
+        self.assertEqual(response.data['results'][0]['id'], strong.id)
+        self.assertEqual(response.data['count'], 3)
+        
+        # 游标只能表示时间顺序：搜索请求带游标时仍按相关度分页
+        response = self.client.get('/api/posts/', {'search': '天气', 'cursor': ''})
+        self.assertEqual(response.data['results'][0]['id'], strong.id)
+        self.assertEqual(response.data['count'], 3)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            weak.content = '今天下雨'
+            weak.save()
+            tagged.is_deleted = True
+            tagged.save()
+        self.assertEqual(search_posts('天气'), [strong.id])
+        self.assertEqual(search_posts('下雨'), [weak.id])
+    
+    def test_rebuild_index(self):
+        """测试重建索引覆盖已有帖子"""
+        post = Post.objects.create(author=self.author, content='没有经过信号的帖子')
+        self.assertEqual(search_posts('信号'), [])
+        self.assertEqual(rebuild_index(batch_size=1), 1)
+        self.assertEqual(search_posts('信号'), [post.id])
+    
+    def test_migration_backfills_documents(self):
+        """测试迁移为已有的帖子生成检索文档（含标签），跳过已删除的帖子"""
+        post = Post.objects.create(author=self.author, content='迁移之前的帖子')
+        post.hashtags.create(hashtag=Hashtag.objects.create(name='历史'))
+        Post.objects.create(author=self.author, content='迁移之前删除的帖子', is_deleted=True)
+        self.assertEqual(search_posts('迁移'), [])
+        
+        migration = import_module('apps.posts.migrations.0003_post_search_document')
+        migration.backfill_search_documents(django_apps, None)
+        self.assertEqual(search_posts('迁移'), [post.id])
+        self.assertEqual(search_posts('历史'), [post.id])
+
+
+class HashtagTrendsTest(TestCase):
+    """话题标签趋势测试"""
+    
+    def setUp(self):
+        reset_store()
+        self.client = APIClient()
+    
+    def test_windows(self):
+        """测试按时间窗口统计，过期的桶不计入"""
+        trends = get_hashtag_trends()
+        now = 1_700_000_000
+        for _ in range(3):
+            trends.record(['django'], now=now - 30)
+        trends.record(['django', 'python'], now=now - 7200)
+        for _ in range(5):
+            trends.record(['python'], now=now - 7200)
+        
+        self.assertEqual(trends.top('1h', now=now), [('django', 3)])
+        self.assertEqual(trends.top('24h', now=now), [('python', 6), ('django', 4)])
+        self.assertEqual(trends.top('24h', now=now + 86400 * 2), [])
+    
+    def test_endpoint_fed_from_post_creation(self):
+        """测试创建帖子时的标签计入趋势"""
+        author = create_user('author')
+        hashtag = Hashtag.objects.create(name='天气')
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(author=author, content='今天天气不错')
+            post.hashtags.create(hashtag=hashtag)
+        
+        response = self.client.get('/api/posts/hashtags/trending/', {'window': '24h'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['name'], '天气')
+        self.assertEqual(response.data[0]['id'], hashtag.id)
+        self.assertEqual(response.data[0]['recent_count'], 1)
+        
+        response = self.client.get('/api/posts/hashtags/trending/', {'window': '7d'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PostCreateHashtagsTest(TestCase):
+    """帖子创建时批量写入标签测试"""
+    
+    def setUp(self):
+        reset_store()
+        self.client = APIClient()
+        self.client.force_authenticate(create_user('author'))
+        Hashtag.objects.create(name='django', posts_count=5)
+    
+    def create_post(self, hashtag_names):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/posts/', {
+                'content': '测试帖子',
+                'hashtag_names': hashtag_names
+            }, format='json')
+    
+    def test_bulk_ingestion(self):
+        """测试标签批量写入，查询数与标签数无关"""
+        with CaptureQueriesContext(connection) as few:
+            response = self.create_post(['django', 'python'])
+        self.assertEqual(response.status_code, 201)
+        with CaptureQueriesContext(connection) as many:
+            self.create_post(['django', 'go', 'rust', 'java', 'rust'])
+        self.assertEqual(len(few), len(many))
+        
+        counts = dict(Hashtag.objects.values_list('name', 'posts_count'))
+        self.assertEqual(counts, {'django': 7, 'python': 1, 'go': 1, 'rust': 1, 'java': 1})
+        
+        post = Post.objects.latest('id')
+        self.assertEqual(post.hashtags.count(), 4)
+        self.assertEqual(dict(get_hashtag_trends().top('1h'))['rust'], 1)
+
+
+@patch('apps.notifications.tasks.create_comment_notification.delay')
+class CommentThreadTest(TestCase):
+    """评论楼层测试"""
+    
+    def setUp(self):
+        reset_store()
+        self.client = APIClient()
+        self.author = create_user('author')
+        self.post = Post.objects.create(author=self.author, content='测试帖子')
+    
+    def create_thread(self, roots, fanout, levels):
+        """每条根评论下每层 fanout 条回复，共 levels 层"""
+        created = 0
+        for _ in range(roots):
+            level = [Comment.objects.create(post=self.post, author=self.author, content='根评论')]
+            created += 1
+            for _ in range(levels):
+                level = [
+                    Comment.objects.create(post=self.post, author=self.author, content='回复', parent=parent)
+                    for parent in level for _ in range(fanout)
+                ]
+                created += len(level)
+        return created
+    
+    def list_comments(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/posts/{self.post.id}/comments/', {'cursor': ''})
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+    
+    def test_path_maintained_on_insert(self, mock_notify):
+        """测试插入时写入路径和层级"""
+        root = Comment.objects.create(post=self.post, author=self.author, content='根评论')
+        reply = Comment.objects.create(post=self.post, author=self.author, content='回复', parent=root)
+        reply.refresh_from_db()
+        self.assertEqual(reply.depth, 1)
+        self.assertTrue(reply.path.startswith(root.path))
+        self.assertEqual(len(reply.path), 2 * (Comment.PATH_STEP + 1))
+    
+    def test_thread_renders_with_constant_queries(self, mock_notify):
+        """测试渲染楼层的查询数与评论数无关"""
+        self.create_thread(roots=1, fanout=1, levels=1)
+        _, small = self.list_comments()
+        
+        Comment.objects.all().delete()
+        self.assertGreaterEqual(self.create_thread(roots=5, fanout=3, levels=2), 65)
+        _, large = self.list_comments()
+        self.assertEqual(small, large)
+        
+        root = Comment.objects.filter(parent__isnull=True).first()
+        response = self.client.get(f'/api/posts/{self.post.id}/comments/{root.id}/')
+        self.assertEqual(len(response.data['replies']), 3)
+        self.assertEqual(len(response.data['replies'][0]['replies']), 3)
+    
+    def test_top_comments_per_post(self, mock_notify):
+        """测试一次查询取出整页帖子各自的前5条评论"""
+        def render(count):
+            posts = [self.post] + [
+                Post.objects.create(author=self.author, content='测试帖子') for _ in range(count - 1)
+            ]
+            for post in posts:
+                for _ in range(7):
+                    Comment.objects.create(post=post, author=self.author, content='评论')
+            queryset = Post.objects.filter(id__in=[post.id for post in posts]).select_related(
+                'author'
+            ).prefetch_related('post_images', 'hashtags__hashtag')
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                data = PostSerializer(queryset, many=True, context={}).data
+            return data, len(queries)
+        
+        _, small = render(1)
+        Post.objects.exclude(id=self.post.id).delete()
+        Comment.objects.all().delete()
+        large_data, large = render(6)
+        
+        self.assertEqual(small, large)
+        self.assertEqual([len(item['comments']) for item in large_data], [5] * 6)
+        newest = Comment.objects.filter(post=self.post).order_by('-created_at', '-id')[:5]
+        post_data = next(item for item in large_data if item['id'] == self.post.id)
+        self.assertEqual([c['id'] for c in post_data['comments']], [c.id for c in newest])
+
+
+@override_settings(COUNTER_BUFFER={'BUFFER_LOCAL_STORE': True})
+class RepostTest(TestCase):
+    """转发链与原帖嵌入缓存测试"""
+    
+    def setUp(self):
+        reset_store()
+        cache.clear()
+        self.client = APIClient()
+        self.author = create_user('author')
+        self.reader = create_user('reader')
+        self.client.force_authenticate(self.reader)
+        self.post = Post.objects.create(author=self.author, content='原帖')
+    
+    def render(self):
+        queryset = Post.objects.filter(original_post__isnull=False).select_related(
+            'author', 'original_post__author'
+        ).prefetch_related('post_images', 'hashtags__hashtag')
+        with CaptureQueriesContext(connection) as queries:
+            data = PostSerializer(queryset, many=True, context={}).data
+        return data, len(queries)
+    
+    def test_repost_of_repost_points_to_root(self):
+        """测试转发的转发指向最初的原帖"""
+        response = self.client.post(f'/api/posts/{self.post.id}/repost/', {'content': '转发'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['repost_depth'], 1)
+        
+        response = self.client.post(f'/api/posts/{response.data["id"]}/repost/', {'content': '再转发'})
+        self.assertEqual(response.data['original_post']['id'], self.post.id)
+        self.assertEqual(response.data['repost_depth'], 2)
+        self.assertEqual(get_post_counter().pending(self.post.id, 'shares_count'), 2)
+    
+    def test_embed_cached_with_live_counts(self):
+        """测试原帖嵌入内容跨转发共用缓存，计数实时覆盖"""
+        for _ in range(3):
+            Post.objects.create(author=self.reader, content='转发', original_post=self.post)
+        
+        _, cold = self.render()
+        self.assertIsNotNone(cache.get(embed_key(self.post)))
+        
+        get_post_counter().incr(self.post.id, 'likes_count')
+        data, warm = self.render()
+        self.assertLess(warm, cold)
+        self.assertEqual([item['original_post']['likes_count'] for item in data], [1] * 3)
+        self.assertNotIn('comments', data[0]['original_post'])
+        
+        self.post.content = '编辑后的原帖'
+        self.post.save()
+        data, _ = self.render()
+        self.assertEqual(data[0]['original_post']['content'], '编辑后的原帖')
+    
+    def test_embed_author_follows_profile_changes(self):
+        """测试作者改名后，缓存的原帖嵌入中的作者信息随之更新"""
+        Post.objects.create(author=self.reader, content='转发', original_post=self.post)
+        data, _ = self.render()
+        self.assertEqual(data[0]['original_post']['author']['username'], 'author')
+        
+        self.author.username = 'renamed'
+        self.author.save()
+        data, _ = self.render()
+        self.assertEqual(data[0]['original_post']['author']['username'], 'renamed')
+        self.assertEqual(data[0]['original_post']['author']['id'], self.author.id)
+
+
+@patch('apps.notifications.tasks.create_comment_notification.delay')
+class CompiledSerializerTest(TestCase):
+    """编译序列化器测试"""
+    
+    def setUp(self):
+        reset_store()
+        self.author = create_user('author')
+        self.reader = create_user('reader')
+        with patch('apps.notifications.tasks.create_follow_notification.delay'):
+            Follow.objects.create(follower=self.reader, following=self.author)
+        
+        for i in range(3):
+            post = Post.objects.create(author=self.author, content=f'帖子{i}')
+            PostImage.objects.create(post=post, image=f'posts/images/{i}.jpg', order=i)
+    
+    def render(self, serializer_class, queryset, enabled):
+        with override_settings(FAST_SERIALIZERS={'ENABLED': enabled}):
+            request = Request(APIRequestFactory().get('/'))
+            request.user = self.reader
+            data = serializer_class(list(queryset.all()), many=True, context={'request': request}).data
+            return JSONRenderer().render(data)
+    
+    def assertIdentical(self, serializer_class, queryset):
+        self.assertEqual(
+            self.render(serializer_class, queryset, True),
+            self.render(serializer_class, queryset, False)
+        )
+    
+    def test_post_list_identical(self, mock_notify):
+        """测试帖子列表输出与DRF逐字节一致"""
+        get_post_counter().incr(Post.objects.first().id, 'likes_count')
+        queryset = Post.objects.select_related('author').prefetch_related('post_images')
+        self.assertIdentical(PostListSerializer, queryset)
+    
+    def test_comment_threads_identical(self, mock_notify):
+        """测试评论楼层输出与DRF逐字节一致"""
+        post = Post.objects.first()
+        root = Comment.objects.create(post=post, author=self.author, content='根评论')
+        reply = Comment.objects.create(post=post, author=self.reader, content='回复', parent=root)
+        Comment.objects.create(post=post, author=self.author, content='回复的回复', parent=reply)
+        queryset = Comment.objects.filter(parent__isnull=True).select_related('author')
+        self.assertIdentical(CommentSerializer, queryset)
+    
+    def test_user_list_identical(self, mock_notify):
+        """测试用户列表输出与DRF逐字节一致"""
+        self.assertIdentical(UserListSerializer, User.objects.order_by('id'))
+    
+    def test_values_rows(self, mock_notify):
+        """测试直接渲染 .values() 结果行"""
+        Hashtag.objects.create(name='django', posts_count=3)
+        render = get_renderer(HashtagSerializer())
+        rows = Hashtag.objects.values('id', 'name', 'posts_count')
+        self.assertEqual(
+            [render(row) for row in rows],
+            HashtagSerializer(Hashtag.objects.all(), many=True).data
+        )
+        
+        rows = nest_values(Post.objects.values('id', 'author__id', 'author__username')[:1])
+        self.assertEqual(rows[0]['author'], {'id': self.author.id, 'username': 'author'})
+
+
+class StreamingListTest(TestCase):
+    """列表流式输出测试"""
+    
+    def setUp(self):
+        reset_store()
+        self.client = APIClient()
+        cache.clear()
+        self.reader = create_user('reader')
+        author = create_user('author')
+        for i in range(7):
+            Post.objects.create(author=author, content=f'帖子{i}')
+    
+    @override_settings(JSON_STREAMING={'CHUNK_SIZE': 3, 'MAX_ITEMS': 5, 'THROTTLE_RATE': '20/hour'})
+    def test_stream_all_pages_in_chunks(self):
+        """测试不分页、分块输出"""
+        self.client.force_authenticate(self.reader)
+        response = self.client.get('/api/posts/', {'stream': '1'})
+        self.assertTrue(response.streaming)
+        data = json.loads(b''.join(response.streaming_content))
+        expected = Post.objects.order_by('-created_at').values_list('content', flat=True)[:5]
+        self.assertEqual([item['content'] for item in data], list(expected))
+        
+        response = self.client.get('/api/posts/')
+        self.assertFalse(response.streaming)
+        self.assertEqual(response.data['count'], 7)
+    
+    @override_settings(JSON_STREAMING={'CHUNK_SIZE': 3, 'MAX_ITEMS': 5, 'THROTTLE_RATE': '2/hour'})
+    def test_stream_requires_login_and_throttled(self):
+        """测试流式输出需要登录，并按用户限流"""
+        response = self.client.get('/api/posts/', {'stream': '1'})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.client.get('/api/posts/').status_code, 200)
+        
+        self.client.force_authenticate(self.reader)
+        for _ in range(2):
+            self.assertTrue(self.client.get('/api/posts/', {'stream': '1'}).streaming)
+        self.assertEqual(self.client.get('/api/posts/', {'stream': '1'}).status_code, 429)
+
+
+@override_settings(COUNTER_BUFFER={'BUFFER_LOCAL_STORE': True})
+class ResponseCacheTest(TestCase):
+    """带版本号的响应缓存测试"""
+    
+    def setUp(self):
+        reset_store()
+        cache.clear()
+        self.client = APIClient()
+        self.author = create_user('author')
+        self.reader = create_user('reader')
+        self.client.force_authenticate(self.reader)
+        self.post = Post.objects.create(author=self.author, content='原帖')
+        self.url = f'/api/posts/{self.post.id}/'
+    
+    def test_not_modified_without_queries(self):
+        """测试ETag未变化时不查询数据库直接返回304，浏览数照常累加"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(get_post_counter().pending(self.post.id, 'views_count'), 2)
+    
+    def test_signals_bump_versions(self):
+        """测试帖子编辑、评论后ETag变化"""
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.content = '编辑后'
+            self.post.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['content'], '编辑后')
+        
+        etag = response['ETag']
+        with patch('apps.notifications.tasks.create_comment_notification.delay'):
+            with self.captureOnCommitCallbacks(execute=True):
+                Comment.objects.create(post=self.post, author=self.author, content='评论')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(len(response.data['comments']), 1)
+    
+    def test_viewer_specific(self):
+        """测试不同查看者的ETag不同，关注后查看者的ETag变化"""
+        etag = self.client.get(self.url)['ETag']
+        other = APIClient()
+        self.assertNotEqual(other.get(self.url)['ETag'], etag)
+        
+        with patch('apps.notifications.tasks.create_follow_notification.delay'):
+            with self.captureOnCommitCallbacks(execute=True):
+                Follow.objects.create(follower=self.reader, following=self.author)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['author']['is_following'])
+
+class PostRecordCacheTest(TestCase):
+    """帖子记录缓存测试"""
+    
+    def setUp(self):
+        reset_store()
+        cache.clear()
+        _local_cache().clear()
+        self.client = APIClient()
+        self.author = create_user('author')
+        self.posts = [Post.objects.create(author=self.author, content=f'帖子{i}') for i in range(3)]
+        self.records = get_post_records()
+    
+    def test_hydrate_in_order_from_both_tiers(self):
+        """测试按给定顺序批量取出，未命中一次查询，之后依次命中进程内缓存和共享缓存"""
+        ids = [post.id for post in reversed(self.posts)]
+        with self.assertNumQueries(3):
+            posts = self.records.hydrate(ids + [0])
+        self.assertEqual([post.id for post in posts], ids)
+        
+        with self.assertNumQueries(0):
+            self.assertEqual([post.content for post in self.records.hydrate(ids)], ['帖子2', '帖子1', '帖子0'])
+        
+        _local_cache().clear()
+        with self.assertNumQueries(0):
+            posts = self.records.hydrate(ids)
+            self.assertEqual(list(posts[0].post_images.all()), [])
+    
+    def test_invalidated_on_save_and_counter_flush(self):
+        """测试帖子保存、软删除和计数写回后记录失效"""
+        post = self.posts[0]
+        self.records.hydrate([post.id])
+        
+        post.content = '已编辑'
+        post.save()
+        self.assertEqual(self.records.hydrate([post.id])[0].content, '已编辑')
+        
+        counter = get_post_counter()
+        counter.incr(post.id, 'likes_count', 2)
+        counter.flush()
+        self.assertEqual(self.records.hydrate([post.id])[0].likes_count, 2)
+        
+        post.refresh_from_db()
+        post.is_deleted = True
+        post.save()
+        self.assertEqual(self.records.hydrate([post.id]), [])
+    
+    def test_list_endpoint_hydrates_page(self):
+        """测试帖子列表只查询ID，重复请求不再关联查询图片和标签"""
+        self.client.get('/api/posts/', {'cursor': ''})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/posts/', {'cursor': ''})
+        self.assertEqual(
+            [item['id'] for item in response.data['results']],
+            [post.id for post in reversed(self.posts)]
+        )
+        self.assertEqual(len(queries), 1)
+
+
+@override_settings(SOCIAL_GRAPH={**settings.SOCIAL_GRAPH, 'INDEX_LOCAL_STORE': True})
+@patch.object(KeysetPagination, 'page_size', 3)
+class BlockFilterTest(TestCase):
+    """屏蔽过滤测试"""
+    
+    def setUp(self):
+        reset_store()
+        cache.clear()
+        _local_cache().clear()
+        self.viewer = create_user('viewer')
+        self.friend = create_user('friend')
+        self.blocked = create_user('blocked')
+        self.blocker = create_user('blocker')
+        with self.captureOnCommitCallbacks(execute=True):
+            Block.objects.create(blocker=self.viewer, blocked=self.blocked)
+            Block.objects.create(blocker=self.blocker, blocked=self.viewer)
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+    
+    def create_posts(self):
+        """较新的帖子大多来自屏蔽关系中的用户，游标分页需要补取"""
+        visible = []
+        for i in range(4):
+            visible.append(Post.objects.create(author=self.friend, content=f'帖子 {i}'))
+            for author in (self.blocked, self.blocker, self.blocked):
+                Post.objects.create(author=author, content='屏蔽')
+        repost = Post.objects.create(author=self.friend, content='转发', original_post=visible[0])
+        Post.objects.create(author=self.friend, content='转发屏蔽', original_post=Post.objects.filter(author=self.blocked).first())
+        return [repost] + list(reversed(visible))
+    
+    def test_post_list_refills_pages(self):
+        """测试帖子列表剔除屏蔽关系中的用户，剔除后不足一页时补取，且不查询 blocks 表"""
+        expected = [post.id for post in self.create_posts()]
+        get_social_graph().sync()
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/posts/?cursor=')
+        self.assertFalse(any('"blocks"' in query['sql'] for query in queries))
+        data = response.json()
+        pages = [[item['id'] for item in data['results']]]
+        while data['next']:
+            data = self.client.get(data['next']).json()
+            pages.append([item['id'] for item in data['results']])
+        self.assertEqual(sum(pages, []), expected)
+        self.assertTrue(all(len(page) == 3 for page in pages[:-1]))
+    
+    def test_filtered_lists_keep_page_numbers(self):
+        """测试有屏蔽关系时，页码分页在查询中排除被屏蔽的内容，总数和页码准确"""
+        expected = [post.id for post in self.create_posts()]
+        data = self.client.get('/api/posts/').json()
+        self.assertEqual(data['count'], len(expected))
+        self.assertEqual([item['id'] for item in data['results']], expected[:3])
+        data = self.client.get('/api/posts/', {'page': 2}).json()
+        self.assertEqual([item['id'] for item in data['results']], expected[3:])
+        self.assertEqual(data['next'], None)
+        
+        # 没有屏蔽关系的用户仍使用页码分页
+        self.client.force_authenticate(self.friend)
+        self.assertEqual(self.client.get('/api/posts/').json()['count'], 18)
+    
+    def test_trending_and_comments(self):
+        """测试热门帖子和评论列表剔除屏蔽关系中的用户"""
+        post = Post.objects.create(author=self.friend, content='热门')
+        hidden = Post.objects.create(author=self.blocker, content='热门')
+        engine = get_trending_engine()
+        engine.record(hidden, 'likes', 10)
+        engine.record(post, 'likes', 1)
+        self.assertEqual(
+            [item['id'] for item in self.client.get('/api/posts/trending/').data['results']],
+            [post.id]
+        )
+        
+        with patch('apps.notifications.tasks.create_comment_notification.delay'):
+            Comment.objects.create(post=post, author=self.blocked, content='屏蔽')
+            comment = Comment.objects.create(post=post, author=self.friend, content='评论')
+        response = self.client.get(f'/api/posts/{post.id}/comments/?cursor=')
+        self.assertEqual([item['id'] for item in response.data['results']], [comment.id])
+        response = self.client.get(f'/api/posts/{post.id}/')
+        self.assertEqual([item['id'] for item in response.data['comments']], [comment.id])
+    
+    def test_block_changes_apply_after_commit(self):
+        """测试取消屏蔽后内容重新出现"""
+        post = Post.objects.create(author=self.blocked, content='帖子')
+        self.assertEqual(self.client.get('/api/posts/?cursor=').json()['results'], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Block.objects.filter(blocker=self.viewer).delete()
+        self.assertEqual(
+            [item['id'] for item in self.client.get('/api/posts/?cursor=').json()['results']],
+            [post.id]
+        )
+    
+    def test_user_search(self):
+        """测试用户搜索在索引返回的ID上剔除屏蔽关系中的用户"""
+        get_user_search_index().rebuild()
+        response = self.client.get('/api/social/search-users/?q=b')
+        self.assertEqual([item['id'] for item in response.data['results']], [])
+        response = self.client.get('/api/auth/autocomplete/?q=f')
+        self.assertEqual([item['id'] for item in response.data], [self.friend.id])
\ No newline at end of file
@@ -0,0 +1,82 @@
+"""评论楼层（物化路径）
+
+每条评论保存从根评论到自身的路径 ``path``，每层是定宽的36进制ID加 ``/``，例如::
+
+    00000001/            根评论 1
+    00000001/0000000a/   评论 10，回复评论 1
+
+某条评论的整棵子树就是 ``path LIKE '<path>%'``，可以走 ``(post, path)`` 索引一次取出，
+再在内存中按 ``parent_id`` 组装成树，渲染深层楼层不再逐层查询。
+"""
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db.models import F, Q
+
+from apps.core.prefetch import prefetch_top_n
+
+_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def encode_path_step(value):
+    from .models import Comment
+
+    digits = ''
+    while value:
+        value, remainder = divmod(value, 36)
+        digits = _DIGITS[remainder] + digits
+    return digits.rjust(Comment.PATH_STEP, '0') + '/'
+
+
+def attach_replies(comments, per_node=3):
+    """一次查询取出这批评论的所有未删除后代，为每个节点挂上前 per_node 条回复
+
+    回复按创建时间倒序，挂在 ``_thread_replies`` 上；返回所有挂上的后代，供调用方批量预处理。
+    """
+    from .models import Comment
+
+    roots = [comment for comment in comments if not hasattr(comment, '_thread_replies')]
+    if not roots:
+        return []
+    for comment in roots:
+        comment._thread_replies = []
+
+    rooted = [comment for comment in roots if comment.path]
+    if not rooted:
+        return []
+
+    descendants = Comment.objects.filter(
+        reduce(or_, [Q(post_id=comment.post_id, path__startswith=comment.path) for comment in rooted]),
+        is_deleted=False,
+        depth__gt=min(comment.depth for comment in rooted)
+    ).select_related('author').order_by('-created_at', '-id')
+
+    children = defaultdict(list)
+    for comment in descendants:
+        children[comment.parent_id].append(comment)
+
+    attached = []
+    pending = list(rooted)
+    while pending:
+        node = pending.pop()
+        replies = children.get(node.id, [])[:per_node]
+        node._thread_replies = replies
+        attached.extend(replies)
+        pending.extend(replies)
+    return attached
+
+
+def attach_top_comments(posts, limit=5):
+    """一次查询为一页帖子挂上最新的 limit 条顶层评论（``_top_comments``），返回这些评论"""
+    from .models import Comment
+
+    posts = [post for post in posts if not hasattr(post, '_top_comments')]
+    return prefetch_top_n(
+        posts,
+        Comment.objects.filter(is_deleted=False, parent__isnull=True).select_related('author'),
+        related_field='post',
+        limit=limit,
+        order_by=[F('created_at').desc(), F('id').desc()],
+        to_attr='_top_comments'
+    )
\ No newline at end of file
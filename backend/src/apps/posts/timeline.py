@@ -0,0 +1,215 @@
+"""首页时间线存储
+
+每个用户维护一个定长的有序集合（成员为帖子ID，分数为发布时间戳），
+新帖子发布时写扩散（fan-out on write）到所有粉丝的时间线。
+粉丝数超过阈值的作者（大V）不做写扩散，读取时再合并其最新帖子，
+这样读时间线的代价与关注人数无关。
+
+时间线依赖能跨进程共享的存储（Redis）：共享存储为进程内的 ``LocalStore`` 时，
+写扩散只能更新发帖进程中的时间线，其他进程会一直读到旧的时间线（最长 TTL）。
+此时不缓存时间线，每次读取直接查询数据库，除非 ``FEED_TIMELINE['CACHE_LOCAL_STORE']``
+声明了单进程环境（测试）。
+"""
+import heapq
+import logging
+
+from django.conf import settings
+
+from apps.core.store import get_store
+from apps.core.versions import get_version_store
+
+logger = logging.getLogger(__name__)
+
+# 空时间线占位成员，保证"已构建但为空"的时间线也存在于存储中
+_PLACEHOLDER = '0'
+
+
+def _timestamp(dt):
+    return dt.timestamp()
+
+
+class TimelineStore:
+    """用户时间线存储"""
+
+    key_prefix = 'timeline'
+    celebrities_key = 'timeline:celebrities'
+
+    def __init__(self, store=None, max_length=None, celebrity_threshold=None, ttl=None):
+        config = settings.FEED_TIMELINE
+        self.store = store if store is not None else get_store()
+        self.max_length = max_length or config['MAX_LENGTH']
+        self.celebrity_threshold = celebrity_threshold or config['CELEBRITY_THRESHOLD']
+        self.ttl = ttl or config['TTL']
+        self.cached = getattr(self.store, 'shared', True) or config['CACHE_LOCAL_STORE']
+
+    def key(self, user_id):
+        return f'{self.key_prefix}:{user_id}'
+
+    # 写入
+
+    def is_celebrity(self, author_id):
+        """作者粉丝数达到阈值时不做写扩散"""
+        from apps.social.models import Follow
+
+        followers = Follow.objects.filter(following_id=author_id)[:self.celebrity_threshold]
+        return followers.count() >= self.celebrity_threshold
+
+    def fanout(self, post):
+        """把新帖子推送到作者本人及其粉丝的时间线"""
+        from apps.social.models import Follow
+
+        if not self.cached:
+            get_version_store().bump(('feed', post.author_id))
+            return 0
+
+        self.push(post.id, post.created_at, [post.author_id])
+
+        if self.is_celebrity(post.author_id):
+            self.store.sadd(self.celebrities_key, post.author_id)
+            # 大V的帖子在读取时合并，所有时间线的响应缓存一并失效
+            get_version_store().bump(('feed', 'celebrities'))
+            return 0
+        self.store.srem(self.celebrities_key, post.author_id)
+
+        follower_ids = Follow.objects.filter(
+            following_id=post.author_id
+        ).values_list('follower_id', flat=True).iterator(chunk_size=self.batch_size)
+
+        pushed = 0
+        batch = []
+        for follower_id in follower_ids:
+            batch.append(follower_id)
+            if len(batch) >= self.batch_size:
+                pushed += self.push(post.id, post.created_at, batch)
+                batch = []
+        if batch:
+            pushed += self.push(post.id, post.created_at, batch)
+        return pushed
+
+    @property
+    def batch_size(self):
+        return settings.FEED_TIMELINE['FANOUT_BATCH_SIZE']
+
+    def push(self, post_id, created_at, user_ids):
+        """把一条帖子写入一批用户的时间线并截断到固定长度
+
+        只写入已经构建过的时间线；未构建的时间线会在首次读取时从数据库重建。
+        """
+        pipe = self.store.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.exists(self.key(user_id))
+        existing = [user_id for user_id, found in zip(user_ids, pipe.execute()) if found]
+        if not existing:
+            return 0
+
+        score = _timestamp(created_at)
+        for user_id in existing:
+            key = self.key(user_id)
+            pipe.zadd(key, {post_id: score})
+            pipe.zremrangebyrank(key, 0, -(self.max_length + 1))
+        pipe.execute()
+        get_version_store().bump(*[('feed', user_id) for user_id in existing])
+        return len(existing)
+
+    def invalidate(self, user_id):
+        """关注关系变化后丢弃时间线，下次读取时重建"""
+        self.store.delete(self.key(user_id))
+        get_version_store().bump(('feed', user_id))
+
+    # 读取
+
+    def query(self, user_id, exclude_author_ids=()):
+        """从数据库查询本人及关注的人的最新帖子，返回 [(帖子ID, 时间戳)]，按时间倒序"""
+        from apps.posts.models import Post
+        from apps.social.models import Follow
+
+        following_ids = Follow.objects.filter(
+            follower_id=user_id
+        ).exclude(
+            following_id__in=exclude_author_ids
+        ).values_list('following_id', flat=True)
+
+        entries = Post.objects.filter(
+            author_id__in=list(following_ids) + [user_id],
+            is_deleted=False
+        ).order_by('-created_at').values_list('id', 'created_at')[:self.max_length]
+        return [(post_id, _timestamp(created_at)) for post_id, created_at in entries]
+
+    def rebuild(self, user_id):
+        """从数据库重建用户时间线"""
+        mapping = dict(self.query(user_id, self._celebrity_ids()))
+        mapping[_PLACEHOLDER] = 0
+
+        key = self.key(user_id)
+        pipe = self.store.pipeline(transaction=True)
+        pipe.delete(key)
+        pipe.zadd(key, mapping)
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+        return [(post_id, score) for post_id, score in mapping.items() if post_id != _PLACEHOLDER]
+
+    def entries(self, user_id):
+        """返回 [(帖子ID, 时间戳)]，按时间倒序，包含关注的大V的最新帖子"""
+        if not self.cached:
+            return self.query(user_id)
+
+        key = self.key(user_id)
+        pipe = self.store.pipeline(transaction=False)
+        pipe.zrevrange(key, 0, self.max_length - 1, withscores=True)
+        pipe.expire(key, self.ttl)
+        stored, _ = pipe.execute()
+
+        if stored:
+            stored = [(int(post_id), score) for post_id, score in stored if post_id != _PLACEHOLDER]
+        else:
+            stored = sorted(self.rebuild(user_id), key=lambda entry: entry[1], reverse=True)
+
+        merged = heapq.merge(
+            stored,
+            self._celebrity_entries(user_id),
+            key=lambda entry: entry[1],
+            reverse=True
+        )
+
+        seen = set()
+        result = []
+        for post_id, score in merged:
+            if post_id in seen:
+                continue
+            seen.add(post_id)
+            result.append((post_id, score))
+            if len(result) >= self.max_length:
+                break
+        return result
+
+    def post_ids(self, user_id):
+        return [post_id for post_id, _ in self.entries(user_id)]
+
+    def _celebrity_ids(self):
+        return [int(author_id) for author_id in self.store.smembers(self.celebrities_key)]
+
+    def _celebrity_entries(self, user_id):
+        """读时合并：查询用户关注的大V的最新帖子"""
+        from apps.posts.models import Post
+        from apps.social.models import Follow
+
+        celebrity_ids = self._celebrity_ids()
+        if not celebrity_ids:
+            return []
+
+        followed = list(Follow.objects.filter(
+            follower_id=user_id,
+            following_id__in=celebrity_ids
+        ).values_list('following_id', flat=True))
+        if not followed:
+            return []
+
+        entries = Post.objects.filter(
+            author_id__in=followed,
+            is_deleted=False
+        ).order_by('-created_at').values_list('id', 'created_at')[:self.max_length]
+        return [(post_id, _timestamp(created_at)) for post_id, created_at in entries]
+
+
+def get_timeline_store():
+    return TimelineStore()
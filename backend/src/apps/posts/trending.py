@@ -0,0 +1,140 @@
+"""热门帖子引擎
+
+热度按帖子年龄指数衰减（半衰期 HALF_LIFE_HOURS）：
+
+    score(t) = (Σ 权重 × 互动数) × 2 ^ (-(t - 发布时间) / 半衰期)
+
+所有帖子以相同速率衰减，因此只需保存基准时刻 epoch 上的热度
+``Σ 权重 × 互动数 × 2 ^ ((发布时间 - epoch) / 半衰期)``，排序就与任意时刻的真实热度一致。
+每次点赞/评论/转发/浏览只需对有序集合做一次 ``ZINCRBY``；
+定时任务用NumPy按数据库中的计数批量重算热度并重置 epoch，修正累积误差、清理过期帖子。
+读取前N条是一次 ``ZREVRANGE``，代价为O(log n + k)。
+"""
+import logging
+import time
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from datetime import timedelta
+
+from apps.core.store import get_store
+
+logger = logging.getLogger(__name__)
+
+# 互动类型对应的计数字段
+EVENT_FIELDS = {
+    'likes': 'likes_count',
+    'comments': 'comments_count',
+    'shares': 'shares_count',
+    'views': 'views_count',
+}
+
+
+class TrendingEngine:
+    """热门帖子引擎"""
+
+    key = 'trending:posts'
+    epoch_key = 'trending:posts:epoch'
+    # 最近一次重算的标记：榜单为空（窗口内没有热度为正的帖子）时读取方也不会反复重算
+    scored_key = 'trending:posts:scored'
+
+    def __init__(self, store=None):
+        config = settings.TRENDING
+        self.store = store if store is not None else get_store()
+        self.half_life = config['HALF_LIFE_HOURS'] * 3600
+        self.max_age = config['MAX_AGE_HOURS'] * 3600
+        self.max_size = config['MAX_SIZE']
+        self.weights = config['WEIGHTS']
+        self.scored_ttl = config['SCORED_TTL']
+
+    def epoch(self):
+        value = self.store.get(self.epoch_key)
+        if value is None:
+            value = time.time()
+            self.store.set(self.epoch_key, value)
+        return float(value)
+
+    def decay_factor(self, created_at, epoch):
+        return 2.0 ** ((created_at.timestamp() - epoch) / self.half_life)
+
+    def record(self, post, event, count=1):
+        """记录一次互动，增量更新帖子热度"""
+        weight = self.weights.get(event, 0)
+        if not weight or not count:
+            return
+        age = timezone.now() - post.created_at
+        if age.total_seconds() > self.max_age:
+            return
+        increment = weight * count * self.decay_factor(post.created_at, self.epoch())
+        self.store.zincrby(self.key, increment, post.id)
+
+    def remove(self, post_id):
+        self.store.zrem(self.key, post_id)
+
+    def top(self, limit=20, start=0):
+        """热度最高的帖子ID（从第 ``start`` 名开始）"""
+        return [int(post_id) for post_id in self.store.zrevrange(self.key, start, start + limit - 1)]
+
+    def needs_bootstrap(self):
+        """冷启动：既没有榜单，SCORED_TTL 内也没有重算过"""
+        return not self.store.exists(self.key, self.scored_key)
+
+    def bootstrap(self):
+        """冷启动时重算一次，之后由定时任务维护；返回是否执行了重算"""
+        if not self.needs_bootstrap():
+            return False
+        self.rescore()
+        return True
+
+    def rescore(self):
+        """按数据库中的计数批量重算热度并重置 epoch"""
+        from .models import Post
+
+        epoch = time.time()
+        since = timezone.now() - timedelta(seconds=self.max_age)
+        rows = Post.objects.filter(
+            is_deleted=False,
+            created_at__gte=since
+        ).values_list('id', *EVENT_FIELDS.values(), 'created_at')
+
+        ids, counts, created = [], [], []
+        for row in rows.iterator(chunk_size=5000):
+            ids.append(row[0])
+            counts.append(row[1:-1])
+            created.append(row[-1].timestamp())
+
+        if ids:
+            ids = np.asarray(ids, dtype=np.int64)
+            counts = np.asarray(counts, dtype=np.float64).reshape(len(ids), len(EVENT_FIELDS))
+            weights = np.asarray([self.weights.get(event, 0) for event in EVENT_FIELDS], dtype=np.float64)
+            created = np.asarray(created, dtype=np.float64)
+
+            scores = (counts @ weights) * np.exp2((created - epoch) / self.half_life)
+
+            keep = np.flatnonzero(scores > 0)
+            if len(keep) > self.max_size:
+                keep = keep[np.argpartition(scores[keep], -self.max_size)[-self.max_size:]]
+            mapping = dict(zip(ids[keep].tolist(), scores[keep].tolist()))
+        else:
+            mapping = {}
+
+        # 写入临时键后整体替换，读取方不会看到半成品
+        staging_key = f'{self.key}:staging'
+        pipe = self.store.pipeline(transaction=True)
+        pipe.delete(staging_key)
+        if mapping:
+            pipe.zadd(staging_key, mapping)
+            pipe.rename(staging_key, self.key)
+        else:
+            pipe.delete(self.key)
+        pipe.set(self.epoch_key, epoch)
+        pipe.set(self.scored_key, epoch, ex=self.scored_ttl)
+        pipe.execute()
+
+        logger.info(f'热门帖子重算完成，共 {len(mapping)} 条')
+        return len(mapping)
+
+
+def get_trending_engine():
+    return TrendingEngine()
@@ -7,9 +7,6 @@ router.register(r'', views.PostViewSet, basename='post')
 router.register(r'(?P<post_id>\d+)/comments', views.CommentViewSet, basename='comment')
 
 urlpatterns = [
-    # 帖子相关
-    path('', include(router.urls)),
-    
     # 点赞相关
     path('<int:post_id>/like/', views.LikePostView.as_view(), name='like-post'),
     path('<int:post_id>/unlike/', views.UnlikePostView.as_view(), name='unlike-post'),
@@ -20,9 +17,13 @@ urlpatterns = [
     
     # 话题标签
     path('hashtags/', views.HashtagListView.as_view(), name='hashtag-list'),
+    path('hashtags/trending/', views.TrendingHashtagsView.as_view(), name='hashtag-trending'),
     path('hashtags/<str:name>/', views.HashtagDetailView.as_view(), name='hashtag-detail'),
     
     # 趋势和推荐
     path('trending/', views.TrendingPostsView.as_view(), name='trending-posts'),
     path('feed/', views.UserFeedView.as_view(), name='user-feed'),
+    
+    # 帖子相关（放在最后，避免详情路由匹配上面的固定路径）
+    path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,10 +1,9 @@
 from rest_framework import viewsets, generics, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
+from django.conf import settings
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, F
-from django.utils import timezone
-from datetime import timedelta
 
 from .models import Post, Comment, Like, CommentLike, Hashtag
 from .serializers import (
@@ -13,30 +12,80 @@ from .serializers import (
     PostListSerializer,
     CommentSerializer,
     CommentCreateSerializer,
-    HashtagSerializer
+    HashtagSerializer,
+    TrendingHashtagSerializer
 )
-from apps.social.models import Follow
+from .counters import get_post_counter, get_comment_counter
+from .records import get_post_records
+from .search import search_posts
+from .hashtag_trends import get_hashtag_trends
+from .timeline import get_timeline_store
+from .trending import get_trending_engine
+from apps.core.http_cache import cache_response
+from apps.core.ordering import preserve_order
+from apps.core.pagination import KeysetPagination
+from apps.core.streaming import StreamingListMixin
+from apps.social.blocks import get_block_filter
 
 
-class PostViewSet(viewsets.ModelViewSet):
+def _post_dependencies(view, request, pk):
+    try:
+        return [('post', int(pk))]
+    except ValueError:
+        return None
+
+
+def _count_revalidated_view(view, request, pk):
+    # 304 时不查询帖子，只累加浏览数（热度按帖子发布时间衰减，需要帖子对象，这里不计入）
+    get_post_counter().incr(int(pk), 'views_count')
+
+
+def _feed_dependencies(view, request):
+    return [('feed', request.user.id), ('feed', 'celebrities')]
+
+
+class HydratedPostListMixin:
+    """列表先取出一页帖子ID（索引或只查 id/created_at 的轻量查询），再从帖子记录缓存批量取出完整帖子
+
+    取出后剔除被屏蔽用户的帖子，不足一页时由分页器继续补取。
+    """
+    
+    def filter_page(self, rows):
+        posts = get_post_records().hydrate([post.id for post in rows])
+        return get_block_filter(self.request).posts(posts)
+    
+    def exclude_filtered(self, queryset):
+        return get_block_filter(self.request).exclude_posts(queryset)
+    
+    def prepare_chunk(self, chunk):
+        return self.filter_page(chunk)
+
+
+class PostViewSet(HydratedPostListMixin, StreamingListMixin, viewsets.ModelViewSet):
     """帖子视图集"""
     
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
-        queryset = Post.objects.filter(is_deleted=False).select_related(
-            'author', 'original_post__author'
-        ).prefetch_related(
-            'post_images', 'hashtags__hashtag', 'post_comments'
-        )
+        queryset = Post.objects.filter(is_deleted=False)
+        if self.action == 'list':
+            # 列表只查询ID，完整帖子从记录缓存取出
+            queryset = queryset.only('id', 'created_at')
+        else:
+            queryset = queryset.select_related(
+                'author', 'original_post__author'
+            ).prefetch_related(
+                'post_images', 'hashtags__hashtag'
+            )
         
-        # 搜索功能
+        # 搜索功能：全文索引返回按相关度排序的帖子ID
         search = self.request.query_params.get('search')
+        ranking = None
         if search:
-            queryset = queryset.filter(
-                Q(content__icontains=search) |
-                Q(hashtags__hashtag__name__icontains=search)
-            ).distinct()
+            post_ids = search_posts(search)
+            queryset = queryset.filter(id__in=post_ids)
+            ranking = preserve_order(post_ids)
         
         # 用户筛选
         username = self.request.query_params.get('username')
@@ -48,6 +97,8 @@ class PostViewSet(viewsets.ModelViewSet):
         if hashtag:
             queryset = queryset.filter(hashtags__hashtag__name=hashtag)
         
+        if ranking is not None:
+            return queryset.order_by(ranking, '-created_at')
         return queryset.order_by('-created_at')
     
     def get_serializer_class(self):
@@ -61,13 +112,15 @@ class PostViewSet(viewsets.ModelViewSet):
         """创建帖子时设置作者"""
         serializer.save(author=self.request.user)
     
+    @cache_response(_post_dependencies, cache_body=False, on_not_modified=_count_revalidated_view)
     def retrieve(self, request, *args, **kwargs):
         """获取单个帖子详情，增加浏览量"""
         instance = self.get_object()
-        # 增加浏览量
-        Post.objects.filter(id=instance.id).update(
-            views_count=F('views_count') + 1
-        )
+        # 浏览量先累加到写回缓冲，由定时任务批量写入数据库
+        counter = get_post_counter()
+        counter.incr(instance.id, 'views_count')
+        counter.overlay([instance, instance.original_post])
+        get_trending_engine().record(instance, 'views')
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
     
@@ -77,26 +130,27 @@ class PostViewSet(viewsets.ModelViewSet):
         original_post = self.get_object()
         content = request.data.get('content', '')
         
-        # 创建转发帖子
+        # 创建转发帖子（转发的转发会指向最初的原帖）
         repost = Post.objects.create(
             author=request.user,
             content=content,
             original_post=original_post
         )
+        root = repost.original_post
         
         # 增加原帖转发数
-        Post.objects.filter(id=original_post.id).update(
-            shares_count=F('shares_count') + 1
-        )
+        get_post_counter().incr(root.id, 'shares_count')
+        get_trending_engine().record(root, 'shares')
         
         serializer = PostSerializer(repost, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(StreamingListMixin, viewsets.ModelViewSet):
     """评论视图集"""
     
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         post_id = self.kwargs.get('post_id')
@@ -115,6 +169,16 @@ class CommentViewSet(viewsets.ModelViewSet):
         context['post_id'] = self.kwargs.get('post_id')
         return context
     
+    def filter_page(self, rows):
+        """剔除被屏蔽用户的评论"""
+        return get_block_filter(self.request).comments(rows)
+    
+    def exclude_filtered(self, queryset):
+        return get_block_filter(self.request).exclude_comments(queryset)
+    
+    def prepare_chunk(self, chunk):
+        return self.filter_page(chunk)
+    
     def perform_create(self, serializer):
         """创建评论时设置作者和帖子"""
         post_id = self.kwargs.get('post_id')
@@ -126,15 +190,12 @@ class CommentViewSet(viewsets.ModelViewSet):
         )
         
         # 增加帖子评论数
-        Post.objects.filter(id=post_id).update(
-            comments_count=F('comments_count') + 1
-        )
+        get_post_counter().incr(post.id, 'comments_count')
+        get_trending_engine().record(post, 'comments')
         
         # 如果是回复评论，增加父评论回复数
         if comment.parent:
-            Comment.objects.filter(id=comment.parent.id).update(
-                replies_count=F('replies_count') + 1
-            )
+            get_comment_counter().incr(comment.parent_id, 'replies_count')
 
 
 class LikePostView(generics.CreateAPIView):
@@ -151,9 +212,8 @@ class LikePostView(generics.CreateAPIView):
         
         if created:
             # 增加帖子点赞数
-            Post.objects.filter(id=post_id).update(
-                likes_count=F('likes_count') + 1
-            )
+            get_post_counter().incr(post.id, 'likes_count')
+            get_trending_engine().record(post, 'likes')
             return Response({'message': '点赞成功'}, status=status.HTTP_201_CREATED)
         else:
             return Response({'message': '已经点赞过了'}, status=status.HTTP_400_BAD_REQUEST)
@@ -171,9 +231,8 @@ class UnlikePostView(generics.DestroyAPIView):
             like.delete()
             
             # 减少帖子点赞数
-            Post.objects.filter(id=post_id).update(
-                likes_count=F('likes_count') - 1
-            )
+            get_post_counter().incr(post.id, 'likes_count', -1)
+            get_trending_engine().record(post, 'likes', -1)
             return Response({'message': '取消点赞成功'}, status=status.HTTP_204_NO_CONTENT)
         except Like.DoesNotExist:
             return Response({'message': '还没有点赞'}, status=status.HTTP_400_BAD_REQUEST)
@@ -193,9 +252,7 @@ class LikeCommentView(generics.CreateAPIView):
         
         if created:
             # 增加评论点赞数
-            Comment.objects.filter(id=comment_id).update(
-                likes_count=F('likes_count') + 1
-            )
+            get_comment_counter().incr(comment.id, 'likes_count')
             return Response({'message': '点赞成功'}, status=status.HTTP_201_CREATED)
         else:
             return Response({'message': '已经点赞过了'}, status=status.HTTP_400_BAD_REQUEST)
@@ -213,9 +270,7 @@ class UnlikeCommentView(generics.DestroyAPIView):
             like.delete()
             
             # 减少评论点赞数
-            Comment.objects.filter(id=comment_id).update(
-                likes_count=F('likes_count') - 1
-            )
+            get_comment_counter().incr(comment.id, 'likes_count', -1)
             return Response({'message': '取消点赞成功'}, status=status.HTTP_204_NO_CONTENT)
         except CommentLike.DoesNotExist:
             return Response({'message': '还没有点赞'}, status=status.HTTP_400_BAD_REQUEST)
@@ -229,6 +284,37 @@ class HashtagListView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
 
+class TrendingHashtagsView(generics.GenericAPIView):
+    """趋势话题标签（?window=1h|24h）"""
+    
+    serializer_class = TrendingHashtagSerializer
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    max_limit = 50
+    
+    def get(self, request):
+        trends = get_hashtag_trends()
+        window = request.query_params.get('window', '1h')
+        if window not in trends.windows:
+            raise ValidationError({'window': f'可选值：{"、".join(trends.windows)}'})
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), self.max_limit)
+        except ValueError:
+            limit = 10
+        
+        top = trends.top(window, limit=max(limit, 1))
+        hashtags = Hashtag.objects.in_bulk([name for name, _ in top], field_name='name')
+        data = [
+            {
+                'id': hashtags[name].id if name in hashtags else None,
+                'name': name,
+                'posts_count': hashtags[name].posts_count if name in hashtags else 0,
+                'recent_count': count,
+            }
+            for name, count in top
+        ]
+        return Response(self.get_serializer(data, many=True).data)
+
+
 class HashtagDetailView(generics.RetrieveAPIView):
     """话题标签详情"""
     
@@ -244,35 +330,40 @@ class TrendingPostsView(generics.ListAPIView):
     serializer_class = PostListSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     
+    limit = 20
+    
     def get_queryset(self):
-        # 获取最近24小时内的热门帖子
-        yesterday = timezone.now() - timedelta(days=1)
-        return Post.objects.filter(
-            is_deleted=False,
-            created_at__gte=yesterday
-        ).select_related('author').prefetch_related(
-            'post_images'
-        ).order_by('-likes_count', '-comments_count', '-views_count')[:20]
+        # 从预计算的热度榜读取帖子ID，冷启动时先批量计算一次（空榜也在 SCORED_TTL 内有效）
+        engine = get_trending_engine()
+        engine.bootstrap()
+        
+        # 剔除被屏蔽用户的帖子后不足时，继续读取榜单的下一段
+        block_filter = get_block_filter(self.request)
+        posts = []
+        for start in range(0, engine.max_size, self.limit):
+            post_ids = engine.top(self.limit, start=start)
+            posts.extend(block_filter.posts(get_post_records().hydrate(post_ids)))
+            if len(posts) >= self.limit or len(post_ids) < self.limit or not block_filter:
+                break
+        return posts[:self.limit]
 
 
-class UserFeedView(generics.ListAPIView):
+class UserFeedView(HydratedPostListMixin, generics.ListAPIView):
     """用户时间线"""
     
     serializer_class = PostListSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    
+    @cache_response(_feed_dependencies, max_age=settings.RESPONSE_CACHE['FEED_MAX_AGE'])
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
     
     def get_queryset(self):
-        # 获取用户关注的人的帖子
-        following_users = Follow.objects.filter(
-            follower=self.request.user
-        ).values_list('following', flat=True)
-        
-        # 包括自己的帖子
-        user_ids = list(following_users) + [self.request.user.id]
+        # 从预计算的时间线读取帖子ID（包括自己和关注的大V的帖子）
+        post_ids = get_timeline_store().post_ids(self.request.user.id)
         
         return Post.objects.filter(
-            author_id__in=user_ids,
+            id__in=post_ids,
             is_deleted=False
-        ).select_related('author').prefetch_related(
-            'post_images'
-        ).order_by('-created_at')
\ No newline at end of file
+        ).only('id', 'created_at').order_by('-created_at')
\ No newline at end of file
@@ -0,0 +1,71 @@
+"""屏蔽过滤
+
+当前用户屏蔽的人和屏蔽了当前用户的人，他们的帖子、评论和账号不出现在时间线、列表和搜索结果中。
+不在热点查询上增加 ``NOT IN (SELECT ... FROM blocks)``：屏蔽集合从关系图索引（见 apps.social.graph）
+读取，随屏蔽关系的增量日志自动更新（共享存储不能跨进程共享时直接查询数据库），每个请求只取一次；各接口取出一页后在内存中剔除，
+不足一页时由分页器继续向后补取（见 ``KeysetPagination.filter_page``）。
+"""
+from .graph import get_social_graph
+
+
+class BlockFilter:
+    """当前用户的屏蔽过滤器"""
+
+    def __init__(self, blocked_ids=()):
+        self.blocked_ids = frozenset(blocked_ids)
+
+    def __bool__(self):
+        return bool(self.blocked_ids)
+
+    def allows(self, user_id):
+        return user_id not in self.blocked_ids
+
+    def user_ids(self, ids):
+        return [user_id for user_id in ids if user_id not in self.blocked_ids]
+
+    def users(self, users):
+        return [user for user in users if user.id not in self.blocked_ids]
+
+    def posts(self, posts):
+        """剔除被屏蔽作者的帖子，以及转发了被屏蔽作者原帖的帖子"""
+        if not self.blocked_ids:
+            return list(posts)
+        return [
+            post for post in posts
+            if post.author_id not in self.blocked_ids
+            and not (post.original_post_id and post.original_post.author_id in self.blocked_ids)
+        ]
+
+    def comments(self, comments):
+        if not self.blocked_ids:
+            return list(comments)
+        return [comment for comment in comments if comment.author_id not in self.blocked_ids]
+
+    # 页码分页不能补取，在查询中排除（只对有屏蔽关系的用户增加条件）
+
+    def exclude_posts(self, queryset):
+        if not self.blocked_ids:
+            return queryset
+        return queryset.exclude(author_id__in=self.blocked_ids).exclude(
+            original_post__author_id__in=self.blocked_ids
+        )
+
+    def exclude_comments(self, queryset):
+        if not self.blocked_ids:
+            return queryset
+        return queryset.exclude(author_id__in=self.blocked_ids)
+
+
+_NO_BLOCKS = BlockFilter()
+
+
+def get_block_filter(request):
+    """当前请求的屏蔽过滤器（每个请求只读取一次屏蔽集合），未登录时不过滤"""
+    if request is None or not request.user.is_authenticated:
+        return _NO_BLOCKS
+
+    block_filter = getattr(request, '_block_filter', None)
+    if block_filter is None:
+        block_filter = BlockFilter(get_social_graph().blocked_ids(request.user.id).tolist())
+        request._block_filter = block_filter
+    return block_filter
\ No newline at end of file
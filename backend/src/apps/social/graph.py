@@ -0,0 +1,458 @@
+"""关注、屏蔽关系图索引
+
+关注和屏蔽关系按两个方向保存为CSR数组：``indptr`` 以用户ID为下标，
+``indices[indptr[u]:indptr[u + 1]]`` 是 u 的有序邻居ID。
+成员判断是一次二分查找，度数是两次数组读取，共同关注是两个有序数组求交集，都在微秒级完成。
+
+快照由定时任务（或 ``build_social_graph`` 命令）从数据库生成，以 ``.npy`` 文件写入 SNAPSHOT_DIR，
+各gunicorn进程用 ``mmap`` 只读映射同一份文件，由操作系统页缓存共享内存。
+快照之后的关注/屏蔽变化在事务提交后追加到共享存储中的增量日志（有序集合，分数为递增序号），
+各进程定期重放新增的日志到本进程的增量层；新快照生成后自动切换并丢弃已包含在快照中的增量。
+
+没有可用快照（开发、测试环境或快照属于其他数据库）时，进程启动后从数据库在内存中构建一次。
+增量日志只保留最近 LOG_LENGTH 条，裁掉的位置记在 ``TRIM_KEY``；落后于该位置的进程从数据库重新加载。
+
+共享存储不能跨进程共享（``LocalStore``）时，其他进程写入的增量对本进程不可见，
+屏蔽可能得不到执行；此时 ``get_social_graph`` 返回直接查询数据库的 ``DatabaseGraph``，
+除非 ``SOCIAL_GRAPH['INDEX_LOCAL_STORE']`` 声明了单进程环境（测试）。
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from apps.core.store import get_store
+
+logger = logging.getLogger(__name__)
+
+# 关系 -> (模型, 起点字段, 终点字段)
+RELATIONS = {
+    'follow': ('social.Follow', 'follower_id', 'following_id'),
+    'block': ('social.Block', 'blocker_id', 'blocked_id'),
+}
+
+_EMPTY = np.zeros(0, dtype=np.int64)
+
+SEQ_KEY = 'graph:deltas:seq'
+LOG_KEY = 'graph:deltas'
+TRIM_KEY = 'graph:deltas:trimmed'
+
+
+class Adjacency:
+    """一个方向的邻接表：只读的CSR基础数组 + 本进程重放的增量"""
+
+    def __init__(self, indptr, indices):
+        self.indptr = indptr
+        self.indices = indices
+        self.added = defaultdict(set)
+        self.removed = defaultdict(set)
+
+    def base(self, node):
+        if node < 0 or node >= len(self.indptr) - 1:
+            return _EMPTY
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def in_base(self, node, other):
+        row = self.base(node)
+        i = row.searchsorted(other)
+        return i < len(row) and row[i] == other
+
+    def contains(self, node, other):
+        if other in self.added.get(node, ()):
+            return True
+        if other in self.removed.get(node, ()):
+            return False
+        return bool(self.in_base(node, other))
+
+    def degree(self, node):
+        return len(self.base(node)) + len(self.added.get(node, ())) - len(self.removed.get(node, ()))
+
+    def neighbors(self, node):
+        """有序的邻居ID数组"""
+        row = self.base(node)
+        removed = self.removed.get(node)
+        if removed:
+            row = np.setdiff1d(row, np.fromiter(removed, dtype=np.int64), assume_unique=True)
+        added = self.added.get(node)
+        if added:
+            row = np.union1d(row, np.fromiter(added, dtype=np.int64))
+        return row
+
+    def apply(self, node, other, present):
+        """应用一条增量；增量层只记录与基础数组不同的边"""
+        if self.in_base(node, other):
+            if present:
+                self.removed[node].discard(other)
+            else:
+                self.removed[node].add(other)
+        elif present:
+            self.added[node].add(other)
+        else:
+            self.added[node].discard(other)
+
+
+def build_csr(edges, size):
+    """把 (起点, 终点) 数组转为以起点ID为下标的CSR数组"""
+    if len(edges):
+        edges = edges[np.lexsort((edges[:, 1], edges[:, 0]))]
+    counts = np.bincount(edges[:, 0], minlength=size) if len(edges) else np.zeros(size, dtype=np.int64)
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    return indptr, np.ascontiguousarray(edges[:, 1], dtype=np.int64)
+
+
+def load_edges(relation):
+    from django.apps import apps
+
+    model, src, dst = RELATIONS[relation]
+    rows = apps.get_model(model).objects.values_list(src, dst).iterator(chunk_size=10000)
+    return np.fromiter((value for pair in rows for value in pair), dtype=np.int64).reshape(-1, 2)
+
+
+def build_arrays():
+    """从数据库构建所有关系两个方向的CSR数组，返回 {名称: (indptr, indices)}"""
+    edges = {relation: load_edges(relation) for relation in RELATIONS}
+    size = 1 + max((int(pairs.max()) for pairs in edges.values() if len(pairs)), default=0)
+    arrays = {}
+    for relation, pairs in edges.items():
+        arrays[f'{relation}_out'] = build_csr(pairs, size)
+        arrays[f'{relation}_in'] = build_csr(pairs[:, ::-1], size)
+    return arrays
+
+
+def _database_name():
+    return str(settings.DATABASES['default']['NAME'])
+
+
+class GraphIndex:
+    """关注、屏蔽关系图索引（进程内只读快照 + 增量日志）"""
+
+    def __init__(self, store=None, snapshot_dir=None, sync_interval=None, gap_timeout=None):
+        config = settings.SOCIAL_GRAPH
+        self.store = store if store is not None else get_store()
+        snapshot_dir = snapshot_dir or config['SNAPSHOT_DIR']
+        self.snapshot_dir = Path(snapshot_dir) if snapshot_dir else None
+        self.sync_interval = config['SYNC_INTERVAL'] if sync_interval is None else sync_interval
+        self.gap_timeout = config['GAP_TIMEOUT'] if gap_timeout is None else gap_timeout
+        self.lock = threading.RLock()
+        self.adjacency = None
+        self.snapshot = None
+        self.seq = 0
+        self.synced_at = 0.0
+        self.gap_since = None
+
+    # 加载
+
+    def current_snapshot(self):
+        """当前快照目录名，没有可用快照时返回None"""
+        if self.snapshot_dir is None:
+            return None
+        try:
+            name = (self.snapshot_dir / 'CURRENT').read_text().strip()
+            meta = json.loads((self.snapshot_dir / name / 'meta.json').read_text())
+        except (OSError, ValueError):
+            return None
+        if meta.get('database') != _database_name():
+            return None
+        return name, meta
+
+    def load(self):
+        """映射最新快照（没有快照时从数据库构建），并丢弃增量层"""
+        current = self.current_snapshot()
+        if current is not None:
+            name, meta = current
+            path = self.snapshot_dir / name
+            arrays = {
+                key: (
+                    np.load(path / f'{key}.indptr.npy', mmap_mode='r'),
+                    np.load(path / f'{key}.indices.npy', mmap_mode='r'),
+                )
+                for key in meta['arrays']
+            }
+            seq = meta['seq']
+        else:
+            name = None
+            # 先记下日志位置再读数据库，读取期间的变化会在之后重放
+            seq = int(self.store.get(SEQ_KEY) or 0)
+            arrays = build_arrays()
+        self.adjacency = {key: Adjacency(*value) for key, value in arrays.items()}
+        self.snapshot = name
+        self.seq = seq
+        self.gap_since = None
+
+    def sync(self, force=False):
+        """切换到新快照并重放增量日志（最多每 SYNC_INTERVAL 秒一次）"""
+        now = time.monotonic()
+        if not force and self.adjacency is not None and now - self.synced_at < self.sync_interval:
+            return self
+        with self.lock:
+            if self.adjacency is None:
+                self.load()
+            elif self.snapshot_dir is not None:
+                current = self.current_snapshot()
+                if current is not None and current[0] != self.snapshot:
+                    self.load()
+            self.replay()
+            self.synced_at = now
+        return self
+
+    def replay(self):
+        """重放序号大于已应用位置的增量（已应用位置之后的增量已被裁掉时从数据库重新加载）
+
+        序号先分配再写入日志，并发写入时可能暂时出现空缺：遇到空缺时已读到的增量照常应用，
+        但已应用位置停在空缺之前，下次从空缺处按顺序重放（增量是幂等的"设置边状态"）；
+        空缺超过 GAP_TIMEOUT 秒仍未补上（写入方崩溃）则跳过。
+        """
+        trimmed = int(self.store.get(TRIM_KEY) or 0)
+        if trimmed > self.seq:
+            logger.info(f'关系图增量日志已裁剪到 {trimmed}（本进程位置 {self.seq}），重新加载')
+            self.load()
+        entries = self.store.zrangebyscore(LOG_KEY, f'({self.seq}', '+inf', withscores=True)
+        contiguous = self.seq
+        for member, score in entries:
+            seq = int(score)
+            _, relation, src, dst, present = member.split(':')
+            src, dst, present = int(src), int(dst), present == '1'
+            self.adjacency[f'{relation}_out'].apply(src, dst, present)
+            self.adjacency[f'{relation}_in'].apply(dst, src, present)
+            if seq == contiguous + 1:
+                contiguous = seq
+        if entries and contiguous < int(entries[-1][1]):
+            if self.gap_since is None:
+                self.gap_since = time.monotonic()
+            if time.monotonic() - self.gap_since < self.gap_timeout:
+                self.seq = contiguous
+                return
+            logger.warning(f'关系图增量日志在 {contiguous + 1} 处的空缺超时，跳过')
+        if entries:
+            self.seq = int(entries[-1][1])
+        self.gap_since = None
+
+    # 查询
+
+    def _adjacency(self, key):
+        return self.sync().adjacency[key]
+
+    def is_following(self, follower_id, following_id):
+        return self._adjacency('follow_out').contains(follower_id, following_id)
+
+    def is_blocking(self, blocker_id, blocked_id):
+        return self._adjacency('block_out').contains(blocker_id, blocked_id)
+
+    def is_blocked_between(self, user_id, other_id):
+        """任一方屏蔽了另一方"""
+        return self.is_blocking(user_id, other_id) or self.is_blocking(other_id, user_id)
+
+    def following_of(self, user_id, ids):
+        """``ids`` 中被 ``user_id`` 关注的用户ID集合"""
+        adjacency = self._adjacency('follow_out')
+        return {obj_id for obj_id in ids if adjacency.contains(user_id, obj_id)}
+
+    def following_ids(self, user_id):
+        return self._adjacency('follow_out').neighbors(user_id)
+
+    def follower_ids(self, user_id):
+        return self._adjacency('follow_in').neighbors(user_id)
+
+    def blocked_ids(self, user_id):
+        """与 ``user_id`` 互相屏蔽（任一方向）的用户ID"""
+        return np.union1d(
+            self._adjacency('block_out').neighbors(user_id),
+            self._adjacency('block_in').neighbors(user_id)
+        )
+
+    def following_count(self, user_id):
+        return self._adjacency('follow_out').degree(user_id)
+
+    def followers_count(self, user_id):
+        return self._adjacency('follow_in').degree(user_id)
+
+    def mutual_followers(self, user_id, other_id):
+        """同时关注两人的用户ID（有序数组求交集）"""
+        return np.intersect1d(
+            self.follower_ids(user_id), self.follower_ids(other_id), assume_unique=True
+        )
+
+    def page(self, key, user_id, after=None, limit=20):
+        """按用户ID升序分页读取邻居（``after`` 为上一页最后一个ID）"""
+        row = self._adjacency(key).neighbors(user_id)
+        start = 0 if after is None else int(row.searchsorted(after, side='right'))
+        return row[start:start + limit].tolist()
+
+    # 写入
+
+    def record(self, relation, src, dst, present):
+        """追加一条增量到共享日志，并立即应用到本进程"""
+        seq = self.store.incr(SEQ_KEY)
+        self.store.zadd(LOG_KEY, {f'{seq}:{relation}:{src}:{dst}:{int(present)}': seq})
+        if self.adjacency is not None:
+            self.sync(force=True)
+
+
+def write_snapshot(snapshot_dir=None, keep=None, store=None):
+    """从数据库生成新快照并切换 CURRENT，清理旧快照和已包含在旧快照中的增量，返回快照目录"""
+    config = settings.SOCIAL_GRAPH
+    snapshot_dir = Path(snapshot_dir or config['SNAPSHOT_DIR'])
+    keep = keep or config['KEEP_SNAPSHOTS']
+    store = store if store is not None else get_store()
+
+    seq = int(store.get(SEQ_KEY) or 0)
+    arrays = build_arrays()
+
+    name = f'{int(time.time())}-{uuid.uuid4().hex[:8]}'
+    path = snapshot_dir / name
+    path.mkdir(parents=True)
+    for key, (indptr, indices) in arrays.items():
+        np.save(path / f'{key}.indptr.npy', indptr)
+        np.save(path / f'{key}.indices.npy', indices)
+    (path / 'meta.json').write_text(json.dumps({
+        'seq': seq,
+        'database': _database_name(),
+        'arrays': sorted(arrays),
+        'edges': {key: len(indices) for key, (_, indices) in arrays.items()},
+    }))
+
+    # 原子替换 CURRENT，读取方要么看到旧快照要么看到新快照
+    pointer = snapshot_dir / f'CURRENT.{name}'
+    pointer.write_text(name)
+    os.replace(pointer, snapshot_dir / 'CURRENT')
+
+    snapshots = sorted(
+        (child for child in snapshot_dir.iterdir() if child.is_dir()),
+        key=lambda child: child.stat().st_mtime
+    )
+    retained = snapshots[-keep:]
+    for child in snapshots[:-keep]:
+        shutil.rmtree(child, ignore_errors=True)
+
+    # 仍可能被映射的最旧快照之前的增量不再需要
+    oldest = json.loads((retained[0] / 'meta.json').read_text())['seq']
+    _trim(store, oldest)
+
+    logger.info(f'关系图快照 {name} 已生成（增量位置 {seq}）')
+    return path
+
+
+def _trim(store, seq):
+    """删除序号不大于 ``seq`` 的增量；先记下裁剪位置，读取方不会在没有标记时缺少增量"""
+    if seq > int(store.get(TRIM_KEY) or 0):
+        store.set(TRIM_KEY, seq)
+    store.zremrangebyscore(LOG_KEY, '-inf', seq)
+
+
+def trim_log(store=None, keep=None):
+    """只保留最近 ``keep`` 条增量（没有快照目录时由定时任务调用），返回删除的条数"""
+    store = store if store is not None else get_store()
+    keep = keep or settings.SOCIAL_GRAPH['LOG_LENGTH']
+    oldest_kept = store.zrange(LOG_KEY, -keep - 1, -keep - 1, withscores=True)
+    if not oldest_kept:
+        return 0
+    before = store.zcard(LOG_KEY)
+    _trim(store, int(oldest_kept[0][1]))
+    return before - store.zcard(LOG_KEY)
+
+
+class DatabaseGraph:
+    """直接查询关系表的关系图（接口同 ``GraphIndex``），用于共享存储不能跨进程共享时"""
+
+    @staticmethod
+    def _relation(key):
+        from django.apps import apps
+
+        relation, direction = key.rsplit('_', 1)
+        model, src, dst = RELATIONS[relation]
+        if direction == 'in':
+            src, dst = dst, src
+        return apps.get_model(model).objects, src, dst
+
+    def _exists(self, key, node, other):
+        objects, src, dst = self._relation(key)
+        return objects.filter(**{src: node, dst: other}).exists()
+
+    def _neighbors(self, key, node):
+        objects, src, dst = self._relation(key)
+        ids = objects.filter(**{src: node}).values_list(dst, flat=True)
+        return np.sort(np.fromiter(ids, dtype=np.int64))
+
+    def sync(self, force=False):
+        return self
+
+    def record(self, relation, src, dst, present):
+        """关系表即是数据源，不需要记录增量"""
+
+    def is_following(self, follower_id, following_id):
+        return self._exists('follow_out', follower_id, following_id)
+
+    def is_blocking(self, blocker_id, blocked_id):
+        return self._exists('block_out', blocker_id, blocked_id)
+
+    def is_blocked_between(self, user_id, other_id):
+        return self.is_blocking(user_id, other_id) or self.is_blocking(other_id, user_id)
+
+    def following_of(self, user_id, ids):
+        objects, src, dst = self._relation('follow_out')
+        return set(objects.filter(**{src: user_id, f'{dst}__in': ids}).values_list(dst, flat=True))
+
+    def following_ids(self, user_id):
+        return self._neighbors('follow_out', user_id)
+
+    def follower_ids(self, user_id):
+        return self._neighbors('follow_in', user_id)
+
+    def blocked_ids(self, user_id):
+        return np.union1d(self._neighbors('block_out', user_id), self._neighbors('block_in', user_id))
+
+    def following_count(self, user_id):
+        objects, src, _ = self._relation('follow_out')
+        return objects.filter(**{src: user_id}).count()
+
+    def followers_count(self, user_id):
+        objects, src, _ = self._relation('follow_in')
+        return objects.filter(**{src: user_id}).count()
+
+    def mutual_followers(self, user_id, other_id):
+        return np.intersect1d(
+            self.follower_ids(user_id), self.follower_ids(other_id), assume_unique=True
+        )
+
+    def page(self, key, user_id, after=None, limit=20):
+        objects, src, dst = self._relation(key)
+        queryset = objects.filter(**{src: user_id})
+        if after is not None:
+            queryset = queryset.filter(**{f'{dst}__gt': after})
+        return list(queryset.order_by(dst).values_list(dst, flat=True)[:limit])
+
+
+def schedule_change(relation, src, dst, present):
+    """事务提交后记录一条关系变化"""
+    transaction.on_commit(lambda: get_social_graph().record(relation, src, dst, present))
+
+
+_graph = None
+_graph_lock = threading.Lock()
+_database_graph = DatabaseGraph()
+
+
+def get_social_graph():
+    """进程级关系图索引；共享存储被替换（测试中 reset_store）时重新构建
+
+    共享存储不能跨进程共享时返回直接查询数据库的 ``DatabaseGraph``。
+    """
+    global _graph
+    store = get_store()
+    if not getattr(store, 'shared', True) and not settings.SOCIAL_GRAPH['INDEX_LOCAL_STORE']:
+        return _database_graph
+    if _graph is None or _graph.store is not store:
+        with _graph_lock:
+            if _graph is None or _graph.store is not store:
+                _graph = GraphIndex(store=store)
+    return _graph
\ No newline at end of file
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.social.graph import write_snapshot
+
+
+class Command(BaseCommand):
+    help = '从数据库生成关注、屏蔽关系图的mmap快照'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dir',
+            help='快照目录（默认见 SOCIAL_GRAPH_DIR）'
+        )
+    
+    def handle(self, *args, **options):
+        snapshot_dir = options['dir'] or settings.SOCIAL_GRAPH['SNAPSHOT_DIR']
+        if not snapshot_dir:
+            raise CommandError('未配置快照目录，请设置 SOCIAL_GRAPH_DIR 或使用 --dir')
+        
+        self.stdout.write('开始生成关系图快照...')
+        path = write_snapshot(snapshot_dir)
+        self.stdout.write(self.style.SUCCESS(f'快照已生成：{path}'))
\ No newline at end of file
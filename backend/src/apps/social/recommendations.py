@@ -0,0 +1,218 @@
+"""好友推荐（二度关系）
+
+把关注关系加载为稀疏邻接矩阵 ``A``（``A[u, v] = 1`` 表示 u 关注了 v），
+按批对用户行做稀疏矩阵乘法计算二度候选人的得分：
+
+    共同关注数   M = A · A
+    Adamic-Adar  S = A · diag(1 / log(deg)) · A
+
+中间人 v 的度数（粉丝数 + 关注数）越大，经由 v 的推荐越不"特别"，权重越低。
+去掉自己、已关注的人和共同关注数不足的候选人后，每个用户保留得分最高的 TOP_K 个，
+写入共享存储的有序集合。读取推荐是一次 ``ZREVRANGE``，屏蔽和关注在读取时再排除。
+
+定时任务定期全量重建；关注关系变化时把关注者记入待刷新集合，
+由定时任务从关系图索引（见 apps.social.graph）取出这些用户的二度子图增量重算。
+"""
+import logging
+
+import numpy as np
+from django.conf import settings
+from scipy import sparse
+
+from apps.core.store import get_store
+
+logger = logging.getLogger(__name__)
+
+
+class RecommendationEngine:
+    """二度关系推荐引擎"""
+
+    key_prefix = 'recommend:users'
+    members_key = 'recommend:users:members'
+    dirty_key = 'recommend:users:dirty'
+
+    def __init__(self, store=None, top_k=None, min_mutual=None, batch_size=None):
+        config = settings.USER_RECOMMENDATIONS
+        self.store = store if store is not None else get_store()
+        self.top_k = top_k or config['TOP_K']
+        self.min_mutual = min_mutual or config['MIN_MUTUAL']
+        self.batch_size = batch_size or config['BATCH_SIZE']
+
+    def key(self, user_id):
+        return f'{self.key_prefix}:{user_id}'
+
+    # 读取
+
+    def recommended_ids(self, user_id, limit=None):
+        """按得分从高到低的推荐用户ID（未排除之后新关注、屏蔽的人）"""
+        end = (limit or self.top_k) - 1
+        return [int(member) for member in self.store.zrevrange(self.key(user_id), 0, end)]
+
+    # 计算
+
+    @staticmethod
+    def adjacency(edges):
+        """把 (关注者ID, 被关注者ID) 数组转为邻接矩阵，返回 (矩阵, 行号对应的用户ID)"""
+        if not len(edges):
+            return sparse.csr_matrix((0, 0), dtype=np.float64), np.zeros(0, dtype=np.int64)
+        user_ids, index = np.unique(edges, return_inverse=True)
+        index = index.reshape(edges.shape)
+        size = len(user_ids)
+        matrix = sparse.csr_matrix(
+            (np.ones(len(edges), dtype=np.float64), (index[:, 0], index[:, 1])),
+            shape=(size, size)
+        )
+        # 重复的关注记录合并为1
+        matrix.data[:] = 1.0
+        return matrix, user_ids
+
+    def score_rows(self, matrix, rows, degrees):
+        """计算 ``rows`` 对应用户的候选人得分，返回 {行号: [(候选行号, 得分), ...]}"""
+        with np.errstate(divide='ignore'):
+            weights = np.where(degrees > 1, 1.0 / np.log(np.maximum(degrees, 2)), 0.0)
+
+        block = matrix[rows]
+        mutual = (block @ matrix).tocoo()
+        adamic_adar = (block @ sparse.diags(weights) @ matrix).tocsr()
+
+        # 共同关注数和 Adamic-Adar 稀疏结构相同，按 (行, 列) 对齐取分
+        batch_rows, cols, counts = mutual.row, mutual.col, mutual.data
+        scores = np.asarray(adamic_adar[batch_rows, cols]).ravel()
+
+        # 排除自己、已关注的人和共同关注数不足的候选人
+        size = matrix.shape[1]
+        followed = block.tocoo()
+        followed_keys = followed.row.astype(np.int64) * size + followed.col
+        keys = batch_rows.astype(np.int64) * size + cols
+        keep = (
+            (cols != rows[batch_rows])
+            & (counts >= self.min_mutual)
+            & ~np.isin(keys, followed_keys)
+        )
+        batch_rows, cols, scores, counts = batch_rows[keep], cols[keep], scores[keep], counts[keep]
+
+        # 每行按得分（同分按共同关注数）降序取前 TOP_K
+        order = np.lexsort((-counts, -scores, batch_rows))
+        batch_rows, cols, scores = batch_rows[order], cols[order], scores[order]
+        starts = np.searchsorted(batch_rows, batch_rows, side='left')
+        rank = np.arange(len(batch_rows)) - starts
+        top = rank < self.top_k
+
+        result = {row: [] for row in rows.tolist()}
+        for batch_row, col, score in zip(batch_rows[top].tolist(), cols[top].tolist(), scores[top].tolist()):
+            result[int(rows[batch_row])].append((col, score))
+        return result
+
+    # 写入
+
+    def store_results(self, results, user_ids):
+        """把一批用户的推荐整体替换写入存储"""
+        pipe = self.store.pipeline(transaction=False)
+        members = []
+        for row, candidates in results.items():
+            user_id = int(user_ids[row])
+            pipe.delete(self.key(user_id))
+            if candidates:
+                pipe.zadd(self.key(user_id), {int(user_ids[col]): score for col, score in candidates})
+                members.append(user_id)
+        if members:
+            pipe.sadd(self.members_key, *members)
+        pipe.execute()
+        return members
+
+    def rebuild(self):
+        """全量重建所有用户的推荐，返回有推荐的用户数"""
+        from .models import Follow
+
+        edges = np.fromiter(
+            (
+                value
+                for pair in Follow.objects.values_list('follower_id', 'following_id').iterator(chunk_size=10000)
+                for value in pair
+            ),
+            dtype=np.int64
+        ).reshape(-1, 2)
+        matrix, user_ids = self.adjacency(edges)
+        degrees = np.asarray(matrix.sum(axis=0)).ravel() + np.asarray(matrix.sum(axis=1)).ravel()
+
+        previous = {int(member) for member in self.store.smembers(self.members_key)}
+        current = set()
+        for start in range(0, len(user_ids), self.batch_size):
+            rows = np.arange(start, min(start + self.batch_size, len(user_ids)))
+            results = self.score_rows(matrix, rows, degrees)
+            current.update(self.store_results(results, user_ids))
+
+        # 清理已经没有候选人的用户
+        stale = previous - current
+        if stale:
+            self.store.delete(*[self.key(user_id) for user_id in stale])
+            self.store.srem(self.members_key, *stale)
+
+        logger.info(f'好友推荐重建完成，共 {len(current)} 个用户')
+        return len(current)
+
+    def refresh(self, user_ids):
+        """从关系图索引取出指定用户的二度子图，增量重算他们的推荐"""
+        from .graph import get_social_graph
+
+        user_ids = sorted(set(user_ids))
+        if not user_ids:
+            return 0
+        graph = get_social_graph()
+
+        def out_edges(sources):
+            pairs = [
+                np.column_stack((np.full(len(targets), source, dtype=np.int64), targets))
+                for source in sources
+                for targets in [graph.following_ids(source)]
+            ]
+            return np.concatenate(pairs) if pairs else np.zeros((0, 2), dtype=np.int64)
+
+        first_hop = out_edges(user_ids)
+        middle_ids = np.unique(first_hop[:, 1])
+        edges = np.concatenate((first_hop, out_edges(middle_ids.tolist())))
+        matrix, node_ids = self.adjacency(edges)
+
+        # 子图上的度数不完整，中间人的度数从关系图索引读取
+        degrees = np.zeros(len(node_ids), dtype=np.float64)
+        for user_id in middle_ids.tolist():
+            degrees[np.searchsorted(node_ids, user_id)] = (
+                graph.followers_count(user_id) + graph.following_count(user_id)
+            )
+
+        rows = np.searchsorted(node_ids, user_ids)
+        present = rows < len(node_ids)
+        present[present] = node_ids[rows[present]] == np.asarray(user_ids)[present]
+
+        current = self.store_results(self.score_rows(matrix, rows[present], degrees), node_ids) if present.any() else []
+        stale = set(user_ids) - set(current)
+        if stale:
+            self.store.delete(*[self.key(user_id) for user_id in stale])
+            self.store.srem(self.members_key, *stale)
+        return len(current)
+
+    # 增量刷新
+
+    def mark_dirty(self, *user_ids):
+        """关注关系变化后记入待刷新集合"""
+        if user_ids:
+            self.store.sadd(self.dirty_key, *user_ids)
+
+    def refresh_dirty(self):
+        """刷新待刷新集合中的用户，返回刷新的用户数"""
+        processing_key = f'{self.dirty_key}:processing'
+        if not self.store.exists(processing_key):
+            try:
+                self.store.rename(self.dirty_key, processing_key)
+            except Exception:
+                # 没有待刷新的用户
+                return 0
+        user_ids = [int(member) for member in self.store.smembers(processing_key)]
+        for start in range(0, len(user_ids), self.batch_size):
+            self.refresh(user_ids[start:start + self.batch_size])
+        self.store.delete(processing_key)
+        return len(user_ids)
+
+
+def get_recommendation_engine():
+    return RecommendationEngine()
\ No newline at end of file
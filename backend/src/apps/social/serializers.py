@@ -1,7 +1,9 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import Follow, Block, Conversation, Message, MessageRead, Report
+from apps.users.cards import UserCardField
 from apps.users.serializers import UserSerializer
+from apps.core.loaders import BatchedListSerializer, get_viewer_loader
 
 User = get_user_model()
 
@@ -9,13 +11,14 @@ User = get_user_model()
 class FollowSerializer(serializers.ModelSerializer):
     """关注关系序列化器"""
     
-    follower = UserSerializer(read_only=True)
-    following = UserSerializer(read_only=True)
+    follower = UserCardField(card='full')
+    following = UserCardField(card='full')
     
     class Meta:
         model = Follow
         fields = ['id', 'follower', 'following', 'created_at']
         read_only_fields = ['id', 'created_at']
+        list_serializer_class = BatchedListSerializer
 
 
 class FollowCreateSerializer(serializers.ModelSerializer):
@@ -42,13 +45,14 @@ class FollowCreateSerializer(serializers.ModelSerializer):
 class BlockSerializer(serializers.ModelSerializer):
     """屏蔽关系序列化器"""
     
-    blocker = UserSerializer(read_only=True)
-    blocked = UserSerializer(read_only=True)
+    blocker = UserCardField(card='full')
+    blocked = UserCardField(card='full')
     
     class Meta:
         model = Block
         fields = ['id', 'blocker', 'blocked', 'reason', 'created_at']
         read_only_fields = ['id', 'created_at']
+        list_serializer_class = BatchedListSerializer
 
 
 class BlockCreateSerializer(serializers.ModelSerializer):
@@ -142,7 +146,7 @@ class ConversationCreateSerializer(serializers.ModelSerializer):
 class MessageSerializer(serializers.ModelSerializer):
     """消息序列化器"""
     
-    sender = UserSerializer(read_only=True)
+    sender = UserCardField(card='full')
     is_read = serializers.SerializerMethodField()
     
     class Meta:
@@ -153,15 +157,16 @@ class MessageSerializer(serializers.ModelSerializer):
             'is_read'
         ]
         read_only_fields = ['id', 'sender', 'created_at', 'updated_at']
+        list_serializer_class = BatchedListSerializer
+    
+    def prime_viewer_state(self, instances, loader):
+        loader.queue('read_messages', [obj.id for obj in instances])
     
     def get_is_read(self, obj):
         """获取消息是否已读"""
-        request = self.context.get('request')
-        if request and request.user:
-            return MessageRead.objects.filter(
-                message=obj,
-                user=request.user
-            ).exists()
+        loader = get_viewer_loader(self.context)
+        if loader:
+            return loader.get('read_messages', obj.id)
         return False
 
 
@@ -195,19 +200,20 @@ class MessageCreateSerializer(serializers.ModelSerializer):
 class MessageReadSerializer(serializers.ModelSerializer):
     """消息已读状态序列化器"""
     
-    user = UserSerializer(read_only=True)
+    user = UserCardField(card='full')
     
     class Meta:
         model = MessageRead
         fields = ['id', 'message', 'user', 'read_at']
         read_only_fields = ['id', 'user', 'read_at']
+        list_serializer_class = BatchedListSerializer
 
 
 class ReportSerializer(serializers.ModelSerializer):
     """举报序列化器"""
     
-    reporter = UserSerializer(read_only=True)
-    reported_user = UserSerializer(read_only=True)
+    reporter = UserCardField(card='full')
+    reported_user = UserCardField(card='full')
     
     class Meta:
         model = Report
@@ -217,6 +223,7 @@ class ReportSerializer(serializers.ModelSerializer):
             'status', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'reporter', 'created_at', 'updated_at']
+        list_serializer_class = BatchedListSerializer
 
 
 class ReportCreateSerializer(serializers.ModelSerializer):
@@ -261,4 +268,5 @@ class UserStatsSerializer(serializers.Serializer):
     followers_count = serializers.IntegerField()
     following_count = serializers.IntegerField()
     posts_count = serializers.IntegerField()
-    likes_received_count = serializers.IntegerField()
\ No newline at end of file
+    likes_received_count = serializers.IntegerField()
+    comments_received_count = serializers.IntegerField()
\ No newline at end of file
@@ -1,8 +1,13 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.contenttypes.models import ContentType
-from .models import Follow
+from .models import Follow, Block
 from apps.notifications.models import Notification
+from apps.core.versions import bump_versions
+from apps.users.counters import schedule_incr
+from apps.posts.timeline import get_timeline_store
+from .graph import schedule_change
+from .recommendations import get_recommendation_engine
 
 
 @receiver(post_save, sender=Follow)
@@ -28,4 +33,82 @@ def delete_follow_notification(sender, instance, **kwargs):
         notification_type='follow',
         content_type=ContentType.objects.get_for_model(instance),
         object_id=instance.id
-    ).delete()
\ No newline at end of file
+    ).delete()
+
+
+@receiver(post_save, sender=Follow)
+def handle_follow_timeline(sender, instance, created, **kwargs):
+    """关注后丢弃关注者的时间线，下次读取时重建"""
+    if created:
+        get_timeline_store().invalidate(instance.follower_id)
+
+
+@receiver(post_delete, sender=Follow)
+def handle_unfollow_timeline(sender, instance, **kwargs):
+    """取消关注后丢弃关注者的时间线，下次读取时重建"""
+    get_timeline_store().invalidate(instance.follower_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def bump_follow_versions(sender, instance, **kwargs):
+    """关注关系变化后使双方资料、统计和关注者（is_following）的响应缓存失效"""
+    bump_versions(
+        ('user', instance.follower_id),
+        ('user', instance.following_id),
+        ('viewer', instance.follower_id)
+    )
+
+
+@receiver(post_save, sender=Follow)
+def increment_follow_counts(sender, instance, created, **kwargs):
+    """关注后累加双方的关注数、粉丝数（批量写回）"""
+    if created:
+        schedule_incr(
+            (instance.follower_id, 'following_count', 1),
+            (instance.following_id, 'followers_count', 1)
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def decrement_follow_counts(sender, instance, **kwargs):
+    """取消关注后减少双方的关注数、粉丝数（批量写回）"""
+    schedule_incr(
+        (instance.follower_id, 'following_count', -1),
+        (instance.following_id, 'followers_count', -1)
+    )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def mark_recommendations_dirty(sender, instance, **kwargs):
+    """关注关系变化后由定时任务增量刷新关注者的推荐"""
+    get_recommendation_engine().mark_dirty(instance.follower_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_save, sender=Block)
+def record_graph_edge_added(sender, instance, created, **kwargs):
+    """新增关注、屏蔽后追加到关系图的增量日志"""
+    if created:
+        if sender is Follow:
+            schedule_change('follow', instance.follower_id, instance.following_id, True)
+        else:
+            schedule_change('block', instance.blocker_id, instance.blocked_id, True)
+
+
+@receiver(post_delete, sender=Follow)
+@receiver(post_delete, sender=Block)
+def record_graph_edge_removed(sender, instance, **kwargs):
+    """取消关注、屏蔽后追加到关系图的增量日志"""
+    if sender is Follow:
+        schedule_change('follow', instance.follower_id, instance.following_id, False)
+    else:
+        schedule_change('block', instance.blocker_id, instance.blocked_id, False)
+
+
+@receiver(post_save, sender=Block)
+@receiver(post_delete, sender=Block)
+def bump_block_versions(sender, instance, **kwargs):
+    """屏蔽关系变化后使双方时间线的响应缓存失效（时间线按屏蔽关系过滤）"""
+    bump_versions(('feed', instance.blocker_id), ('feed', instance.blocked_id))
\ No newline at end of file
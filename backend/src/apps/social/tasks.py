@@ -0,0 +1,45 @@
+from celery import shared_task
+from django.conf import settings
+import logging
+
+from .graph import trim_log, write_snapshot
+from .recommendations import get_recommendation_engine
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def rebuild_user_recommendations():
+    """定时全量重建好友推荐"""
+    try:
+        get_recommendation_engine().rebuild()
+        
+    except Exception as e:
+        logger.error(f'好友推荐重建失败: {e}')
+
+
+@shared_task
+def refresh_user_recommendations():
+    """增量刷新关注关系有变化的用户的推荐"""
+    try:
+        refreshed = get_recommendation_engine().refresh_dirty()
+        if refreshed:
+            logger.info(f'好友推荐已刷新 {refreshed} 个用户')
+        
+    except Exception as e:
+        logger.error(f'好友推荐刷新失败: {e}')
+
+
+@shared_task
+def snapshot_social_graph():
+    """定时生成关系图快照；未配置快照目录时只裁剪增量日志"""
+    try:
+        if not settings.SOCIAL_GRAPH['SNAPSHOT_DIR']:
+            trimmed = trim_log()
+            if trimmed:
+                logger.info(f'关系图增量日志已裁剪 {trimmed} 条')
+            return
+        write_snapshot()
+        
+    except Exception as e:
+        logger.error(f'关系图快照生成失败: {e}')
\ No newline at end of file
@@ -3,8 +3,9 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
-from django.db.models import Q, Count, Exists, OuterRef
-from django.db import transaction
+from django.db.models import Q, Exists, OuterRef
+from django.db import IntegrityError, transaction
+from django.conf import settings
 
 from .models import Follow, Block, Conversation, Message, MessageRead, Report
 from .serializers import (
@@ -21,7 +22,15 @@ from .serializers import (
     ReportCreateSerializer,
     UserStatsSerializer
 )
+from .blocks import get_block_filter
+from .graph import get_social_graph
+from .recommendations import get_recommendation_engine
+from apps.users.counters import user_stats
 from apps.users.serializers import UserSerializer
+from apps.users.search import get_user_search_index
+from apps.core.http_cache import cache_response
+from apps.core.ordering import preserve_order
+from apps.core.streaming import StreamingListMixin
 
 User = get_user_model()
 
@@ -38,6 +47,7 @@ class FollowUserView(generics.CreateAPIView):
         
         following_user = serializer.validated_data['following']
         
+        # 写入路径以数据库为准，关系图索引可能滞后
         # 检查是否已经关注
         if Follow.objects.filter(
             follower=request.user,
@@ -58,7 +68,15 @@ class FollowUserView(generics.CreateAPIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        follow = serializer.save()
+        try:
+            with transaction.atomic():
+                follow = serializer.save()
+        except IntegrityError:
+            # 并发请求已经创建了关注关系
+            return Response(
+                {'message': '已经关注过该用户'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         return Response(
             FollowSerializer(follow, context={'request': request}).data,
             status=status.HTTP_201_CREATED
@@ -90,7 +108,7 @@ class UnfollowUserView(generics.DestroyAPIView):
             )
 
 
-class FollowersListView(generics.ListAPIView):
+class FollowersListView(StreamingListMixin, generics.ListAPIView):
     """粉丝列表"""
     
     serializer_class = FollowSerializer
@@ -100,10 +118,10 @@ class FollowersListView(generics.ListAPIView):
         user_id = self.kwargs['user_id']
         return Follow.objects.filter(
             following_id=user_id
-        ).select_related('follower', 'following')
+        )
 
 
-class FollowingListView(generics.ListAPIView):
+class FollowingListView(StreamingListMixin, generics.ListAPIView):
     """关注列表"""
     
     serializer_class = FollowSerializer
@@ -113,7 +131,7 @@ class FollowingListView(generics.ListAPIView):
         user_id = self.kwargs['user_id']
         return Follow.objects.filter(
             follower_id=user_id
-        ).select_related('follower', 'following')
+        )
 
 
 class IsFollowingView(generics.RetrieveAPIView):
@@ -122,10 +140,7 @@ class IsFollowingView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request, user_id):
-        is_following = Follow.objects.filter(
-            follower=request.user,
-            following_id=user_id
-        ).exists()
+        is_following = get_social_graph().is_following(request.user.id, user_id)
         
         return Response({'is_following': is_following})
 
@@ -142,7 +157,7 @@ class BlockUserView(generics.CreateAPIView):
         
         blocked_user = serializer.validated_data['blocked']
         
-        # 检查是否已经屏蔽
+        # 检查是否已经屏蔽（写入路径以数据库为准）
         if Block.objects.filter(
             blocker=request.user,
             blocked=blocked_user
@@ -152,15 +167,22 @@ class BlockUserView(generics.CreateAPIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        with transaction.atomic():
-            # 创建屏蔽关系
-            block = serializer.save()
-            
-            # 删除相互关注关系
-            Follow.objects.filter(
-                Q(follower=request.user, following=blocked_user) |
-                Q(follower=blocked_user, following=request.user)
-            ).delete()
+        try:
+            with transaction.atomic():
+                # 创建屏蔽关系
+                block = serializer.save()
+                
+                # 删除相互关注关系
+                Follow.objects.filter(
+                    Q(follower=request.user, following=blocked_user) |
+                    Q(follower=blocked_user, following=request.user)
+                ).delete()
+        except IntegrityError:
+            # 并发请求已经创建了屏蔽关系
+            return Response(
+                {'message': '已经屏蔽过该用户'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         return Response(
             BlockSerializer(block, context={'request': request}).data,
@@ -202,7 +224,7 @@ class BlockedUsersListView(generics.ListAPIView):
     def get_queryset(self):
         return Block.objects.filter(
             blocker=self.request.user
-        ).select_related('blocker', 'blocked')
+        )
 
 
 class IsBlockedView(generics.RetrieveAPIView):
@@ -211,15 +233,9 @@ class IsBlockedView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request, user_id):
-        is_blocked = Block.objects.filter(
-            blocker=request.user,
-            blocked_id=user_id
-        ).exists()
-        
-        is_blocked_by = Block.objects.filter(
-            blocker_id=user_id,
-            blocked=request.user
-        ).exists()
+        graph = get_social_graph()
+        is_blocked = graph.is_blocking(request.user.id, user_id)
+        is_blocked_by = graph.is_blocking(user_id, request.user.id)
         
         return Response({
             'is_blocked': is_blocked,
@@ -414,26 +430,16 @@ class UserStatsView(generics.RetrieveAPIView):
     serializer_class = UserStatsSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     
+    @cache_response(lambda view, request, user_id: [('user', user_id)], per_viewer=False)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+    
     def get_object(self):
         user_id = self.kwargs['user_id']
-        user = get_object_or_404(User, id=user_id)
+        user = get_object_or_404(User.objects.select_related('stats'), id=user_id)
         
-        # 统计数据
-        followers_count = Follow.objects.filter(following=user).count()
-        following_count = Follow.objects.filter(follower=user).count()
-        posts_count = user.posts.filter(is_deleted=False).count()
-        likes_received_count = user.posts.filter(
-            is_deleted=False
-        ).aggregate(
-            total_likes=Count('post_likes')
-        )['total_likes'] or 0
-        
-        return {
-            'followers_count': followers_count,
-            'following_count': following_count,
-            'posts_count': posts_count,
-            'likes_received_count': likes_received_count
-        }
+        # 一次查询读取维护的计数和统计汇总（叠加尚未写回的增量）
+        return user_stats(user)
 
 
 class RecommendedUsersView(generics.ListAPIView):
@@ -441,33 +447,38 @@ class RecommendedUsersView(generics.ListAPIView):
     
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
+    limit = 10
     
     def get_queryset(self):
         user = self.request.user
         
-        # 获取用户已关注的人
-        following_ids = Follow.objects.filter(
-            follower=user
-        ).values_list('following_id', flat=True)
-        
-        # 获取用户屏蔽的人
-        blocked_ids = Block.objects.filter(
-            Q(blocker=user) | Q(blocked=user)
-        ).values_list('blocked_id', 'blocker_id')
-        blocked_user_ids = set()
-        for blocked_id, blocker_id in blocked_ids:
-            blocked_user_ids.add(blocked_id)
-            blocked_user_ids.add(blocker_id)
-        
-        # 排除自己、已关注的人、屏蔽的人
-        exclude_ids = list(following_ids) + list(blocked_user_ids) + [user.id]
-        
-        # 推荐逻辑：按粉丝数排序
-        return User.objects.exclude(
-            id__in=exclude_ids
-        ).annotate(
-            followers_count=Count('followers')
-        ).order_by('-followers_count')[:10]
+        # 预计算的二度关系推荐（一次有序集合读取），读取时排除已关注、屏蔽的人
+        candidate_ids = get_recommendation_engine().recommended_ids(user.id)
+        if candidate_ids:
+            graph = get_social_graph()
+            candidate_ids = [
+                user_id for user_id in candidate_ids
+                if not graph.is_following(user.id, user_id) and not graph.is_blocked_between(user.id, user_id)
+            ][:self.limit]
+        
+        users = list(User.objects.filter(
+            id__in=candidate_ids, is_active=True
+        ).order_by(preserve_order(candidate_ids))) if candidate_ids else []
+        if len(users) >= self.limit:
+            return users
+        
+        # 推荐不足时（新用户、关注很少）按粉丝数补足（维护的计数字段，走索引）
+        blocked = Block.objects.filter(Q(blocker=user) | Q(blocked=user))
+        popular = User.objects.exclude(
+            id__in=[user.id, *candidate_ids]
+        ).exclude(
+            id__in=Follow.objects.filter(follower=user).values('following_id')
+        ).exclude(
+            id__in=blocked.values('blocked_id')
+        ).exclude(
+            id__in=blocked.values('blocker_id')
+        ).order_by('-followers_count')[:self.limit - len(users)]
+        return users + list(popular)
 
 
 class SearchUsersView(generics.ListAPIView):
@@ -481,11 +492,16 @@ class SearchUsersView(generics.ListAPIView):
         if not query:
             return User.objects.none()
         
+        # 邮箱只支持精确匹配（唯一索引），名称走前缀索引
+        if '@' in query:
+            users = User.objects.filter(email__iexact=query, is_active=True)
+            return get_block_filter(self.request).users(users)
+        
+        user_ids = get_user_search_index().search(
+            query, limit=settings.USER_SEARCH['MAX_PER_PREFIX']
+        )
+        # 在搜索索引返回的ID上剔除屏蔽关系中的用户，不增加查询条件
+        user_ids = get_block_filter(self.request).user_ids(user_ids)
         return User.objects.filter(
-            Q(username__icontains=query) |
-            Q(first_name__icontains=query) |
-            Q(last_name__icontains=query) |
-            Q(email__icontains=query)
-        ).annotate(
-            followers_count=Count('followers')
-        ).order_by('-followers_count')
\ No newline at end of file
+            id__in=user_ids, is_active=True
+        ).order_by(preserve_order(user_ids))
\ No newline at end of file
@@ -0,0 +1,37 @@
+"""用户相关的缓存"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+USERNAME_KEY = 'users:id:{}'
+
+
+def get_user_id(username):
+    """用户名对应的用户ID（缓存），用户不存在时返回None"""
+    key = USERNAME_KEY.format(username)
+    user_id = cache.get(key)
+    if user_id is None:
+        from .models import User
+
+        user_id = User.objects.filter(username=username).values_list('id', flat=True).first()
+        if user_id is None:
+            return None
+        cache.set(key, user_id, settings.USER_CARDS['USERNAME_TIMEOUT'])
+    return user_id
+
+
+def forget_usernames(*usernames):
+    """删除用户名的ID缓存；提交后再删除一次，避免事务期间其他请求写回旧映射"""
+    keys = [USERNAME_KEY.format(username) for username in set(usernames) if username]
+    if keys:
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def remember_username(user):
+    """用户保存后缓存新用户名的ID，改名时删除旧用户名"""
+    loaded = getattr(user, '_loaded_username', None)
+    if loaded is not None and loaded != user.username:
+        forget_usernames(loaded)
+    cache.set(USERNAME_KEY.format(user.username), user.id, settings.USER_CARDS['USERNAME_TIMEOUT'])
+    user._loaded_username = user.username
\ No newline at end of file
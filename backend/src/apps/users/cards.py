@@ -0,0 +1,138 @@
+"""用户卡片缓存
+
+帖子、评论、关注、屏蔽、消息、通知等接口都会嵌套作者信息。原来每种序列化器各自嵌套
+``UserListSerializer`` / ``UserSerializer``，需要依赖视图 ``select_related``，
+``UserSerializer`` 还会为每一行的 ``profile`` 单独查询一次。
+
+这里把与查看者无关的用户信息渲染成"卡片"缓存起来，按用户ID共享：
+
+- ``UserCardField`` 只读取外键ID，不加载关联对象；
+- 列表序列化前（``BatchedListSerializer.prime``）登记整页的用户ID，首次读取时用一次
+  ``get_many`` 取出，未命中的用一次 ``select_related('profile')`` 查询批量渲染并写回缓存；
+- 用户或用户资料保存后删除对应卡片（见 signals.py）；
+- is_following 因人而异，读取时由当前请求的加载器叠加。
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import serializers
+from rest_framework.fields import get_attribute
+
+from apps.core.loaders import get_viewer_loader
+
+CARD_KEY = 'users:card:{}:{}'
+CARD_KINDS = ('list', 'full')
+
+
+def _card_serializers():
+    from .serializers import UserCardSerializer, UserSerializer
+    return {'list': UserCardSerializer, 'full': UserSerializer}
+
+
+def get_cards(kind, user_ids):
+    """批量读取用户卡片，返回 ``{用户ID: 卡片}``，不存在的用户不在结果中"""
+    from .models import User
+
+    keys = {user_id: CARD_KEY.format(kind, user_id) for user_id in set(user_ids)}
+    if not keys:
+        return {}
+    cached = cache.get_many(keys.values())
+    cards = {user_id: cached[key] for user_id, key in keys.items() if key in cached}
+
+    missing = [user_id for user_id in keys if user_id not in cards]
+    if missing:
+        users = list(User.objects.filter(id__in=missing).select_related('profile'))
+        rendered = _card_serializers()[kind](users, many=True).data
+        fresh = {user.id: dict(data) for user, data in zip(users, rendered)}
+        cache.set_many(
+            {keys[user_id]: card for user_id, card in fresh.items()},
+            settings.USER_CARDS['TIMEOUT']
+        )
+        cards.update(fresh)
+    return cards
+
+
+def invalidate_cards(user_id):
+    """删除用户的卡片；提交后再删除一次，避免事务期间其他请求写回旧数据"""
+    keys = [CARD_KEY.format(kind, user_id) for kind in CARD_KINDS]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class UserCardLoader:
+    """请求级别的卡片加载器：登记整页用户ID，首次读取时统一加载"""
+
+    def __init__(self):
+        self._cards = defaultdict(dict)
+        self._pending = defaultdict(set)
+
+    def queue(self, kind, user_ids):
+        cards = self._cards[kind]
+        self._pending[kind].update(
+            user_id for user_id in user_ids if user_id is not None and user_id not in cards
+        )
+
+    def get(self, kind, user_id):
+        cards = self._cards[kind]
+        if user_id not in cards:
+            ids = self._pending.pop(kind, set())
+            ids.add(user_id)
+            found = get_cards(kind, ids)
+            for pending_id in ids:
+                cards[pending_id] = found.get(pending_id)
+        return cards[user_id]
+
+
+def get_card_loader(context):
+    """从序列化器上下文中获取（或创建）当前请求的卡片加载器，没有请求时保存在上下文中"""
+    request = context.get('request')
+    if request is None:
+        return context.setdefault('_user_card_loader', UserCardLoader())
+
+    loader = getattr(request, '_user_card_loader', None)
+    if loader is None:
+        loader = UserCardLoader()
+        request._user_card_loader = loader
+    return loader
+
+
+class UserCardField(serializers.Field):
+    """嵌套的用户信息（只读），从卡片缓存读取
+
+    ``card='list'`` 与 ``UserListSerializer`` 输出一致，``card='full'`` 与 ``UserSerializer`` 输出一致。
+    """
+
+    def __init__(self, card='list', **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+        self.card = card
+
+    def get_attribute(self, instance):
+        # 只读取外键ID，不触发关联对象的查询；``.values()`` 的行取 ``author_id`` 或嵌套的 ``author['id']``
+        owner = get_attribute(instance, self.source_attrs[:-1])
+        name = self.source_attrs[-1]
+        if owner is None:
+            return None
+        if isinstance(owner, dict):
+            if f'{name}_id' in owner:
+                return owner[f'{name}_id']
+            related = owner.get(name)
+            return related['id'] if related else None
+        return getattr(owner, f'{name}_id')
+
+    def prime_field(self, instances):
+        """登记整页对象的用户ID"""
+        user_ids = [self.get_attribute(instance) for instance in instances]
+        get_card_loader(self.context).queue(self.card, user_ids)
+        loader = get_viewer_loader(self.context)
+        if loader is not None and self.card == 'list':
+            loader.queue('following', user_ids)
+
+    def to_representation(self, user_id):
+        card = get_card_loader(self.context).get(self.card, user_id)
+        if card is None or self.card != 'list':
+            return card
+        loader = get_viewer_loader(self.context)
+        return dict(card, is_following=loader.get('following', user_id) if loader else False)
\ No newline at end of file
@@ -0,0 +1,67 @@
+"""用户社交计数（粉丝数、关注数、帖子数，收到的点赞数、评论数）
+
+关注、取消关注、发帖、删帖、点赞、评论时把增量累加到写回缓冲（见 apps.core.counters），
+由定时任务合并后批量写回 ``User`` 和 ``UserStats`` 的计数字段；同一用户在一个周期内的多次变化只写一次。
+统计接口读取"字段值 + 待写入增量"，不再对 follows、posts、likes 表实时聚合。
+"""
+from django.db import transaction
+
+from apps.core.counters import CounterBuffer
+
+from .models import User, UserStats
+
+FIELDS = ('followers_count', 'following_count', 'posts_count')
+STATS_FIELDS = ('likes_received_count', 'comments_received_count')
+
+
+def get_user_counter():
+    """用户计数的写回缓冲"""
+    return CounterBuffer(User, FIELDS)
+
+
+class UserStatsBuffer(CounterBuffer):
+    """用户统计汇总的写回缓冲：写回前补建缺少的统计行，增量不会因为UPDATE不到行而丢失"""
+
+    def apply(self, deltas, batch_size=500):
+        obj_ids = list(deltas)
+        for start in range(0, len(obj_ids), batch_size):
+            UserStats.objects.bulk_create(
+                [UserStats(user_id=user_id) for user_id in obj_ids[start:start + batch_size]],
+                ignore_conflicts=True
+            )
+        super().apply(deltas, batch_size)
+
+
+def get_user_stats_counter():
+    """用户统计汇总的写回缓冲（主键即用户ID）"""
+    return UserStatsBuffer(UserStats, STATS_FIELDS)
+
+
+def schedule_incr(*changes):
+    """事务提交后累加增量，``changes`` 为 ``(用户ID, 字段, 增量)``"""
+    changes = [change for change in changes if change[0] is not None and change[2]]
+    if not changes:
+        return
+
+    def incr():
+        counters = {'user': get_user_counter(), 'stats': get_user_stats_counter()}
+        for user_id, field, amount in changes:
+            counters['stats' if field in STATS_FIELDS else 'user'].incr(user_id, field, amount)
+    transaction.on_commit(incr)
+
+
+def user_stats(user):
+    """用户的统计数据（维护的计数叠加待写入增量），``user`` 应已 ``select_related('stats')``"""
+    get_user_counter().overlay([user])
+    try:
+        stats = user.stats
+    except UserStats.DoesNotExist:
+        stats = UserStats(user=user)
+    get_user_stats_counter().overlay([stats])
+    return {
+        'followers_count': user.followers_count,
+        'following_count': user.following_count,
+        'posts_count': user.posts_count,
+        'likes_received_count': stats.likes_received_count,
+        'comments_received_count': stats.comments_received_count,
+    }
\ No newline at end of file
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.reconcile import reconcile_all
+from apps.users.models import User, UserStats
+
+
+class Command(BaseCommand):
+    help = '为缺少统计行的用户补建 UserStats，并按明细表重新统计收到的点赞数、评论数'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='每批补建的用户数（默认1000）'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='统计时并行的进程数（默认见 COUNTER_RECONCILE）'
+        )
+    
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        missing = User.objects.filter(stats__isnull=True).values_list('id', flat=True)
+        
+        created = 0
+        while True:
+            user_ids = list(missing[:batch_size])
+            if not user_ids:
+                break
+            UserStats.objects.bulk_create(
+                [UserStats(user_id=user_id) for user_id in user_ids],
+                ignore_conflicts=True
+            )
+            created += len(user_ids)
+        self.stdout.write(f'补建统计行 {created} 个，开始统计...')
+        
+        report = reconcile_all(['users.UserStats'], workers=options['workers'])
+        for field, drift in report['users.UserStats'].items():
+            self.stdout.write(f'{field}: 更新 {drift["rows"]} 行，累计 {drift["total"]}')
+        self.stdout.write(self.style.SUCCESS('回填完成'))
\ No newline at end of file
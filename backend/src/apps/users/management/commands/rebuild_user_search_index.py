@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from apps.users.search import get_user_search_index
+
+
+class Command(BaseCommand):
+    help = '重建用户搜索前缀索引'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='每批处理的用户数（默认1000）'
+        )
+    
+    def handle(self, *args, **options):
+        index = get_user_search_index()
+        if not index.indexed:
+            self.stdout.write(self.style.WARNING('共享存储不能跨进程共享，用户搜索直接查询数据库，无需重建索引'))
+            return
+        
+        self.stdout.write('开始重建用户搜索索引...')
+        total = index.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'重建完成：共索引 {total} 个用户')
+        )
\ No newline at end of file
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:58
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_counts(apps, schema_editor):
+    """计数字段之前没有维护，按现有关注关系和帖子回填（每个字段一条UPDATE）"""
+    User = apps.get_model('users', 'User')
+    Follow = apps.get_model('social', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+
+    def count(queryset, field):
+        subquery = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total')
+        return Coalesce(Subquery(subquery, output_field=IntegerField()), Value(0))
+
+    User.objects.update(
+        followers_count=count(Follow.objects.all(), 'following'),
+        following_count=count(Follow.objects.all(), 'follower'),
+        posts_count=count(Post.objects.filter(is_deleted=False), 'author'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_email_verified_emailverification'),
+        ('social', '0002_initial'),
+        ('posts', '0005_post_repost_depth'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['-followers_count'], name='users_followe_b6e8f5_idx'),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_followers_count_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+                ('likes_received_count', models.PositiveIntegerField(default=0, verbose_name='收到的点赞数')),
+                ('comments_received_count', models.PositiveIntegerField(default=0, verbose_name='收到的评论数')),
+            ],
+            options={
+                'verbose_name': '用户统计',
+                'verbose_name_plural': '用户统计',
+                'db_table': 'user_stats',
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-17 12:10
+
+from django.db import migrations
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_user_stats(apps, schema_editor):
+    """为已有用户补建统计行，并按现有点赞、评论回填（写回缓冲只更新已存在的行）"""
+    User = apps.get_model('users', 'User')
+    UserStats = apps.get_model('users', 'UserStats')
+    Like = apps.get_model('posts', 'Like')
+    Comment = apps.get_model('posts', 'Comment')
+
+    missing = User.objects.filter(stats__isnull=True).values_list('id', flat=True)
+    while True:
+        user_ids = list(missing[:1000])
+        if not user_ids:
+            break
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=user_id) for user_id in user_ids],
+            ignore_conflicts=True
+        )
+
+    def count(queryset):
+        subquery = queryset.filter(post__author=OuterRef('pk')).order_by().values('post__author').annotate(
+            total=Count('pk')
+        ).values('total')
+        return Coalesce(Subquery(subquery, output_field=IntegerField()), Value(0))
+
+    UserStats.objects.update(
+        likes_received_count=count(Like.objects.filter(post__is_deleted=False)),
+        comments_received_count=count(Comment.objects.filter(is_deleted=False, post__is_deleted=False)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_userstats'),
+        ('posts', '0005_post_repost_depth'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_user_stats, migrations.RunPython.noop),
+    ]
@@ -38,10 +38,20 @@ class User(AbstractUser):
         verbose_name = _('用户')
         verbose_name_plural = _('用户')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-followers_count']),
+        ]
     
     def __str__(self):
         return f'{self.username} ({self.email})'
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 记录加载时的用户名，改名后据此删除旧用户名的ID缓存
+        instance._loaded_username = instance.__dict__.get('username')
+        return instance
+    
     @property
     def full_name(self):
         """获取用户全名"""
@@ -119,6 +129,32 @@ class UserProfile(models.Model):
         return f'{self.user.username}的资料'
 
 
+class UserStats(models.Model):
+    """用户统计汇总
+
+    收到的点赞数、评论数由点赞、评论事件增量维护（写回缓冲，见 counters.py），
+    统计接口按主键读取一行，不再聚合用户的所有帖子。粉丝数、关注数、帖子数维护在 ``User`` 上。
+    """
+    
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name=_('用户')
+    )
+    likes_received_count = models.PositiveIntegerField(_('收到的点赞数'), default=0)
+    comments_received_count = models.PositiveIntegerField(_('收到的评论数'), default=0)
+    
+    class Meta:
+        db_table = 'user_stats'
+        verbose_name = _('用户统计')
+        verbose_name_plural = _('用户统计')
+    
+    def __str__(self):
+        return f'{self.user_id}的统计'
+
+
 class EmailVerification(models.Model):
     """邮箱验证模型"""
     
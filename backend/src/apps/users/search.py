@@ -0,0 +1,196 @@
+"""用户搜索前缀索引
+
+用户搜索和@提及补全原本对 username / first_name / last_name 做 ``icontains`` 全表扫描，
+每次按键都要扫描一遍用户表。这里在共享存储中为每个名称前缀维护一个有序集合：
+
+    usersearch:p:{前缀}  成员为用户ID，分数为粉丝数，只保留粉丝数最高的 MAX_PER_PREFIX 个
+
+查询是对单个键的一次 ``ZREVRANGE``，与用户总数无关。中日韩名字没有空格分隔，
+额外为名字的每个后缀建立前缀，相当于按子串匹配（"明" 可以找到 "小明"）。
+用户保存时增量更新，``usersearch:u:{用户ID}`` 记录该用户所在的前缀键，改名时据此清理旧前缀。
+索引为空（首次部署、Redis清空）时，第一次查询从数据库构建一次，之后只做增量更新。
+
+共享存储不能跨进程共享（``LocalStore``）时，其他进程保存的用户不会进入本进程的索引；
+此时直接查询数据库（前缀匹配，按粉丝数排序），除非 ``USER_SEARCH['INDEX_LOCAL_STORE']``
+声明了单进程环境（测试）。
+"""
+import logging
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from apps.core.store import get_store
+
+logger = logging.getLogger(__name__)
+
+_CJK_RE = re.compile('[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]')
+
+
+def normalize(text):
+    return unicodedata.normalize('NFKC', text or '').strip().lower()
+
+
+class UserSearchIndex:
+    """用户名称前缀索引"""
+
+    prefix_key = 'usersearch:p:{}'
+    user_key = 'usersearch:u:{}'
+    built_key = 'usersearch:built'
+
+    def __init__(self, store=None):
+        config = settings.USER_SEARCH
+        self.store = store if store is not None else get_store()
+        self.max_prefix_length = config['MAX_PREFIX_LENGTH']
+        self.max_per_prefix = config['MAX_PER_PREFIX']
+        self.indexed = getattr(self.store, 'shared', True) or config['INDEX_LOCAL_STORE']
+
+    def names(self, user):
+        """参与索引的名称"""
+        names = [
+            user.username,
+            user.first_name,
+            user.last_name,
+            f'{user.first_name} {user.last_name}',
+            f'{user.last_name}{user.first_name}',
+        ]
+        return {name for name in map(normalize, names) if name}
+
+    def prefixes(self, user):
+        result = set()
+        for name in self.names(user):
+            starts = range(len(name)) if _CJK_RE.search(name) else [0]
+            for start in starts:
+                term = name[start:start + self.max_prefix_length]
+                result.update(term[:end] for end in range(1, len(term) + 1))
+        return result
+
+    def index(self, user, pipe=None):
+        """写入或更新一个用户；未激活的用户从索引中移除"""
+        if not user.is_active:
+            return self.remove(user.id)
+
+        user_key = self.user_key.format(user.id)
+        keys = {self.prefix_key.format(prefix) for prefix in self.prefixes(user)}
+        stale = self.store.smembers(user_key) - keys
+
+        own_pipe = pipe is None
+        if own_pipe:
+            pipe = self.store.pipeline(transaction=False)
+        for key in stale:
+            pipe.zrem(key, user.id)
+        for key in keys:
+            pipe.zadd(key, {user.id: user.followers_count})
+            pipe.zremrangebyrank(key, 0, -self.max_per_prefix - 1)
+        pipe.delete(user_key)
+        if keys:
+            pipe.sadd(user_key, *keys)
+        if own_pipe:
+            pipe.execute()
+
+    def update_weight(self, user_id, followers_count):
+        """粉丝数变化时只更新分数"""
+        keys = self.store.smembers(self.user_key.format(user_id))
+        if not keys:
+            return
+        pipe = self.store.pipeline(transaction=False)
+        for key in keys:
+            pipe.zadd(key, {user_id: followers_count})
+            pipe.zremrangebyrank(key, 0, -self.max_per_prefix - 1)
+        pipe.execute()
+
+    def remove(self, user_id):
+        user_key = self.user_key.format(user_id)
+        pipe = self.store.pipeline(transaction=False)
+        for key in self.store.smembers(user_key):
+            pipe.zrem(key, user_id)
+        pipe.delete(user_key)
+        pipe.execute()
+
+    def search(self, query, limit=10):
+        """按粉丝数返回名称匹配的用户ID"""
+        query = normalize(query)
+        if not query:
+            return []
+        if not self.indexed:
+            return self.search_database(query, limit)
+        self.bootstrap()
+        key = self.prefix_key.format(query[:self.max_prefix_length])
+        if len(query) <= self.max_prefix_length:
+            return [int(user_id) for user_id in self.store.zrevrange(key, 0, limit - 1)]
+
+        # 超出索引长度的查询：在最长前缀的候选中按完整查询过滤
+        from .models import User
+
+        candidates = [int(user_id) for user_id in self.store.zrevrange(key, 0, -1)]
+        users = User.objects.in_bulk(candidates)
+        return [
+            user_id for user_id in candidates
+            if user_id in users and any(query in name for name in self.names(users[user_id]))
+        ][:limit]
+
+    def search_database(self, query, limit=10):
+        """不使用索引，直接查询数据库（中日韩名字按子串匹配）"""
+        from .models import User
+
+        lookup = 'icontains' if _CJK_RE.search(query) else 'istartswith'
+        condition = Q(**{f'username__{lookup}': query})
+        for field in ('first_name', 'last_name'):
+            condition |= Q(**{f'{field}__{lookup}': query})
+        return list(
+            User.objects.filter(condition, is_active=True)
+            .order_by('-followers_count', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+
+    def needs_bootstrap(self):
+        """索引从未构建过（首次部署或共享存储被清空）"""
+        return not self.store.exists(self.built_key)
+
+    def bootstrap(self):
+        """索引为空时从数据库构建一次，之后由用户保存增量更新；返回是否执行了构建"""
+        if not self.needs_bootstrap():
+            return False
+        self.rebuild()
+        return True
+
+    def rebuild(self, batch_size=1000):
+        """重建索引，返回写入的用户数"""
+        from .models import User
+
+        for key in list(self.store.scan_iter(match='usersearch:*')):
+            self.store.delete(key)
+
+        total = 0
+        last_id = 0
+        while True:
+            users = list(
+                User.objects.filter(id__gt=last_id, is_active=True)
+                .only('id', 'username', 'first_name', 'last_name', 'followers_count', 'is_active')
+                .order_by('id')[:batch_size]
+            )
+            if not users:
+                break
+            pipe = self.store.pipeline(transaction=False)
+            for user in users:
+                self.index(user, pipe)
+            pipe.execute()
+            total += len(users)
+            last_id = users[-1].id
+        self.store.set(self.built_key, 1)
+
+        logger.info(f'用户搜索索引重建完成，共 {total} 个用户')
+        return total
+
+
+def get_user_search_index():
+    return UserSearchIndex()
+
+
+def schedule_index(user):
+    """事务提交后更新用户的索引（直接查询数据库时不维护索引）"""
+    index = get_user_search_index()
+    if index.indexed:
+        transaction.on_commit(lambda: index.index(user))
\ No newline at end of file
@@ -4,6 +4,8 @@ from django.contrib.auth.password_validation import validate_password
 from django.core.mail import send_mail
 from django.conf import settings
 from .models import User, UserProfile, EmailVerification
+from apps.core.compiled import CompiledListSerializer
+from apps.core.loaders import get_viewer_loader
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -161,17 +163,28 @@ class UserListSerializer(serializers.ModelSerializer):
             'followers_count', 'following_count', 'posts_count',
             'is_verified', 'is_following'
         )
+        list_serializer_class = CompiledListSerializer
+    
+    def prime_viewer_state(self, instances, loader):
+        loader.queue('following', [obj.id for obj in instances])
     
     def get_avatar_url(self, obj):
         return obj.get_avatar_url()
     
     def get_is_following(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return request.user.following.filter(following=obj).exists()
+        loader = get_viewer_loader(self.context)
+        if loader:
+            return loader.get('following', obj.id)
         return False
 
 
+class UserCardSerializer(UserListSerializer):
+    """用户卡片（不含因人而异的 is_following，结果按用户缓存，见 cards.py）"""
+    
+    class Meta(UserListSerializer.Meta):
+        fields = tuple(field for field in UserListSerializer.Meta.fields if field != 'is_following')
+
+
 class EmailVerificationSerializer(serializers.Serializer):
     """邮箱验证序列化器"""
     
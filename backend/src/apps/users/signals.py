@@ -1,6 +1,11 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import User, UserProfile
+from .models import User, UserProfile, UserStats
+from .cache import forget_usernames, remember_username
+from .cards import invalidate_cards
+from .search import get_user_search_index, schedule_index
+from apps.core.counters import counters_applied
+from apps.core.versions import bump_versions
 
 
 @receiver(post_save, sender=User)
@@ -10,8 +15,82 @@ def create_user_profile(sender, instance, created, **kwargs):
         UserProfile.objects.create(user=instance)
 
 
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, **kwargs):
+    """用户创建时创建统计汇总行（计数写回只更新已有的行）"""
+    if created:
+        UserStats.objects.create(user=instance)
+
+
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
     """保存用户时同时保存用户资料"""
     if hasattr(instance, 'profile'):
-        instance.profile.save()
\ No newline at end of file
+        instance.profile.save()
+
+
+@receiver(post_save, sender=User)
+def update_user_search_index(sender, instance, **kwargs):
+    """用户保存后更新搜索索引"""
+    schedule_index(instance)
+
+
+@receiver(post_delete, sender=User)
+def remove_user_search_index(sender, instance, **kwargs):
+    """用户删除后移出搜索索引"""
+    get_user_search_index().remove(instance.id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_user_version(sender, instance, **kwargs):
+    """用户资料变化后使其资料、统计接口的响应缓存失效"""
+    bump_versions(('user', instance.id))
+
+
+@receiver(post_save, sender=User)
+def update_username_cache(sender, instance, **kwargs):
+    """用户保存后更新用户名到ID的缓存（改名时删除旧用户名）"""
+    remember_username(instance)
+
+
+@receiver(post_delete, sender=User)
+def remove_username_cache(sender, instance, **kwargs):
+    """用户删除后删除其用户名的ID缓存"""
+    forget_usernames(instance.username, getattr(instance, '_loaded_username', None))
+
+
+@receiver(post_save, sender=UserProfile)
+def bump_user_profile_version(sender, instance, **kwargs):
+    """扩展资料变化后使用户资料接口的响应缓存失效"""
+    bump_versions(('user', instance.user_id))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cards(sender, instance, **kwargs):
+    """用户信息变化后删除其卡片缓存"""
+    invalidate_cards(instance.id)
+
+
+@receiver(post_save, sender=UserProfile)
+def invalidate_user_profile_cards(sender, instance, **kwargs):
+    """扩展资料变化后删除其卡片缓存（完整卡片包含扩展资料）"""
+    invalidate_cards(instance.user_id)
+
+
+@receiver(counters_applied, sender=User)
+def handle_user_counters_applied(sender, ids, **kwargs):
+    """计数写回后更新搜索权重（粉丝数），并使卡片和资料接口的缓存失效"""
+    index = get_user_search_index()
+    for user_id, followers_count in User.objects.filter(id__in=ids).values_list('id', 'followers_count'):
+        index.update_weight(user_id, followers_count)
+    for user_id in ids:
+        invalidate_cards(user_id)
+    bump_versions(*[('user', user_id) for user_id in ids])
+
+
+@receiver(counters_applied, sender=UserStats)
+def handle_user_stats_applied(sender, ids, **kwargs):
+    """统计汇总写回后使统计接口的缓存失效"""
+    bump_versions(*[('user', user_id) for user_id in ids])
\ No newline at end of file
@@ -0,0 +1,19 @@
+from celery import shared_task
+import logging
+
+from .counters import get_user_counter, get_user_stats_counter
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def flush_user_counters():
+    """把缓冲的用户计数和统计汇总批量写回数据库"""
+    for counter in (get_user_counter(), get_user_stats_counter()):
+        try:
+            flushed = counter.flush()
+            if flushed:
+                logger.info(f'计数器 {counter.key} 已写回 {flushed} 个用户')
+            
+        except Exception as e:
+            logger.error(f'计数器 {counter.key} 写回失败: {e}')
\ No newline at end of file
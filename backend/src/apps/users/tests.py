@@ -0,0 +1,569 @@
+import tempfile
+from importlib import import_module
+from io import StringIO
+from unittest.mock import patch
+
+import numpy as np
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from .cache import USERNAME_KEY, get_user_id
+from .cards import get_cards
+from .counters import get_user_counter, get_user_stats_counter
+from .models import User, UserStats
+from .search import get_user_search_index
+from .serializers import UserCardSerializer, UserSerializer
+from apps.core.store import reset_store
+from apps.posts.models import Comment, Post
+from apps.social.models import Block, Follow
+from apps.social.graph import (
+    LOG_KEY, TRIM_KEY, DatabaseGraph, GraphIndex, get_social_graph, trim_log, write_snapshot
+)
+from apps.social.recommendations import get_recommendation_engine
+
+
+def create_user(username, **extra):
+    return User.objects.create_user(
+        email=f'{username}@example.com',
+        username=username,
+        password='testpass123',
+        **extra
+    )
+
+
+@override_settings(USER_SEARCH={**settings.USER_SEARCH, 'INDEX_LOCAL_STORE': True})
+class UserSearchIndexTest(TestCase):
+    """用户搜索前缀索引测试"""
+    
+    def setUp(self):
+        reset_store()
+        self.client = APIClient()
+    
+    def create_user(self, username, **extra):
+        with self.captureOnCommitCallbacks(execute=True):
+            return create_user(username, **extra)
+    
+    def test_prefix_ranked_by_followers(self):
+        """测试前缀匹配并按粉丝数排序"""
+        alice = self.create_user('alice', followers_count=5)
+        alicia = self.create_user('alicia', followers_count=50)
+        self.create_user('bob')
+        
+        index = get_user_search_index()
+        self.assertEqual(index.search('ali'), [alicia.id, alice.id])
+        self.assertEqual(index.search('ALICE'), [alice.id])
+        self.assertEqual(index.search('x'), [])
+        
+        response = self.client.get('/api/auth/autocomplete/', {'q': 'al', 'limit': 1})
+        self.assertEqual([item['id'] for item in response.data], [alicia.id])
+    
+    def test_cjk_substring_and_incremental_update(self):
+        """测试中文名按子串匹配，改名和停用后索引随之更新"""
+        user = self.create_user('xiaoming', first_name='小明')
+        index = get_user_search_index()
+        self.assertEqual(index.search('明'), [user.id])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            user.first_name = '小红'
+            user.save()
+        self.assertEqual(index.search('明'), [])
+        self.assertEqual(index.search('红'), [user.id])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            user.is_active = False
+            user.save()
+        self.assertEqual(index.search('xiao'), [])
+    
+    def test_bootstrap_and_rebuild(self):
+        """测试索引为空时首次查询从数据库构建，之后重建索引"""
+        user = create_user('carol')
+        index = get_user_search_index()
+        self.assertTrue(index.needs_bootstrap())
+        self.assertEqual(index.search('car'), [user.id])
+        self.assertFalse(index.needs_bootstrap())
+        
+        # 未经过事务提交回调的用户不在索引中，重建后出现
+        caroline = create_user('caroline', followers_count=3)
+        self.assertEqual(index.search('car'), [user.id])
+        self.assertEqual(index.rebuild(batch_size=1), 2)
+        self.assertEqual(index.search('car'), [caroline.id, user.id])
+    
+    @override_settings(USER_SEARCH={**settings.USER_SEARCH, 'INDEX_LOCAL_STORE': False})
+    def test_local_store_queries_database(self):
+        """测试共享存储不能跨进程共享时直接查询数据库"""
+        # 其他进程创建、不会写入本进程索引的用户
+        alice = create_user('alice', followers_count=5)
+        alicia = create_user('alicia', followers_count=50)
+        ming = create_user('xiaoming', first_name='小明')
+        create_user('inactive_ali', is_active=False)
+        
+        index = get_user_search_index()
+        self.assertEqual(index.search('ALI'), [alicia.id, alice.id])
+        self.assertEqual(index.search('明'), [ming.id])
+        self.assertTrue(index.needs_bootstrap())
+        
+        response = self.client.get('/api/auth/autocomplete/', {'q': 'al', 'limit': 1})
+        self.assertEqual([item['id'] for item in response.data], [alicia.id])
+
+
+class UserResponseCacheTest(TestCase):
+    """用户资料响应缓存测试"""
+    
+    def setUp(self):
+        reset_store()
+        cache.clear()
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.alice = create_user('alice')
+            self.bob = create_user('bob')
+    
+    def test_profile_shared_across_viewers(self):
+        """测试用户资料与查看者无关，关注后ETag变化"""
+        response = self.client.get('/api/auth/alice/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        
+        viewer = APIClient()
+        viewer.force_authenticate(self.bob)
+        with self.assertNumQueries(0):
+            response = viewer.get('/api/auth/alice/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        
+        stats_etag = self.client.get(f'/api/social/users/{self.alice.id}/stats/')['ETag']
+        with patch('apps.notifications.tasks.create_follow_notification.delay'):
+            with self.captureOnCommitCallbacks(execute=True):
+                Follow.objects.create(follower=self.bob, following=self.alice)
+        
+        self.assertEqual(self.client.get('/api/auth/alice/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        response = self.client.get(f'/api/social/users/{self.alice.id}/stats/', HTTP_IF_NONE_MATCH=stats_etag)
+        self.assertEqual(response.data['followers_count'], 1)
+    
+    def test_unknown_username_not_cached(self):
+        """测试不存在的用户名直接返回404"""
+        self.assertEqual(self.client.get('/api/auth/nobody/').status_code, 404)
+    
+    def test_username_mapping_follows_rename_and_delete(self):
+        """测试改名后旧用户名不再解析到该用户，删除用户后用户名缓存被删除"""
+        self.assertEqual(get_user_id('alice'), self.alice.id)
+        
+        user = User.objects.get(id=self.alice.id)
+        user.username = 'alicia'
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertIsNone(get_user_id('alice'))
+        self.assertEqual(get_user_id('alicia'), self.alice.id)
+        self.assertEqual(self.client.get('/api/auth/alice/').status_code, 404)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.get(id=self.alice.id).delete()
+        self.assertIsNone(cache.get(USERNAME_KEY.format('alicia')))
+        self.assertIsNone(get_user_id('alicia'))
+
+
+class UserCardTest(TestCase):
+    """用户卡片缓存测试"""
+    
+    def setUp(self):
+        cache.clear()
+        self.users = [create_user(f'user{i}') for i in range(3)]
+    
+    def test_cards_loaded_in_one_query(self):
+        """测试整批未命中的卡片一次查询加载（含扩展资料），之后直接读缓存"""
+        ids = [user.id for user in self.users]
+        with self.assertNumQueries(1):
+            cards = get_cards('full', ids)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_cards('full', ids), cards)
+        
+        user = User.objects.select_related('profile').get(id=ids[0])
+        self.assertEqual(cards[user.id], UserSerializer(user).data)
+        self.assertEqual(get_cards('list', ids)[user.id], UserCardSerializer(user).data)
+    
+    def test_saves_invalidate_cards(self):
+        """测试用户和扩展资料保存后卡片失效"""
+        user = self.users[0]
+        get_cards('full', [user.id])
+        
+        user.bio = '新简介'
+        user.save()
+        self.assertEqual(get_cards('full', [user.id])[user.id]['bio'], '新简介')
+        
+        user.profile.theme = 'dark'
+        user.profile.save()
+        self.assertEqual(get_cards('full', [user.id])[user.id]['profile']['theme'], 'dark')
+    
+    def test_nested_field_matches_serializer(self):
+        """测试关注列表中嵌套的卡片与原序列化器输出一致，用户信息不再关联查询"""
+        viewer, author = self.users[:2]
+        with patch('apps.notifications.tasks.create_follow_notification.delay'):
+            Follow.objects.create(follower=viewer, following=author)
+        
+        client = APIClient()
+        client.force_authenticate(viewer)
+        client.get(f'/api/social/following/{viewer.id}/')
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(f'/api/social/following/{viewer.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('"users_user"' in query['sql'] for query in queries))
+        following = response.data['results'][0]['following']
+        self.assertEqual(following, UserSerializer(User.objects.get(id=author.id)).data)
+
+
+@override_settings(COUNTER_BUFFER={'BUFFER_LOCAL_STORE': True})
+@patch('apps.notifications.tasks.create_follow_notification.delay')
+class UserCounterTest(TestCase):
+    """用户社交计数测试"""
+    
+    def setUp(self):
+        reset_store()
+        cache.clear()
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.alice = create_user('alice')
+            self.bob = create_user('bob')
+            self.carol = create_user('carol')
+        self.counter = get_user_counter()
+    
+    def follow(self, follower, following):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Follow.objects.create(follower=follower, following=following)
+    
+    def test_follow_counts_coalesced(self, mock_notify):
+        """测试关注、取消关注的增量合并后批量写回，统计接口不再 COUNT 关注表"""
+        self.follow(self.bob, self.alice)
+        follow = self.follow(self.carol, self.alice)
+        with self.captureOnCommitCallbacks(execute=True):
+            follow.delete()
+        self.follow(self.carol, self.alice)
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/social/users/{self.alice.id}/stats/')
+        self.assertEqual(response.data['followers_count'], 2)
+        self.assertFalse(any('"follows"' in query['sql'] for query in queries))
+        self.assertEqual(self.client.get('/api/auth/carol/').data['following_count'], 1)
+        
+        self.alice.refresh_from_db()
+        self.assertEqual(self.alice.followers_count, 0)
+        self.assertEqual(self.counter.flush(), 3)
+        self.alice.refresh_from_db()
+        self.assertEqual(self.alice.followers_count, 2)
+        self.assertEqual(get_user_search_index().search('a')[0], self.alice.id)
+    
+    def test_posts_count_follows_soft_delete(self, mock_notify):
+        """测试发帖、软删除、恢复和删除后帖子数随之变化"""
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(author=self.alice, content='帖子')
+            Post.objects.create(author=self.alice, content='帖子')
+        self.assertEqual(self.counter.pending(self.alice.id, 'posts_count'), 2)
+        
+        post = Post.objects.get(id=post.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            post.is_deleted = True
+            post.save()
+        self.assertEqual(self.counter.pending(self.alice.id, 'posts_count'), 1)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            post.delete()
+        self.assertEqual(self.counter.pending(self.alice.id, 'posts_count'), 1)
+    
+    def test_recommended_users_ordered_by_stored_count(self, mock_notify):
+        """测试推荐用户按维护的粉丝数排序"""
+        User.objects.filter(id=self.bob.id).update(followers_count=3)
+        User.objects.filter(id=self.carol.id).update(followers_count=7)
+        self.client.force_authenticate(self.alice)
+        response = self.client.get('/api/social/recommended-users/')
+        self.assertEqual([item['id'] for item in response.data['results']], [self.carol.id, self.bob.id])
+    
+    def comment(self, author, post):
+        with patch('apps.notifications.tasks.create_comment_notification.delay'):
+            with self.captureOnCommitCallbacks(execute=True):
+                return Comment.objects.create(author=author, post=post, content='评论')
+    
+    def test_received_counts_follow_post_deletion(self, mock_notify):
+        """测试软删除、恢复按包括缓冲增量的计数调整收到的评论数，级联删除不逐条查询帖子"""
+        from apps.posts.counters import get_post_counter
+        stats = get_user_stats_counter()
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(author=self.alice, content='帖子')
+        for author in (self.bob, self.carol):
+            self.comment(author, post)
+            get_post_counter().incr(post.id, 'comments_count')
+        self.assertEqual(stats.pending(self.alice.id, 'comments_received_count'), 2)
+        
+        post = Post.objects.get(id=post.id)
+        for is_deleted, expected in ((True, 0), (False, 2)):
+            with self.captureOnCommitCallbacks(execute=True):
+                post.is_deleted = is_deleted
+                post.save()
+            self.assertEqual(stats.pending(self.alice.id, 'comments_received_count'), expected)
+        
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                post.delete()
+        self.assertEqual(stats.pending(self.alice.id, 'comments_received_count'), 0)
+        # 帖子本身只在删除前读取一次计数
+        post_lookups = [q for q in queries if q['sql'].startswith('SELECT') and 'FROM "posts" WHERE "posts"."id" =' in q['sql']]
+        self.assertEqual(len(post_lookups), 1)
+    
+    def test_received_counts_from_stats_table(self, mock_notify):
+        """测试收到的评论数累加到统计汇总，统计接口不再聚合帖子表"""
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(author=self.alice, content='帖子')
+        self.comment(self.bob, post)
+        comment = self.comment(self.carol, post)
+        with self.captureOnCommitCallbacks(execute=True):
+            comment.delete()
+        self.comment(self.carol, post)
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/social/users/{self.alice.id}/stats/')
+        self.assertEqual(response.data['comments_received_count'], 2)
+        self.assertEqual(response.data['posts_count'], 1)
+        self.assertEqual(len(queries), 1)
+        self.client.force_authenticate(self.bob)
+        self.assertEqual(self.client.get('/api/auth/alice/stats/').data['comments_received'], 2)
+        
+        self.assertEqual(get_user_stats_counter().flush(), 1)
+        self.assertEqual(UserStats.objects.get(user=self.alice).comments_received_count, 2)
+    
+    def test_missing_stats_rows_created(self, mock_notify):
+        """测试缺少统计行时，写回会补建行而不是丢弃增量；迁移为已有用户补建并回填"""
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(author=self.alice, content='帖子')
+        UserStats.objects.filter(user=self.alice).delete()
+        self.comment(self.bob, post)
+        get_user_stats_counter().flush()
+        self.assertEqual(UserStats.objects.get(user=self.alice).comments_received_count, 1)
+        
+        UserStats.objects.all().delete()
+        migration = import_module('apps.users.migrations.0005_backfill_userstats')
+        migration.backfill_user_stats(django_apps, None)
+        self.assertEqual(UserStats.objects.count(), 3)
+        self.assertEqual(UserStats.objects.get(user=self.alice).comments_received_count, 1)
+    
+    def test_backfill_user_stats(self, mock_notify):
+        """测试回填命令补建缺少的统计行并按明细表重新统计"""
+        post = Post.objects.create(author=self.alice, content='帖子')
+        with patch('apps.notifications.tasks.create_comment_notification.delay'):
+            Comment.objects.create(author=self.bob, post=post, content='评论')
+            Comment.objects.create(author=self.carol, post=post, content='评论', is_deleted=True)
+        UserStats.objects.filter(user__in=[self.alice, self.bob]).delete()
+        
+        call_command('backfill_user_stats', workers=1, stdout=StringIO())
+        self.assertEqual(UserStats.objects.count(), 3)
+        self.assertEqual(UserStats.objects.get(user=self.alice).comments_received_count, 1)
+        self.assertEqual(UserStats.objects.get(user=self.bob).comments_received_count, 0)
+
+
+@patch('apps.notifications.tasks.create_follow_notification.delay')
+class RecommendationEngineTest(TestCase):
+    """二度关系好友推荐测试"""
+    
+    def setUp(self):
+        reset_store()
+        self.users = {name: create_user(name) for name in ('alice', 'bob', 'carol', 'dave', 'erin', 'frank')}
+        self.engine = get_recommendation_engine()
+    
+    def follow(self, follower, *followings):
+        with self.captureOnCommitCallbacks(execute=True):
+            for following in followings:
+                Follow.objects.create(follower=self.users[follower], following=self.users[following])
+    
+    def ids(self, *names):
+        return [self.users[name].id for name in names]
+    
+    def build_graph(self):
+        # alice 关注 bob、carol；bob、carol 都关注 dave，只有 carol 关注 erin
+        # carol 还关注了很多人，经由 carol 的推荐权重较低
+        self.follow('alice', 'bob', 'carol')
+        self.follow('bob', 'dave', 'alice')
+        self.follow('carol', 'dave', 'erin', 'frank', 'bob')
+    
+    def test_rebuild_ranks_by_adamic_adar(self, mock_notify):
+        """测试全量重建按共同关注和中间人度数排序，并排除自己和已关注的人"""
+        self.build_graph()
+        self.assertEqual(self.engine.rebuild(), 3)
+        self.assertEqual(self.engine.recommended_ids(self.users['alice'].id)[0], self.users['dave'].id)
+        self.assertEqual(
+            set(self.engine.recommended_ids(self.users['alice'].id)),
+            set(self.ids('dave', 'erin', 'frank'))
+        )
+        self.assertEqual(
+            set(self.engine.recommended_ids(self.users['bob'].id)),
+            set(self.ids('carol'))
+        )
+    
+    def test_refresh_matches_rebuild(self, mock_notify):
+        """测试增量刷新只加载二度子图，结果与全量重建一致"""
+        self.build_graph()
+        get_user_counter().flush()
+        self.engine.rebuild()
+        expected = self.engine.recommended_ids(self.users['alice'].id)
+        
+        self.engine.store.delete(self.engine.key(self.users['alice'].id), self.engine.dirty_key)
+        self.engine.mark_dirty(self.users['alice'].id)
+        self.assertEqual(self.engine.refresh_dirty(), 1)
+        self.assertEqual(self.engine.recommended_ids(self.users['alice'].id), expected)
+        self.assertEqual(self.engine.refresh_dirty(), 0)
+    
+    def test_endpoint_excludes_blocked_and_followed(self, mock_notify):
+        """测试推荐接口读取预计算结果，读取时排除新关注、屏蔽的人，不足时按粉丝数补足"""
+        self.build_graph()
+        self.engine.rebuild()
+        self.follow('alice', 'erin')
+        Block.objects.create(blocker=self.users['frank'], blocked=self.users['alice'])
+        
+        client = APIClient()
+        client.force_authenticate(self.users['alice'])
+        response = client.get('/api/social/recommended-users/')
+        ids = [item['id'] for item in response.data['results']]
+        self.assertEqual(ids[0], self.users['dave'].id)
+        self.assertNotIn(self.users['erin'].id, ids)
+        self.assertNotIn(self.users['frank'].id, ids)
+        self.assertNotIn(self.users['alice'].id, ids)
+
+
+@override_settings(SOCIAL_GRAPH={**settings.SOCIAL_GRAPH, 'INDEX_LOCAL_STORE': True})
+@patch('apps.notifications.tasks.create_follow_notification.delay')
+class SocialGraphTest(TestCase):
+    """关注、屏蔽关系图索引测试"""
+    
+    def setUp(self):
+        reset_store()
+        self.users = {name: create_user(name) for name in ('alice', 'bob', 'carol', 'dave')}
+    
+    def uid(self, name):
+        return self.users[name].id
+    
+    def follow(self, follower, following):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Follow.objects.create(follower=self.users[follower], following=self.users[following])
+    
+    def test_queries_follow_deltas(self, mock_notify):
+        """测试成员、度数、共同关注和分页查询，关注变化提交后立即生效"""
+        self.follow('alice', 'dave')
+        graph = get_social_graph()
+        self.assertTrue(graph.is_following(self.uid('alice'), self.uid('dave')))
+        
+        self.follow('bob', 'dave')
+        self.follow('bob', 'carol')
+        follow = self.follow('carol', 'dave')
+        self.assertEqual(graph.followers_count(self.uid('dave')), 3)
+        self.assertEqual(graph.mutual_followers(self.uid('dave'), self.uid('carol')).tolist(), [self.uid('bob')])
+        self.assertEqual(graph.page('follow_in', self.uid('dave'), limit=2), sorted(self.uid(n) for n in ('alice', 'bob', 'carol'))[:2])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            follow.delete()
+        self.assertFalse(graph.is_following(self.uid('carol'), self.uid('dave')))
+        self.assertEqual(graph.followers_count(self.uid('dave')), 2)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Block.objects.create(blocker=self.users['dave'], blocked=self.users['alice'])
+        self.assertTrue(graph.is_blocked_between(self.uid('alice'), self.uid('dave')))
+        self.assertEqual(graph.blocked_ids(self.uid('alice')).tolist(), [self.uid('dave')])
+    
+    def test_endpoints_do_not_query_tables(self, mock_notify):
+        """测试关注、屏蔽检查接口不再查询关系表"""
+        self.follow('alice', 'bob')
+        client = APIClient()
+        client.force_authenticate(self.users['alice'])
+        client.get(f'/api/social/is-following/{self.uid("bob")}/')
+        with CaptureQueriesContext(connection) as queries:
+            following = client.get(f'/api/social/is-following/{self.uid("bob")}/')
+            blocked = client.get(f'/api/social/is-blocked/{self.uid("bob")}/')
+        self.assertTrue(following.data['is_following'])
+        self.assertFalse(blocked.data['is_blocked'])
+        self.assertFalse(any('"follows"' in q['sql'] or '"blocks"' in q['sql'] for q in queries))
+        
+        response = client.post('/api/social/follow/', {'following': self.uid('bob')})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_write_paths_check_database(self, mock_notify):
+        """测试关注、屏蔽写入以数据库为准，不受索引滞后影响"""
+        graph = get_social_graph().sync(force=True)
+        # 其他进程刚写入、索引尚未重放的关系
+        Follow.objects.create(follower=self.users['alice'], following=self.users['bob'])
+        Block.objects.create(blocker=self.users['carol'], blocked=self.users['alice'])
+        Block.objects.create(blocker=self.users['alice'], blocked=self.users['dave'])
+        self.assertFalse(graph.is_following(self.uid('alice'), self.uid('bob')))
+        
+        client = APIClient()
+        client.force_authenticate(self.users['alice'])
+        self.assertEqual(client.post('/api/social/follow/', {'following': self.uid('bob')}).status_code, 400)
+        self.assertEqual(client.post('/api/social/follow/', {'following': self.uid('carol')}).status_code, 400)
+        self.assertEqual(client.post('/api/social/block/', {'blocked': self.uid('dave')}).status_code, 400)
+        self.assertFalse(Follow.objects.filter(follower=self.users['alice'], following=self.users['carol']).exists())
+    
+    def test_snapshot_shared_between_processes(self, mock_notify):
+        """测试快照以mmap加载，其他进程的增量经由共享日志重放，新快照后清理日志"""
+        self.follow('alice', 'bob')
+        with tempfile.TemporaryDirectory() as snapshot_dir:
+            write_snapshot(snapshot_dir)
+            worker = GraphIndex(snapshot_dir=snapshot_dir, sync_interval=0).sync()
+            self.assertIsInstance(worker.adjacency['follow_out'].indices, np.memmap)
+            self.assertTrue(worker.is_following(self.uid('alice'), self.uid('bob')))
+            
+            # 另一个进程写入的增量
+            self.follow('carol', 'bob')
+            self.assertTrue(worker.is_following(self.uid('carol'), self.uid('bob')))
+            self.assertEqual(worker.followers_count(self.uid('bob')), 2)
+            
+            write_snapshot(snapshot_dir)
+            write_snapshot(snapshot_dir)
+            self.assertEqual(worker.store.zcard(LOG_KEY), 0)
+            self.assertEqual(worker.followers_count(self.uid('bob')), 2)
+            self.assertNotEqual(worker.snapshot, None)
+    
+    def test_replay_waits_for_gap(self, mock_notify):
+        """测试增量日志出现空缺时，补上后按序号顺序重放"""
+        graph = GraphIndex(sync_interval=0).sync()
+        alice, bob = self.uid('alice'), self.uid('bob')
+        graph.store.set('graph:deltas:seq', 2)
+        graph.store.zadd(LOG_KEY, {f'2:follow:{alice}:{bob}:0': 2})
+        self.assertFalse(graph.is_following(alice, bob))
+        self.assertEqual(graph.seq, 0)
+        
+        # 序号1的"关注"晚于序号2的"取消关注"写入
+        graph.store.zadd(LOG_KEY, {f'1:follow:{alice}:{bob}:1': 1})
+        self.assertFalse(graph.is_following(alice, bob))
+        self.assertEqual(graph.seq, 2)
+    
+    def test_trimmed_log_reloads(self, mock_notify):
+        """测试没有快照时增量日志按条数裁剪，落后于裁剪位置的进程从数据库重新加载"""
+        worker = GraphIndex(sync_interval=0).sync()
+        self.follow('alice', 'bob')
+        self.follow('carol', 'bob')
+        self.assertEqual(worker.store.zcard(LOG_KEY), 2)
+        
+        # 本进程停在日志开头，之后的增量被裁掉
+        worker.seq = 0
+        self.follow('dave', 'bob')
+        self.assertEqual(trim_log(keep=1), 2)
+        self.assertEqual(int(worker.store.get(TRIM_KEY)), 2)
+        self.assertEqual(worker.followers_count(self.uid('bob')), 3)
+        self.assertEqual(worker.seq, 3)
+    
+    @override_settings(SOCIAL_GRAPH={**settings.SOCIAL_GRAPH, 'INDEX_LOCAL_STORE': False})
+    def test_local_store_queries_database(self, mock_notify):
+        """测试共享存储不能跨进程共享时直接查询数据库，其他进程写入的关系立即生效"""
+        graph = get_social_graph()
+        self.assertIsInstance(graph, DatabaseGraph)
+        # 其他进程写入、不会出现在本进程增量日志中的关系
+        Follow.objects.create(follower=self.users['alice'], following=self.users['dave'])
+        Follow.objects.create(follower=self.users['bob'], following=self.users['dave'])
+        Follow.objects.create(follower=self.users['bob'], following=self.users['carol'])
+        Block.objects.create(blocker=self.users['dave'], blocked=self.users['carol'])
+        
+        self.assertTrue(graph.is_following(self.uid('alice'), self.uid('dave')))
+        self.assertEqual(graph.following_of(self.uid('bob'), [self.uid('carol'), self.uid('alice')]), {self.uid('carol')})
+        self.assertEqual(graph.followers_count(self.uid('dave')), 2)
+        self.assertEqual(graph.mutual_followers(self.uid('dave'), self.uid('carol')).tolist(), [self.uid('bob')])
+        self.assertEqual(graph.page('follow_in', self.uid('dave'), after=self.uid('alice')), [self.uid('bob')])
+        self.assertTrue(graph.is_blocked_between(self.uid('carol'), self.uid('dave')))
+        self.assertEqual(graph.blocked_ids(self.uid('carol')).tolist(), [self.uid('dave')])
\ No newline at end of file
@@ -32,6 +32,7 @@ urlpatterns = [
     
     # 用户信息
     path('list/', views.UserListView.as_view(), name='user_list'),
+    path('autocomplete/', views.UserAutocompleteView.as_view(), name='user_autocomplete'),
     path('<str:username>/', views.UserDetailView.as_view(), name='user_detail'),
     path('<str:username>/stats/', views.user_stats_view, name='user_stats'),
 ]
\ No newline at end of file
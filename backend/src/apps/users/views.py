@@ -4,7 +4,11 @@ from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import login
 from django.shortcuts import get_object_or_404
+from django.conf import settings
 from .models import User, UserProfile
+from .cache import get_user_id
+from .counters import get_user_counter, user_stats
+from .search import get_user_search_index
 from .serializers import (
     UserRegistrationSerializer,
     UserLoginSerializer,
@@ -16,6 +20,14 @@ from .serializers import (
     EmailVerificationSerializer,
     EmailVerificationConfirmSerializer
 )
+from apps.core.http_cache import cache_response
+from apps.core.ordering import preserve_order
+from apps.social.blocks import get_block_filter
+
+
+def _user_dependencies(view, request, username):
+    user_id = get_user_id(username)
+    return [('user', user_id)] if user_id is not None else None
 
 
 class UserRegistrationView(generics.CreateAPIView):
@@ -118,6 +130,14 @@ class UserDetailView(generics.RetrieveAPIView):
     serializer_class = UserSerializer
     lookup_field = 'username'
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    
+    @cache_response(_user_dependencies, per_viewer=False)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+    
+    def get_object(self):
+        # 叠加尚未写回数据库的粉丝数、关注数、帖子数
+        return get_user_counter().overlay([super().get_object()])[0]
 
 
 class UserListView(generics.ListAPIView):
@@ -132,17 +152,43 @@ class UserListView(generics.ListAPIView):
         search = self.request.query_params.get('search')
         
         if search:
-            queryset = queryset.filter(
-                username__icontains=search
-            ) | queryset.filter(
-                first_name__icontains=search
-            ) | queryset.filter(
-                last_name__icontains=search
+            user_ids = get_user_search_index().search(
+                search, limit=settings.USER_SEARCH['MAX_PER_PREFIX']
             )
+            user_ids = get_block_filter(self.request).user_ids(user_ids)
+            return queryset.filter(id__in=user_ids).order_by(preserve_order(user_ids))
         
+        # 屏蔽集合通常为空或很小，直接作为常量列表排除，不关联 blocks 表
+        block_filter = get_block_filter(self.request)
+        if block_filter:
+            queryset = queryset.exclude(id__in=block_filter.blocked_ids)
         return queryset.order_by('-date_joined')
 
 
+class UserAutocompleteView(generics.ListAPIView):
+    """用户名补全（@提及）"""
+    
+    serializer_class = UserListSerializer
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = None
+    max_limit = 20
+    
+    def get_queryset(self):
+        query = self.request.query_params.get('q', '')
+        try:
+            limit = min(int(self.request.query_params.get('limit', 10)), self.max_limit)
+        except ValueError:
+            limit = 10
+        
+        user_ids = get_user_search_index().search(query, limit=max(limit, 1))
+        user_ids = get_block_filter(self.request).user_ids(user_ids)
+        if not user_ids:
+            return User.objects.none()
+        return User.objects.filter(
+            id__in=user_ids, is_active=True
+        ).order_by(preserve_order(user_ids))
+
+
 class UserProfileSettingsView(generics.RetrieveUpdateAPIView):
     """用户设置视图"""
     
@@ -179,18 +225,18 @@ class PasswordChangeView(generics.GenericAPIView):
 def user_stats_view(request, username):
     """用户统计信息视图"""
     
-    user = get_object_or_404(User, username=username, is_active=True)
-    
-    stats = {
-        'posts_count': user.posts_count,
-        'followers_count': user.followers_count,
-        'following_count': user.following_count,
-        'likes_received': user.posts.aggregate(
-            total_likes=models.Sum('likes_count')
-        )['total_likes'] or 0,
-    }
+    user = get_object_or_404(
+        User.objects.select_related('stats'), username=username, is_active=True
+    )
+    stats = user_stats(user)
     
-    return Response(stats)
+    return Response({
+        'posts_count': stats['posts_count'],
+        'followers_count': stats['followers_count'],
+        'following_count': stats['following_count'],
+        'likes_received': stats['likes_received_count'],
+        'comments_received': stats['comments_received_count'],
+    })
 
 
 @api_view(['POST'])
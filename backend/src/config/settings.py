@@ -39,6 +39,7 @@ LOCAL_APPS = [
     'apps.posts',
     'apps.social',
     'apps.notifications',
+    'apps.core',
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
@@ -91,6 +92,137 @@ CACHES = {
     }
 }
 
+# Redis
+REDIS_URL = config('REDIS_URL', default='redis://localhost:6379/1')
+
+# 共享数据结构存储（时间线等）
+# 默认使用进程内实现，仅适用于单进程开发和测试；生产环境设置为 apps.core.store.redis_store
+SHARED_STORE_BACKEND = config('SHARED_STORE_BACKEND', default='apps.core.store.LocalStore')
+
+# 首页时间线
+FEED_TIMELINE = {
+    'MAX_LENGTH': 800,  # 每个用户时间线保留的帖子数
+    'CELEBRITY_THRESHOLD': config('FEED_CELEBRITY_THRESHOLD', default=10000, cast=int),  # 超过该粉丝数的作者读时合并
+    'TTL': 60 * 60 * 24 * 7,  # 不活跃用户的时间线过期时间（秒）
+    'FANOUT_ASYNC': config('FEED_FANOUT_ASYNC', default=False, cast=bool),  # 通过Celery异步写扩散（需要Redis存储）
+    'FANOUT_BATCH_SIZE': 1000,
+    # 共享存储为 LocalStore 时仍然缓存时间线（仅适用于单进程环境，如测试），否则每次读取查询数据库
+    'CACHE_LOCAL_STORE': config('FEED_TIMELINE_LOCAL_STORE', default=False, cast=bool),
+}
+
+# 新帖子通知的粉丝扩散（见 apps.notifications.fanout）
+NOTIFICATION_FANOUT = {
+    'ASYNC': config('NOTIFICATION_FANOUT_ASYNC', default=True, cast=bool),  # 通过Celery分块异步扩散（粉丝数不超过 CHUNK_SIZE 时直接写入）
+    'CHUNK_SIZE': 1000,  # 每个任务写入通知的粉丝数
+    'MAX_FOLLOWERS': config('NOTIFICATION_FANOUT_MAX_FOLLOWERS', default=100000, cast=int),  # 超过该粉丝数的作者不发送新帖子通知
+    'STALE_AFTER': 300,  # 扩散超过该秒数没有进展时从进度处重新投递
+}
+
+# 热门帖子
+TRENDING = {
+    'HALF_LIFE_HOURS': 6,  # 热度半衰期
+    'MAX_AGE_HOURS': 72,  # 超过该时间的帖子不再参与排行
+    'MAX_SIZE': 1000,  # 热度榜保留的帖子数
+    'SCORED_TTL': 600,  # 冷启动重算结果的有效期（秒），期间空榜不再在请求中重算
+    'WEIGHTS': {
+        'likes': 1.0,
+        'comments': 2.0,
+        'shares': 3.0,
+        'views': 0.05,
+    },
+}
+
+# 好友推荐（二度关系，见 apps.social.recommendations）
+USER_RECOMMENDATIONS = {
+    'TOP_K': 50,  # 每个用户保存的推荐人数
+    'MIN_MUTUAL': 1,  # 候选人至少需要的共同关注数
+    'BATCH_SIZE': 2000,  # 每批做矩阵乘法的用户数
+}
+
+# 关注、屏蔽关系图索引（见 apps.social.graph）
+SOCIAL_GRAPH = {
+    'SNAPSHOT_DIR': config('SOCIAL_GRAPH_DIR', default=''),  # mmap快照目录，为空时每个进程从数据库构建
+    'SYNC_INTERVAL': 1.0,  # 重放增量日志的最小间隔（秒）
+    'GAP_TIMEOUT': 5.0,  # 增量日志空缺超过该秒数视为写入方崩溃，跳过
+    'KEEP_SNAPSHOTS': 2,  # 保留的快照数（切换期间旧快照可能仍被映射）
+    'LOG_LENGTH': 100000,  # 没有快照目录时增量日志保留的条数，落后更多的进程从数据库重新加载
+    # 共享存储为 LocalStore 时仍然使用进程内索引（仅适用于单进程环境，如测试），否则直接查询数据库
+    'INDEX_LOCAL_STORE': config('SOCIAL_GRAPH_LOCAL_STORE', default=False, cast=bool),
+}
+
+# 编译序列化器快速路径（热点列表接口，见 apps.core.compiled）
+FAST_SERIALIZERS = {
+    'ENABLED': config('FAST_SERIALIZERS', default=False, cast=bool),
+}
+
+# 列表接口流式输出（?stream=1，见 apps.core.streaming）
+JSON_STREAMING = {
+    'CHUNK_SIZE': 500,  # 每块查询和编码的行数
+    'MAX_ITEMS': 10000,  # 单次流式输出的最大行数
+    'THROTTLE_RATE': '20/hour',  # 每个用户的流式输出频率（仅登录用户可用）
+}
+
+# 计数器写回缓冲（见 apps.core.counters）
+COUNTER_BUFFER = {
+    # 共享存储为 LocalStore 时仍然缓冲增量（仅适用于web和写回任务在同一进程的环境，如测试）
+    'BUFFER_LOCAL_STORE': config('COUNTER_BUFFER_LOCAL_STORE', default=False, cast=bool),
+}
+
+# 反范式计数对账（见 apps.core.reconcile）
+COUNTER_RECONCILE = {
+    'CHUNK_SIZE': 10000,  # 每个分块的主键区间长度
+    'WORKERS': 4,  # 管理命令使用的进程数
+}
+
+# 带版本号的响应缓存（ETag/304，见 apps.core.http_cache）
+RESPONSE_CACHE = {
+    'MAX_AGE': 300,  # 缓存时间（秒），也是版本号覆盖不到的变化的最长延迟
+    'FEED_MAX_AGE': 60,  # 时间线中帖子的计数等变化不递增时间线版本号，缓存时间更短
+    'VERSION_TTL': 60 * 60 * 24 * 7,  # 版本号的保留时间
+}
+
+# 用户卡片缓存（嵌套在帖子、评论、关注、通知等接口中的用户信息，见 apps.users.cards）
+USER_CARDS = {
+    'TIMEOUT': 60 * 60 * 24,  # 卡片缓存时间，用户或用户资料保存时主动删除
+    'USERNAME_TIMEOUT': 60 * 60,  # 用户名到ID映射的缓存时间，改名、删除用户时主动删除
+}
+
+# 帖子记录缓存（按ID列表批量取出帖子，见 apps.posts.records）
+POST_RECORDS = {
+    'LOCAL_SIZE': 5000,  # 进程内LRU保留的帖子数
+    'LOCAL_TTL': 5,  # 进程内条目的过期时间（秒），也是其他进程写入后本进程读到旧记录的最长时间
+    'TIMEOUT': 60 * 60,  # 共享缓存中记录的缓存时间
+}
+
+# 转发
+REPOSTS = {
+    'EMBED_CACHE_TIMEOUT': 60 * 60 * 24,  # 原帖嵌入内容的缓存时间
+}
+
+# 帖子全文检索
+POST_SEARCH = {
+    'MAX_RESULTS': 1000,  # 单次搜索最多返回的帖子数
+}
+
+# 话题标签趋势（Count-Min Sketch + 每桶Top-K）
+HASHTAG_TRENDS = {
+    'CMS_WIDTH': 2048,
+    'CMS_DEPTH': 4,
+    'TOP_K': 100,  # 每个桶保留的候选标签数
+    'WINDOWS': {  # 窗口名: (桶长秒数, 桶数)
+        '1h': (300, 12),
+        '24h': (3600, 24),
+    },
+}
+
+# 用户搜索前缀索引
+USER_SEARCH = {
+    'MAX_PREFIX_LENGTH': 20,  # 索引的最长前缀
+    'MAX_PER_PREFIX': 200,  # 每个前缀保留粉丝数最高的用户数
+    # 共享存储为 LocalStore 时仍然使用进程内索引（仅适用于单进程环境，如测试），否则直接查询数据库
+    'INDEX_LOCAL_STORE': config('USER_SEARCH_LOCAL_STORE', default=False, cast=bool),
+}
+
 # Email Configuration
 EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
 EMAIL_HOST = config('EMAIL_HOST', default='smtp.gmail.com')
@@ -150,7 +282,7 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20,
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'apps.core.renderers.FastJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
@@ -200,6 +332,40 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    'rescore-trending-posts': {
+        'task': 'apps.posts.tasks.rescore_trending_posts',
+        'schedule': 300.0,
+    },
+    'flush-engagement-counters': {
+        'task': 'apps.posts.tasks.flush_engagement_counters',
+        'schedule': 10.0,
+    },
+    'flush-user-counters': {
+        'task': 'apps.users.tasks.flush_user_counters',
+        'schedule': 10.0,
+    },
+    'rebuild-user-recommendations': {
+        'task': 'apps.social.tasks.rebuild_user_recommendations',
+        'schedule': 60.0 * 60 * 6,
+    },
+    'refresh-user-recommendations': {
+        'task': 'apps.social.tasks.refresh_user_recommendations',
+        'schedule': 60.0,
+    },
+    'snapshot-social-graph': {
+        'task': 'apps.social.tasks.snapshot_social_graph',
+        'schedule': 60.0 * 10,
+    },
+    'resume-notification-fanouts': {
+        'task': 'apps.notifications.tasks.resume_notification_fanouts',
+        'schedule': 60.0,
+    },
+    'reconcile-counters': {
+        'task': 'apps.core.tasks.reconcile_counters',
+        'schedule': 60.0 * 60 * 24,
+    },
+}
 
 # Logging
 LOGGING = {